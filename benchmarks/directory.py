@@ -0,0 +1,166 @@
+# coding: utf8
+
+"""
+Benchmark of Directory client against local YandexConnectFakeServer
+Usage: python benchmarks/directory.py [--users N] [--latency SEC] [--scenario NAME ...]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yandex_connect import YandexConnectPageSizer, YandexConnectRequest, YandexConnectRetryPolicy, YandexConnectStats
+from yandex_connect.fakeserver import YandexConnectFakeServer
+
+
+class Timings(object):
+    """ Request latency recorder """
+
+    def __init__(self):
+        self.values = []
+        self._lock = threading.Lock()
+
+    def session_create(self, pool_size):
+        """
+        Session which records latency of every request
+        :return: requests.Session
+        """
+        session = YandexConnectRequest.session_create(pool_size)
+        request = session.request
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return request(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.values.append(time.perf_counter() - start)
+
+        session.request = timed
+        return session
+
+    def percentile(self, p):
+        if not self.values:
+            return 0.0
+        values = sorted(self.values)
+        return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(name, server_kwargs, client_kwargs, func):
+    """
+    Run scenario and print report
+    :param name: scenario name
+    :param server_kwargs: YandexConnectFakeServer params
+    :param client_kwargs: client params
+    :param func: func(server, api)
+    :return: dict
+    """
+    timings = Timings()
+    with YandexConnectFakeServer(**server_kwargs) as server:
+        pool_size = client_kwargs.pop('pool_size', 10)
+        api = server.client(session=timings.session_create(pool_size), pool_size=pool_size, **client_kwargs)
+        tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        try:
+            func(server, api)
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        api.close()
+        calls = dict(server.calls)
+    count = len(timings.values)
+    ret = {
+        'scenario': name,
+        'requests': count,
+        'seconds': elapsed,
+        'rps': count / elapsed if elapsed else 0.0,
+        'p50_ms': timings.percentile(50) * 1000,
+        'p99_ms': timings.percentile(99) * 1000,
+        'peak_kb': peak / 1024.0,
+        'calls': calls,
+        'error': error,
+    }
+    print('%-22s %6d req %8.3f s %9.1f req/s  p50 %7.2f ms  p99 %7.2f ms  peak %9.1f KiB%s' % (
+        name, count, elapsed, ret['rps'], ret['p50_ms'], ret['p99_ms'], ret['peak_kb'],
+        '  ERROR %r' % error if error else ''
+    ))
+    for (method, endpoint), value in sorted(calls.items()):
+        print('    %-6s %-32s %6d' % (method.upper(), endpoint, value))
+    return ret
+
+
+def scenario_list_full(args):
+    def func(server, api):
+        assert len(api.user_list_full()) == args.users
+    return run('list_full', {'users': args.users, 'latency': args.latency}, {}, func)
+
+
+def scenario_iter_users(args):
+    def func(server, api):
+        assert sum(1 for _ in api.iter_users()) == args.users
+    return run('iter_users', {'users': args.users, 'latency': args.latency}, {}, func)
+
+
+def scenario_resolve(args):
+    def func(server, api):
+        for i in range(min(args.users, 1000)):
+            api.user_id_check('user%s@example.com' % i)
+    return run('resolve_storm', {'users': args.users, 'latency': args.latency}, {}, func)
+
+
+def scenario_members(args):
+    def func(server, api):
+        group_id = list(server.data['groups'])[0]
+        api.group_member_add(group_id, ['user%s@example.com' % i for i in range(min(args.users, 2000))])
+    return run('bulk_members', {'users': args.users, 'latency': args.latency}, {}, func)
+
+
+def scenario_retry(args):
+    # Small pages: the sweep takes hundreds of requests, so injected errors hit many of them
+    per_page = 50
+
+    def func(server, api):
+        stats = YandexConnectStats()
+        api.hook_add(post=stats)
+        assert len(api.user_list_full()) == args.users
+        counters = stats.as_dict()[('get', 'users')]
+        pages = -(-args.users // per_page)
+        print('    pages %d, attempts %d, retries %d, statuses %s' % (
+            pages, counters['requests'], counters['retries'], counters['statuses']
+        ))
+        assert counters['requests'] == server.calls[('get', 'users')] >= pages
+        assert counters['retries'] > 0
+    policy = YandexConnectRetryPolicy(retry_max=5, backoff_base=0.01, backoff_max=0.1)
+    return run('retry_5xx_429', {'users': args.users, 'latency': args.latency, 'error_rate': 0.1, 'throttle_rate': 0.05},
+               {'retry_policy': policy, 'page_sizer': YandexConnectPageSizer(caps={'user_list': per_page})}, func)
+
+
+SCENARIOS = {
+    'list_full': scenario_list_full,
+    'iter_users': scenario_iter_users,
+    'resolve_storm': scenario_resolve,
+    'bulk_members': scenario_members,
+    'retry': scenario_retry,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000, help='organization size')
+    parser.add_argument('--latency', type=float, default=0.005, help='server latency, seconds')
+    parser.add_argument('--scenario', nargs='*', choices=sorted(SCENARIOS), help='scenarios to run, by default — all')
+    args = parser.parse_args()
+    for name in args.scenario or sorted(SCENARIOS):
+        SCENARIOS[name](args)
+
+
+if __name__ == '__main__':
+    main()
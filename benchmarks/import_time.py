@@ -0,0 +1,86 @@
+# coding: utf8
+
+"""
+Benchmark of cold start: package import time and first request with every transport
+Usage: python benchmarks/import_time.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+FIRST_CALL = '''
+import sys, time
+start = time.perf_counter()
+import yandex_connect
+from yandex_connect.fakeserver import YandexConnectFakeServer
+imported = time.perf_counter()
+server = YandexConnectFakeServer(users=10)
+kind = sys.argv[1]
+if kind == 'memory':
+    api = server.client(transport=server.transport())
+else:
+    server.start()
+    transport = None if kind == 'requests' else yandex_connect.YandexConnectUrllib3Transport()
+    api = server.client(transport=transport)
+ready = time.perf_counter()
+api.user_list(per_page=1)
+done = time.perf_counter()
+if kind != 'memory':
+    server.stop()
+print('%f %f' % (imported - start, done - ready))
+'''
+
+
+def run(args):
+    """
+    Run python in clean process
+    :param args: python arguments
+    :return: str — stdout + stderr
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    r = subprocess.run([sys.executable] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+                       universal_newlines=True, check=True)
+    return r.stdout + r.stderr
+
+
+def import_time():
+    """
+    Import time of package by -X importtime
+    :return: tuple(microseconds, list of heavy modules loaded)
+    """
+    out = run(['-X', 'importtime', '-c', 'import yandex_connect'])
+    total = 0
+    modules = set()
+    for line in out.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        modules.add(name)
+        if name == 'yandex_connect':
+            total = int(cumulative)
+    return total, sorted(modules & {'requests', 'urllib3', 'asyncio', 'sqlite3', 'email.utils'})
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    results = [import_time() for _ in range(runs)]
+    print('%-28s %8.2f ms median of %s, heavy modules: %s' % (
+        'import yandex_connect', statistics.median(total for total, _ in results) / 1e3, runs,
+        ', '.join(results[0][1]) or 'none'
+    ))
+
+    for kind in ('memory', 'urllib3', 'requests'):
+        imported, first = zip(*(map(float, run(['-c', FIRST_CALL, kind]).split()) for _ in range(runs)))
+        print('%-28s %8.2f ms import   %8.2f ms first request' % (
+            'transport %s' % kind, statistics.median(imported) * 1e3, statistics.median(first) * 1e3
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# coding: utf8
+
+"""
+Micro-benchmark of client CPU overhead per call, without network and with transports on loopback fake server
+Usage: python benchmarks/request_overhead.py [calls]
+"""
+
+import copy
+import datetime
+import inspect
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yandex_connect import YandexConnectDirectory, YandexConnectRequestsTransport, YandexConnectResponseCache, \
+    YandexConnectUrllib3Transport, inspect_args_func, json_default, json_prepare_dump
+from yandex_connect.fakeserver import YandexConnectFakeServer
+
+
+class StubResponse(object):
+    """ Response of StubSession """
+
+    status_code = 200
+    headers = {}
+    text = '{"id": 1000000000000000, "nickname": "test"}'
+    content = text.encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class StubSession(object):
+    """ Session without network """
+
+    def request(self, method, url, **kwargs):
+        return StubResponse()
+
+    def close(self):
+        pass
+
+
+def inspect_args_func_legacy(frame):
+    args, _, _, values = inspect.getargvalues(frame)
+    return {key: values[key] for key in args if key != 'self'}
+
+
+def args_sample(func, user_id, fields=None, page=None, per_page=None, nickname=None, department_id=None):
+    return func(inspect.currentframe())
+
+
+PAYLOAD = {
+    'name': {'first': 'Name', 'last': 'Secname'},
+    'birthday': datetime.date(1990, 1, 1),
+    'contacts': [{'type': 'email', 'value': 'test@test.ru'}, {'type': 'phone', 'value': '+70000000000'}],
+    'position': 'QA',
+    'department_id': 1,
+}
+
+
+def report(title, number, legacy, current):
+    print('%-28s legacy %8.2f us   current %8.2f us   x%.1f' % (
+        title, legacy / number * 1e6, current / number * 1e6, legacy / current
+    ))
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    legacy = timeit.timeit(lambda: args_sample(inspect_args_func_legacy, 1), number=number)
+    current = timeit.timeit(lambda: args_sample(inspect_args_func, 1), number=number)
+    report('arguments to payload', number, legacy, current)
+
+    legacy = timeit.timeit(lambda: json.dumps(json_prepare_dump(copy.copy(PAYLOAD))), number=number)
+    current = timeit.timeit(lambda: json.dumps(copy.copy(PAYLOAD), default=json_default), number=number)
+    report('payload serialization', number, legacy, current)
+
+    api = YandexConnectDirectory('token', org_id=1, session=StubSession())
+    elapsed = timeit.timeit(lambda: api.user_info(1000000000000000), number=number)
+    print('%-28s %8.2f us per call' % ('user_info, stub transport', elapsed / number * 1e6))
+    elapsed = timeit.timeit(lambda: api.user_upd(1000000000000000, birthday=datetime.date(1990, 1, 1),
+                                                 contacts=[('email', 'test@test.ru')], position='QA'), number=number)
+    print('%-28s %8.2f us per call' % ('user_upd, stub transport', elapsed / number * 1e6))
+
+    number = max(1, number // 10)
+    with YandexConnectFakeServer(users=10) as server:
+        for title, transport in (('memory', server.transport()), ('requests', YandexConnectRequestsTransport()),
+                                 ('urllib3', YandexConnectUrllib3Transport())):
+            with server.client(transport=transport, coalesce=False) as api:
+                user_id = api.user_list(per_page=1)['result'][0]['id']
+                elapsed = timeit.timeit(lambda: api.user_info(user_id), number=number)
+            print('%-28s %8.2f us per call' % ('user_info, %s transport' % title, elapsed / number * 1e6))
+        with server.client(transport=server.transport(), response_cache=YandexConnectResponseCache()) as api:
+            user_id = api.user_list(per_page=1)['result'][0]['id']
+            elapsed = timeit.timeit(lambda: api.user_info(user_id), number=number)
+        print('%-28s %8.2f us per call' % ('user_info, response cache', elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,12 @@ setup(name='yandex_connect',
             'requests',
             'docutils'
       ],
+      extras_require={
+            'async': ['aiohttp'],
+      },
+      entry_points={
+            'console_scripts': ['yandex-connect = yandex_connect.cli:main'],
+      },
       zip_safe=False,
       long_description=long_description,
       long_description_content_type='text/markdown'
@@ -1,4 +1,37 @@
 # coding: utf8
 
 from .base import *
-from .directory import *
\ No newline at end of file
+from .bulk import *
+from .cache import *
+from .flight import *
+from .httpcache import *
+from .paging import *
+from .pool import *
+from .records import *
+from .tree import *
+from .membership import *
+from .reconcile import *
+from .importer import *
+from .exporter import *
+from .ratelimit import *
+from .retry import *
+from .transport import *
+from .directory import *
+from .metrics import *
+from .snapshot import *
+
+# asyncio client is imported on first use, import of asyncio is slow
+_ASYNC_NAMES = ('AsyncYandexConnectRequest', 'AsyncYandexConnectBase', 'AsyncYandexConnectDirectory')
+__all__ = [name for name in globals() if not name.startswith('_')] + list(_ASYNC_NAMES)
+
+
+def __getattr__(name):
+    """
+    Attributes of yandex_connect.aio
+    :param name: attribute name
+    :return: attribute
+    """
+    if name in _ASYNC_NAMES:
+        from . import aio
+        return getattr(aio, name)
+    raise AttributeError("module 'yandex_connect' has no attribute '%s'" % name)
@@ -0,0 +1,862 @@
+# coding: utf8
+
+"""
+Yandex.Connect asyncio API module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import asyncio
+import collections
+import time
+
+from .base import *
+from .bulk import AsyncYandexConnectBulk
+from .directory import YandexConnectDirectory
+from .flight import AsyncYandexConnectSingleFlight
+from .resolver import AsyncYandexConnectResolver
+from .retry import YandexConnectRetryPolicy
+
+
+class AsyncYandexConnectRequest(YandexConnectRequest):
+    """
+    Yandex Connect asyncio request API object, aiohttp is required
+    Requests are sent by aiohttp session: transport and response_cache of YandexConnectRequest are not supported
+    """
+
+    _session_owned = True  # Session is created by request object and closed by close()
+
+    def __init__(self, domain, oauth_token, org_id=None, version=6, retry_max=3, pool_size=100, session=None,
+                 rate_limiter=None, retry_policy=None, coalesce=True, timeout=(10, 60)):
+        """
+        Init
+        :param domain: yandex domain
+        :param oauth_token: OAuth Token — https://oauth.yandex.ru/
+        :param org_id: Organization id
+        :param version: API version
+        :param retry_max: max retry count, used if retry_policy is not set
+        :param pool_size: max simultaneous connections
+        :param session: aiohttp.ClientSession to share between request objects, it is not closed by close()
+        :param rate_limiter: YandexConnectRateLimiter
+        :param retry_policy: YandexConnectRetryPolicy
+        :param coalesce: identical GET requests sent at the same time share one response
+        :param timeout: seconds — (connect, read) | one value for both, None — without timeout,
+                        response timeout of list page makes page smaller, see YandexConnectPageSizer
+        """
+        super(AsyncYandexConnectRequest, self).__init__(domain, oauth_token, org_id=org_id, version=version,
+                                                        retry_max=retry_max, pool_size=pool_size, session=session,
+                                                        rate_limiter=rate_limiter, retry_policy=retry_policy,
+                                                        coalesce=coalesce, timeout=timeout)
+        self._session_owned = session is None
+
+    @staticmethod
+    def flight_create(copy_result=True):
+        """
+        Create single flight of GET requests, coroutines of one event loop
+        :param copy_result: callers get own copies of shared response
+        :return: AsyncYandexConnectSingleFlight
+        """
+        return AsyncYandexConnectSingleFlight(copy_result=copy_result)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @staticmethod
+    def session_create(pool_size=100):
+        """
+        Create aiohttp session, must be called inside running event loop
+        :param pool_size: max simultaneous connections
+        :return: aiohttp.ClientSession
+        """
+        import aiohttp
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size),
+                                     cookie_jar=aiohttp.DummyCookieJar())
+
+    @staticmethod
+    def timeout_create(timeout):
+        """
+        Convert timeout to aiohttp one, it is applied to every request, so session passed by caller gets it too
+        :param timeout: seconds — (connect, read) | one value for both | None
+        :return: aiohttp.ClientTimeout
+        """
+        import aiohttp
+        if timeout is None:
+            return aiohttp.ClientTimeout()
+        if not isinstance(timeout, (tuple, list)):
+            timeout = (timeout, timeout)
+        return aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+
+    @property
+    def session(self):
+        """
+        Session of request object, created on first use
+        :return: aiohttp.ClientSession
+        """
+        if self._session is None:
+            self._session = self.session_create(self._pool_size)
+        return self._session
+
+    async def close(self):
+        """
+        Close session and all pooled connections, session passed by caller is left open
+        :return: None
+        """
+        if self._session is not None and self._session_owned:
+            session, self._session = self._session, None
+            await session.close()
+
+    @staticmethod
+    def prepare_params(params):
+        """
+        Convert query params to aiohttp acceptable values
+        :param params: dict
+        :return: dict
+        """
+        if not params:
+            return params
+        return {key: str(value) if isinstance(value, bool) else value for key, value in params.items()}
+
+    @staticmethod
+    def error_classify(exc):
+        """
+        Kind of send error for retry policy
+        :param exc: exception
+        :return: YandexConnectRetryPolicy.ERROR_CONNECT | ERROR_TRANSIENT | None — not retryable
+        """
+        import aiohttp
+        if isinstance(exc, aiohttp.ClientConnectorError):
+            return YandexConnectRetryPolicy.ERROR_CONNECT
+        if isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return YandexConnectRetryPolicy.ERROR_TRANSIENT
+        return None
+
+    @staticmethod
+    def timeout_check(exc):
+        """
+        Send error is timeout of response
+        :param exc: exception
+        :return: bool
+        """
+        import aiohttp
+        return isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientPayloadError))
+
+    async def __call__(self, name, data=None, method='post', retry_count=0):
+        """
+        Base request method
+        Failed request is repeated according to retry policy
+        Identical GET requests sent at the same time share one response
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param retry_count: retries already done
+        :raise YandexConnectException: bad request, jsonify failed
+        :raise YandexConnectExceptionY: yandex exception
+        :return: dict
+        """
+        start = time.perf_counter()
+        method, url, kwargs = self.prepare(name, data, method)
+        if 'params' in kwargs:
+            kwargs['params'] = self.prepare_params(kwargs['params'])
+        time_serialize = time.perf_counter() - start
+        if method == 'get' and self._flight is not None:
+            return await self.send_coalesced(name, data, method, url, kwargs, retry_count, time_serialize)
+        return await self.send(name, data, method, url, kwargs, retry_count, time_serialize)
+
+    async def send_sized(self, *args):
+        """
+        Send prepared request, see send
+        :return: tuple(result, response size)
+        """
+        ret = await self.send(*args)
+        return ret, self._response_size.get()
+
+    async def send_coalesced(self, name, data, method, url, kwargs, *args):
+        """
+        Send prepared request, identical requests sent at the same time share one response,
+        response size is set for every caller
+        :return: dict
+        """
+        ret, size = await self._flight.do(self.flight_key(url, kwargs), self.send_sized, name, data, method, url,
+                                          kwargs, *args)
+        self._response_size.set(size)
+        return ret
+
+    async def send(self, name, data, method, url, kwargs, retry_count=0, time_serialize=0.0):
+        """
+        Send prepared request
+        Failed request is repeated according to retry policy
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method
+        :param url: request url
+        :param kwargs: request arguments
+        :param retry_count: retries already done
+        :param time_serialize: seconds spent on request preparation
+        :raise YandexConnectException: bad request, jsonify failed
+        :raise YandexConnectExceptionY: yandex exception
+        :return: dict
+        """
+        hooked = bool(self._hooks_pre or self._hooks_post)
+
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug('AsyncYandexConnectRequest with "%s"', method)
+            self._logger.debug('URL: %s', url)
+            self._logger.debug(kwargs)
+
+        self._retry_policy.request_started()
+        while True:
+            if self._rate_limiter is not None:
+                wait = self._rate_limiter.reserve(method)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            event = self._event_create(name, method, retry_count, time_serialize, kwargs) if hooked else None
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, timeout=self.timeout_create(self._timeout), **kwargs) as r:
+                    status_code = r.status
+                    headers = r.headers
+                    raw = await r.read()
+                    text = raw.decode(r.get_encoding(), errors='replace')
+            except Exception as e:
+                if event is not None:
+                    event.time_network = time.perf_counter() - start
+                    event.error = e
+                    self._hooks_call(self._hooks_post, event)
+                delay = self._retry_policy.delay(method, retry_count, error=self.error_classify(e))
+                if delay is None:
+                    raise YandexConnectException(u'Request error: send', name, data) from e
+                self._logger.debug('Retry in %.2fs after error: %r', delay, e)
+                await asyncio.sleep(delay)
+                retry_count += 1
+                continue
+            if event is not None:
+                event.time_network = time.perf_counter() - start
+                event.status = status_code
+                event.bytes_in = len(raw)
+
+            if debug:
+                self._logger.debug('Response code: %s', status_code)
+                self._logger.debug('Response text: %s', text)
+
+            if status_code > 299:
+                if event is not None:
+                    self._hooks_call(self._hooks_post, event)
+                delay = self._retry_policy.delay(method, retry_count, status_code=status_code, headers=headers)
+                if delay is not None:
+                    self._logger.debug('Retry in %.2fs after status %s', delay, status_code)
+                    await asyncio.sleep(delay)
+                    retry_count += 1
+                    continue
+                try:
+                    msg = json.loads(text)
+                except Exception:
+                    msg = text
+                raise YandexConnectExceptionY(status_code, msg, url, kwargs)
+            if method == 'delete':
+                ret = True
+            else:
+                self._response_size.set(len(raw))
+                start = time.perf_counter()
+                try:
+                    ret = json.loads(text)
+                except Exception:
+                    ret = True
+                if event is not None:
+                    event.time_decode = time.perf_counter() - start
+            if event is not None:
+                self._hooks_call(self._hooks_post, event)
+            return ret
+
+
+class AsyncYandexConnectBase(YandexConnectBase):
+    """
+    Yandex connect asyncio API base class
+    transport and response_cache of YandexConnectBase are not supported, see AsyncYandexConnectRequest
+    """
+
+    def __init__(self, oauth_token, org_id=None, version=6, retry_max=3, pool_size=100, session=None,
+                 list_concurrency=10, cache=None, rate_limiter=None, retry_policy=None,
+                 domain=None, page_sizer=None, coalesce=True, timeout=(10, 60)):
+        """
+        :param oauth_token: OAuth token
+        :param org_id: ID org
+        :param version: API version
+        :param retry_max: max retry count, used if retry_policy is not set
+        :param pool_size: max simultaneous connections
+        :param session: aiohttp.ClientSession to share between clients
+        :param list_concurrency: max pages requested at once by list_full
+        :param cache: YandexConnectCache, by default — YandexConnectMemoryCache
+        :param rate_limiter: YandexConnectRateLimiter, may be shared between clients
+        :param retry_policy: YandexConnectRetryPolicy, may be shared between clients
+        :param domain: request domain instead of DOMAIN
+        :param page_sizer: YandexConnectPageSizer, e.g. with per endpoint caps
+        :param coalesce: identical GET requests running at the same time share one response
+        :param timeout: seconds — (connect, read) | one value for both, None — without timeout
+        """
+        self.request = AsyncYandexConnectRequest(domain or self.DOMAIN, oauth_token, org_id=org_id, version=version,
+                                                 retry_max=retry_max, pool_size=pool_size, session=session,
+                                                 rate_limiter=rate_limiter, retry_policy=retry_policy,
+                                                 coalesce=coalesce, timeout=timeout)
+        self.cache = cache if cache is not None else YandexConnectMemoryCache()
+        self.list_concurrency = list_concurrency
+        self.page_sizer = page_sizer if page_sizer is not None else YandexConnectPageSizer()
+        self.flight = self.request.flight_create(copy_result=False) if coalesce else None
+
+    def __enter__(self):
+        raise TypeError('Use "async with" for %s' % self.__class__.__name__)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        raise TypeError('Use "async with" for %s' % self.__class__.__name__)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Close connection pool
+        :return: None
+        """
+        await self.request.close()
+
+    def bulk(self, workers=8, progress=None):
+        """
+        Create bulk executor for different coroutine methods
+        :param workers: max simultaneous calls, should not exceed pool_size
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :return: AsyncYandexConnectBulk
+        """
+        return AsyncYandexConnectBulk(self, workers=workers, progress=progress)
+
+    async def map(self, method, items, workers=8, progress=None):
+        """
+        Call coroutine method for every kwargs of items, up to workers at once
+        :param method: method name, e.g. 'user_upd'
+        :param items: iterable of kwargs dict
+        :param workers: max simultaneous calls, should not exceed pool_size
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :return: list of YandexConnectBulkResult in input order
+        """
+        total = len(items) if hasattr(items, '__len__') else None
+        return await self.bulk(workers=workers, progress=progress).execute(((method, kwargs) for kwargs in items),
+                                                                           total=total)
+
+    async def list_range(self, callback, **kwargs):
+        """
+        Request one page and record its time and size in page_sizer
+        Retries are done by retry policy of request, page failed because of its
+        size is requested by pages of half size, which are split again while
+        they fail, down to per_page_min of page_sizer
+        :param callback: coroutine function
+        :param kwargs: params with page and per_page
+        :return: yandex request dict
+        """
+        endpoint = callback.__name__
+        start = time.perf_counter()
+        try:
+            r = await callback(**kwargs)
+        except Exception as e:
+            if not self.page_oversized(e) or not self.page_sizer.splittable(kwargs['per_page']):
+                raise
+            self.page_sizer.fail(endpoint, kwargs['per_page'])
+            parts = []
+            for part in self.page_parts(kwargs):
+                if parts and part['page'] > parts[0][1]['pages']:
+                    break
+                parts.append((part, await self.list_range(callback, **part)))
+            return self.page_parts_merge(kwargs, parts)
+        self.page_sizer.observe(endpoint, kwargs['fields'], len(r['result']), time.perf_counter() - start,
+                                self.request.response_size)
+        return r
+
+    async def list_full(self, callback, default_field, **kwargs):
+        """
+        List full
+        First page is requested to get pages count, the rest are requested
+        at once, up to list_concurrency simultaneously
+        :param callback: coroutine function
+        :param default_field: default field
+        :param kwargs: params
+        :return: list
+        """
+        kwargs['fields'] = self.prepare_fields(kwargs.get('fields'), default_field)
+        kwargs['per_page'] = self.page_sizer.size(callback.__name__, kwargs['fields'])
+        kwargs['page'] = 1
+        r = await self.list_range(callback, **kwargs)
+        pages = r['pages']
+        ret = list(r['result'])
+        semaphore = asyncio.Semaphore(max(1, self.list_concurrency))
+
+        async def page_get(page):
+            async with semaphore:
+                return await self.list_range(callback, **dict(kwargs, page=page))
+
+        for r in await asyncio.gather(*[page_get(page) for page in range(2, pages + 1)]):
+            ret += r['result']
+        return ret
+
+    async def list_pages(self, callback, default_field, page=1, per_page=None, prefetch=1, **kwargs):
+        """
+        Iterate over pages starting from given one
+        Up to prefetch next pages are requested in background while current page is consumed
+        :param callback: coroutine function
+        :param default_field: default field
+        :param page: first page
+        :param per_page: page size, by default — chosen by page_sizer
+        :param prefetch: pages requested in background
+        :param kwargs: params
+        :return: async generator of tuple(page, yandex request dict)
+        """
+        kwargs['fields'] = self.prepare_fields(kwargs.get('fields'), default_field)
+        kwargs['per_page'] = per_page or self.page_sizer.size(callback.__name__, kwargs['fields'])
+        prefetch = max(1, prefetch)
+        r = await self.list_range(callback, **dict(kwargs, page=page))
+        pages = r['pages']
+        tasks = collections.deque()
+        next_page = page + 1
+        try:
+            while True:
+                while next_page <= pages and len(tasks) < prefetch:
+                    tasks.append(asyncio.ensure_future(self.list_range(callback, **dict(kwargs, page=next_page))))
+                    next_page += 1
+                yield page, r
+                if not tasks:
+                    break
+                r = await tasks.popleft()
+                page += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def list_iter(self, callback, default_field, **kwargs):
+        """
+        Iterate over all items page by page
+        Next pages are requested in background while current page is consumed
+        :param callback: coroutine function
+        :param default_field: default field
+        :param kwargs: params, page, per_page and prefetch as in list_pages
+        :return: async generator
+        """
+        pages = self.list_pages(callback, default_field, **kwargs)
+        try:
+            async for page, r in pages:
+                for item in r['result']:
+                    yield item
+        finally:
+            await pages.aclose()
+
+
+class AsyncYandexConnectDirectory(AsyncYandexConnectBase):
+    """ Yandex connect directory asyncio API class, methods are the same as in YandexConnectDirectory """
+
+    DOMAIN = YandexConnectDirectory.DOMAIN  # Request Domain
+
+    prepare_contacts = staticmethod(YandexConnectDirectory.prepare_contacts)
+    prepare_name = staticmethod(YandexConnectDirectory.prepare_name)
+
+    resolver = None  # Identity resolver
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param negative_ttl: seconds to remember not found nickname / email
+        Other params are the same as in AsyncYandexConnectBase
+        """
+        negative_ttl = kwargs.pop('negative_ttl', 60)
+        super(AsyncYandexConnectDirectory, self).__init__(*args, **kwargs)
+        self.resolver = AsyncYandexConnectResolver(self, negative_ttl=negative_ttl)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # User
+    # ------------------------------------------------------------------------------------------------------------------
+
+    async def user_get_id_by_nickname(self, nickname):
+        """
+        Get user id by nickname
+        :param nickname: nickname / alias / email
+        :raise YandexConnectException: not found
+        :return: int
+        """
+        return await self.resolver.user_id(nickname)
+
+    async def user_id_check(self, user_id):
+        """
+        Prepare user_id to request
+        :param user_id: int / str
+        :return: int
+        """
+        if isinstance(user_id, str):
+            if not user_id.isdigit():
+                user_id = await self.user_get_id_by_nickname(user_id)
+            else:
+                user_id = int(user_id)
+        return user_id
+
+    async def user_info(self, user_id, fields=None):
+        """
+        Получение информации о сотруднике, см. YandexConnectDirectory.user_info
+        :return: yandex request dict — информация о сотруднике
+        """
+        user_id = await self.user_id_check(user_id)
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'nickname')
+        return await self.request('users/%s' % user_id, data, method='get')
+
+    async def user_list(self, fields=None, id=None, nickname=None, department_id=None, recursive_department_id=None, group_id=None, recursive_group_id=None, is_dismissed=None, page=None, per_page=None):
+        """
+        Получение списка сотрудников, см. YandexConnectDirectory.user_list
+        :return: yandex request dict — список сотрудников
+        """
+        group_id = await self.group_id_check(group_id)
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'nickname')
+        return await self.request('users', data, method='get')
+
+    async def user_list_full(self, fields=None, id=None, nickname=None, department_id=None, recursive_department_id=None, group_id=None, recursive_group_id=None, is_dismissed=None):
+        """
+        Получение полного списка сотрудников, без страниц, см. YandexConnectDirectory.user_list_full
+        :return: yandex request list - список сотрудников
+        """
+        group_id = await self.group_id_check(group_id)
+        return await self.list_full(self.user_list, 'nickname', **inspect_args_func(currentframe()))
+
+    def iter_users(self, fields=None, id=None, nickname=None, department_id=None, recursive_department_id=None, group_id=None, recursive_group_id=None, is_dismissed=None):
+        """
+        Перебор всех сотрудников по страницам, см. YandexConnectDirectory.iter_users
+        group_id задается только ID
+        :return: async generator - сотрудники
+        """
+        return self.list_iter(self.user_list, 'nickname', **inspect_args_func(currentframe()))
+
+    async def user_add(self, nickname, password, about=None, aliases=None, birthday=None, contacts=None, department_id=1, gender='male', is_admin=None, is_dismissed=None, name=None, secname=None, sername=None, position=None):
+        """
+        Добавление сотрудника, см. YandexConnectDirectory.user_add
+        :return: yandex request dict — созданный сотрудник
+        """
+        department_id = await self.department_id_check(department_id)
+        data = inspect_args_func(currentframe())
+        spos = data['nickname'].find('@')
+        if spos > -1:
+            data['nickname'] = data['nickname'][:spos]
+        self.prepare_name(data)
+        data['contacts'] = self.prepare_contacts(data['contacts'])
+        ret = await self.request('users', data, method='post')
+        self.resolver.item_set('user', ret)
+        return ret
+
+    async def user_upd(self, user_id, password=None, about=None, birthday=None, contacts=None, department_id=None, gender=None, is_admin=None, is_dismissed=None, name=None, secname=None, sername=None, position=None, is_enabled=None):
+        """
+        Изменение сотрудника, см. YandexConnectDirectory.user_upd
+        :return: yandex request dict — измененный сотрудник
+        """
+        user_id = await self.user_id_check(user_id)
+        department_id = await self.department_id_check(department_id)
+        data = inspect_args_func(currentframe())
+        self.prepare_name(data)
+        data['contacts'] = self.prepare_contacts(data['contacts'])
+        return await self.request('users/%s' % user_id, data, method='patch')
+
+    async def user_alias_add(self, user_id, name):
+        """
+        Добавление алиаса для сотрудника, см. YandexConnectDirectory.user_alias_add
+        :return: yandex request dict
+        """
+        user_id = await self.user_id_check(user_id)
+        ret = await self.request('users/%s/aliases' % user_id, inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('user', {'id': user_id, 'aliases': [name]})
+        return ret
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Department
+    # ------------------------------------------------------------------------------------------------------------------
+
+    async def department_id_check(self, department_id):
+        """
+        Prepare department_id for request
+        :param department_id: int / str — ID, label or name
+        :return: int
+        """
+        if isinstance(department_id, str):
+            if not department_id.isdigit():
+                department_id = await self.resolver.department_id(department_id)
+            else:
+                department_id = int(department_id)
+        return department_id
+
+    async def department_list(self, fields=None, page=None, per_page=None):
+        """
+        Получение списка отделов, см. YandexConnectDirectory.department_list
+        :return: yandex request list - список отделов
+        """
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'name')
+        return await self.request('departments', data, method='get')
+
+    async def department_list_full(self, fields=None):
+        """
+        Получение полного списка отделов, см. YandexConnectDirectory.department_list_full
+        :return: yandex request list - список отделов
+        """
+        return await self.list_full(self.department_list, 'name', **inspect_args_func(currentframe()))
+
+    def iter_departments(self, fields=None):
+        """
+        Перебор всех отделов по страницам, см. YandexConnectDirectory.iter_departments
+        :return: async generator - отделы
+        """
+        return self.list_iter(self.department_list, 'name', **inspect_args_func(currentframe()))
+
+    async def department_info(self, department_id, fields=None):
+        """
+        Получение информации об отделе, см. YandexConnectDirectory.department_info
+        :return: yandex request dict
+        """
+        department_id = await self.department_id_check(department_id)
+        return await self.request('departments/%s' % department_id, inspect_args_func(currentframe()), method='get')
+
+    async def department_add(self, name, label, description=None, head_id=None, parent_id=1):
+        """
+        Добавление отдела, см. YandexConnectDirectory.department_add
+        :return: yandex request dict - созданный отдел
+        """
+        parent_id = await self.department_id_check(parent_id)
+        ret = await self.request('departments', inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('department', ret)
+        return ret
+
+    async def department_upd(self, department_id, name=None, description=None, head_id=None, label=None, parent_id=None):
+        """
+        Изменение отдела, см. YandexConnectDirectory.department_upd
+        :return: yandex request dict - созданный отдел
+        """
+        department_id = await self.department_id_check(department_id)
+        parent_id = await self.department_id_check(parent_id)
+        ret = await self.request('departments/%s' % department_id, inspect_args_func(currentframe()), method='patch')
+        self.resolver.item_set('department', ret)
+        return ret
+
+    async def department_del(self, department_id):
+        """
+        Удаление отдела, см. YandexConnectDirectory.department_del
+        :return: bool
+        """
+        department_id = await self.department_id_check(department_id)
+        ret = await self.request('departments/%s' % department_id, method='delete')
+        self.resolver.item_del('department', department_id)
+        return ret
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Group
+    # ------------------------------------------------------------------------------------------------------------------
+
+    async def _group_cache_set(self):
+        """
+        Set cache for groups, concurrent calls share one sweep
+        :return: None
+        """
+        await self.resolver.refresh('group')
+
+    async def group_get_id_by_email(self, email):
+        """
+        Get group ID by email
+        :param email: email / name
+        :raise YandexConnectException: not found
+        :return: int
+        """
+        return await self.resolver.group_id(email)
+
+    async def group_id_check(self, group_id):
+        """
+        Prepare group_id for request
+        :param group_id: int / str
+        :return: int
+        """
+        if isinstance(group_id, str):
+            if not group_id.isdigit():
+                group_id = await self.group_get_id_by_email(group_id)
+            else:
+                group_id = int(group_id)
+        return group_id
+
+    async def group_list(self, fields=None, page=None, per_page=None):
+        """
+        Список команд, см. YandexConnectDirectory.group_list
+        :return: yandex request list - список команд
+        """
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'name')
+        return await self.request('groups', data, method='get')
+
+    async def group_list_full(self, fields=None):
+        """
+        Полный список команд, см. YandexConnectDirectory.group_list_full
+        :return: yandex request list - список команд
+        """
+        if not fields:
+            fields = ['name', 'email']
+        return await self.list_full(self.group_list, 'name', **inspect_args_func(currentframe()))
+
+    def iter_groups(self, fields=None):
+        """
+        Перебор всех команд по страницам, см. YandexConnectDirectory.iter_groups
+        :return: async generator - команды
+        """
+        if not fields:
+            fields = ['name', 'email']
+        return self.list_iter(self.group_list, 'name', **inspect_args_func(currentframe()))
+
+    async def group_info(self, group_id, fields=None):
+        """
+        Получение информации о команде, см. YandexConnectDirectory.group_info
+        :return: yandex request dict - команда
+        """
+        group_id = await self.group_id_check(group_id)
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'name')
+        return await self.request('groups/%s' % group_id, data, method='get')
+
+    async def group_add(self, name, label, admins=None, description=None, members=None, type=None):
+        """
+        Добавление команды, см. YandexConnectDirectory.group_add
+        :return: yandex request dict - созданная команда
+        """
+        ret = await self.request('groups', inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('group', ret)
+        return ret
+
+    async def group_upd(self, group_id, name=None, label=None, admins=None, description=None, members=None, type=None):
+        """
+        Изменение команды, см. YandexConnectDirectory.group_upd
+        :return: yandex request dict - измененная команда
+        """
+        group_id = await self.group_id_check(group_id)
+        ret = await self.request('groups/%s' % group_id, inspect_args_func(currentframe()), method='patch')
+        self.resolver.item_set('group', ret)
+        return ret
+
+    async def group_member_list(self, group_id):
+        """
+        Участники команды, см. YandexConnectDirectory.group_member_list
+        :return: yandex request list - участники команды
+        """
+        group_id = await self.group_id_check(group_id)
+        return await self.request('groups/%s/members' % group_id, method='get')
+
+    async def member_ids_check(self, member_ids, member_type='user'):
+        """
+        Prepare list of member IDs to request, all strings are resolved at once,
+        see YandexConnectDirectory.member_ids_check
+        :param member_ids: list of int / str
+        :param member_type: user|group|department
+        :return: list of int
+        """
+        keys = [item for item in member_ids if isinstance(item, str) and not item.isdigit()]
+        resolved = {}
+        if keys:
+            resolved = dict(zip(keys, await self.resolver.resolve_many(member_type, keys)))
+        ret = []
+        for item in member_ids:
+            if item in resolved:
+                item = resolved[item]
+            elif isinstance(item, str):
+                item = int(item)
+            ret.append(item)
+        return ret
+
+    async def _group_member_bulk(self, group_id, operation_type, member_ids, member_type='user'):
+        """
+        Add / remove many members by chunked bulk-update requests
+        :param group_id: ID
+        :param operation_type: add|remove
+        :param member_ids: list of ID / email
+        :param member_type: user|group|department
+        :return: list — yandex request per chunk
+        """
+        member_ids = await self.member_ids_check(member_ids, member_type)
+        actions = [{'operation_type': operation_type, 'value': {'id': member_id, 'type': member_type}}
+                   for member_id in member_ids]
+        chunk_size = YandexConnectDirectory.MEMBERS_CHUNK_SIZE
+        return list(await asyncio.gather(*[
+            self.group_member_update(group_id, actions[i:i + chunk_size]) for i in range(0, len(actions), chunk_size)
+        ]))
+
+    async def group_member_add(self, group_id, user_id, user_type='user'):
+        """
+        Добавить участника команды, см. YandexConnectDirectory.group_member_add
+        :return: yandex request dict | list — ответы bulk-update для списка
+        """
+        group_id = await self.group_id_check(group_id)
+        if isinstance(user_id, list):
+            return await self._group_member_bulk(group_id, 'add', user_id, member_type=user_type)
+        user_id = await self.user_id_check(user_id)
+        data = {
+            'id': user_id,
+            'type': user_type
+        }
+        return await self.request('groups/%s/members' % group_id, data, method='post')
+
+    async def group_member_del(self, group_id, user_id, user_type='user'):
+        """
+        Удалить участника команды, см. YandexConnectDirectory.group_member_del
+        :return: yandex request | list — ответы bulk-update для списка
+        """
+        group_id = await self.group_id_check(group_id)
+        if isinstance(user_id, list):
+            return await self._group_member_bulk(group_id, 'remove', user_id, member_type=user_type)
+        user_id = await self.user_id_check(user_id)
+        return await self.group_member_update(group_id, [{'operation_type': 'remove', 'value': {'id': user_id, 'type': user_type}}])
+
+    async def group_member_update(self, group_id, actions):
+        """
+        Изменение участников команды, см. YandexConnectDirectory.group_member_update
+        :return: True
+        """
+        group_id = await self.group_id_check(group_id)
+        return await self.request('groups/%s/members/bulk-update' % group_id, data=actions, method='post')
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Domain
+    # ------------------------------------------------------------------------------------------------------------------
+
+    async def domain_list(self, fields=None):
+        """
+        Получение списка доменов, см. YandexConnectDirectory.domain_list
+        :return: yandex request list
+        """
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'name', only_title_field=True)
+        return await self.request('domains', data, method='get')
+
+    async def domain_add(self, name):
+        """
+        Добавить домен, см. YandexConnectDirectory.domain_add
+        :return: bool
+        """
+        return await self.request('domains', inspect_args_func(currentframe()), method='post')
+
+    async def domain_del(self, name):
+        """
+        Удалить домен, см. YandexConnectDirectory.domain_del
+        :return: bool
+        """
+        return await self.request('domains/%s' % name, method='delete')
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Organization
+    # ------------------------------------------------------------------------------------------------------------------
+
+    async def organization_list(self, fields=None):
+        """
+        Список организаций, см. YandexConnectDirectory.organization_list
+        :return: yandex request list
+        """
+        data = inspect_args_func(currentframe())
+        data['fields'] = self.prepare_fields(data['fields'], 'name')
+        return (await self.request('organizations', data, method='get'))['result']
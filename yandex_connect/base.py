@@ -8,11 +8,23 @@ Yandex.Connect Base API module
 """
 
 import json
-import requests
 import datetime
-import inspect
 import logging
 import base64
+import collections
+import contextvars
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .bulk import YandexConnectBulk
+from .cache import YandexConnectMemoryCache
+from .flight import YandexConnectSingleFlight
+from .metrics import YandexConnectRequestEvent
+from .paging import YandexConnectPageSizer
+from .retry import YandexConnectRetryPolicy
+from .transport import YandexConnectRequestsTransport
 
 
 def token_get_by_code():
@@ -43,9 +55,18 @@ def token_get_by_code():
     print(r.text)
 
 
+def currentframe():
+    """
+    Frame of caller, the same as inspect.currentframe without import of inspect
+    :return: frame
+    """
+    return sys._getframe(1)
+
+
 def json_prepare_dump(obj):
     """
     Подготовка к json.dumps
+    Для запросов используется json_default, функция оставлена для совместимости
     :param obj: объект
     :return: подготовленный объект
     """
@@ -62,14 +83,35 @@ def json_prepare_dump(obj):
     return obj
 
 
+def json_default(obj):
+    """
+    Hook of json.dumps for not serializable objects
+    :param obj: date / datetime
+    :raise TypeError: unknown object
+    :return: str
+    """
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    raise TypeError('Object of type %s is not JSON serializable' % obj.__class__.__name__)
+
+
+_inspect_args_names = {}  # Argument names by code object
+
+
 def inspect_args_func(frame):
     """
     Inspect current def arguments
+    Argument names are computed once per function
     :param frame: inspect.currentframe()
     :return: dict
     """
-    args, _, _, values = inspect.getargvalues(frame)
-    return {key: values[key] for key in args if key != 'self'}
+    code = frame.f_code
+    names = _inspect_args_names.get(code)
+    if names is None:
+        names = code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+        names = _inspect_args_names[code] = tuple(name for name in names if name != 'self')
+    values = frame.f_locals
+    return {key: values[key] for key in names}
 
 
 class YandexConnectException(Exception):
@@ -93,16 +135,42 @@ class YandexConnectRequest(object):
     _oauth_token = None  # OAuth Token
     _org_id = None  # Org ID
     _domain = None  # Domain
-    _retry_max = 3  # Max retry if status_code = 502
+    _retry_max = 3  # Max retry by default retry policy
+    _retry_policy = None  # YandexConnectRetryPolicy
     _logger = None  # Logger
-
-    def __init__(self, domain, oauth_token, org_id=None, version=6, retry_max=3):
+    _pool_size = 10  # Max keep-alive connections per host
+    _session = None  # requests.Session with connection pool
+    _session_lock = None  # Lock for lazy transport creation
+    _transport = None  # YandexConnectTransport
+    _transport_owned = True  # Transport is created by request object and closed by close()
+    _rate_limiter = None  # YandexConnectRateLimiter
+    _hooks_pre = None  # Callbacks before request
+    _hooks_post = None  # Callbacks after request
+    _response_size = None  # ContextVar, size of last response in thread / asyncio task
+    _flight = None  # YandexConnectSingleFlight of GET requests, None — coalescing is off
+    _response_cache = None  # YandexConnectResponseCache of GET responses, None — responses are not cached
+    _timeout = (10, 60)  # Seconds of default transport — (connect, read), None — without timeout
+
+    def __init__(self, domain, oauth_token, org_id=None, version=6, retry_max=3, pool_size=10, session=None,
+                 rate_limiter=None, retry_policy=None, coalesce=True, transport=None, response_cache=None,
+                 timeout=(10, 60)):
         """
         Init
         :param domain: yandex domain
         :param oauth_token: OAuth Token — https://oauth.yandex.ru/
         :param org_id: Organization id
         :param version: API version
+        :param retry_max: max retry count, used if retry_policy is not set
+        :param pool_size: max keep-alive connections per host
+        :param session: requests.Session to share between request objects, it is not closed by close()
+        :param rate_limiter: YandexConnectRateLimiter
+        :param retry_policy: YandexConnectRetryPolicy, may be shared to share retry budget
+        :param coalesce: identical GET requests sent at the same time share one response
+        :param transport: YandexConnectTransport, by default — YandexConnectRequestsTransport with session,
+                          passed transport is not closed by close()
+        :param response_cache: YandexConnectResponseCache of GET responses, may be shared between request objects
+        :param timeout: seconds of default transport — (connect, read) | one value for both, None — without timeout,
+                        response timeout of list page makes page smaller, see YandexConnectPageSizer
         """
         self._domain = domain
         self._oauth_token = oauth_token
@@ -111,16 +179,91 @@ class YandexConnectRequest(object):
         if version:
             self._version = version
         self._logger = logging.getLogger('YandexConnectRequest')
+        self._pool_size = pool_size
+        self._session = session
+        self._session_lock = threading.Lock()
+        self._transport = transport
+        self._transport_owned = transport is None
+        self._rate_limiter = rate_limiter
+        self._hooks_pre = []
+        self._hooks_post = []
+        self._response_size = contextvars.ContextVar('response_size', default=None)
+        self._flight = self.flight_create() if coalesce else None
+        self._response_cache = response_cache
+        self._timeout = timeout
+        self._retry_policy = retry_policy if retry_policy is not None else YandexConnectRetryPolicy(retry_max=retry_max)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-    def __call__(self, name, data=None, method='post', retry_count=0):
+    @staticmethod
+    def session_create(pool_size=10):
         """
-        Base request method
+        Create requests session with keep-alive connection pool, see YandexConnectRequestsTransport
+        :param pool_size: max keep-alive connections per host
+        :return: requests.Session
+        """
+        return YandexConnectRequestsTransport.session_create(pool_size)
+
+    @property
+    def transport(self):
+        """
+        Transport of request object, created on first use
+        :return: YandexConnectTransport
+        """
+        if self._transport is None:
+            with self._session_lock:
+                if self._transport is None:
+                    self._transport = YandexConnectRequestsTransport(self._pool_size, session=self._session,
+                                                                     timeout=self._timeout)
+        return self._transport
+
+    @property
+    def session(self):
+        """
+        requests.Session of default transport
+        :return: requests.Session
+        """
+        return self.transport.session
+
+    @staticmethod
+    def flight_create(copy_result=True):
+        """
+        Create single flight of GET requests
+        :param copy_result: callers get own copies of shared response
+        :return: YandexConnectSingleFlight
+        """
+        return YandexConnectSingleFlight(copy_result=copy_result)
+
+    @property
+    def response_size(self):
+        """
+        Size of last response received by current thread or asyncio task
+        :return: int | None — bytes
+        """
+        return self._response_size.get()
+
+    def close(self):
+        """
+        Close transport and all pooled connections, session and transport passed by caller are left open
+        :return: None
+        """
+        with self._session_lock:
+            if self._transport is not None and self._transport_owned:
+                self._transport.close()
+                self._transport = None
+
+    def prepare(self, name, data=None, method='post'):
+        """
+        Prepare request url and arguments
         :param name: url path
         :param data: data / args of request
-        :param method: request method - get/post
-        :raise YandexConnectException: bad request, jsonify failed
-        :raise YandexConnectExceptionY: yandex exception
-        :return: dict
+        :param method: request method - get/post/patch/delete
+        :raise ValueError: unknown method
+        :return: tuple(method, url, kwargs)
         """
         url = '%(domain)s/v%(version)s/%(name)s' % {
             'domain': self._domain,
@@ -155,7 +298,7 @@ class YandexConnectRequest(object):
                 key_id = '%s_id' % module
                 if key_id in data:
                     del data[key_id]
-                kwargs['data'] = json.dumps(json_prepare_dump(data))
+                kwargs['data'] = json.dumps(data, default=json_default)
                 kwargs['headers']['Content-Type'] = 'application/json'
         else:
             kwargs['params'] = data
@@ -163,35 +306,225 @@ class YandexConnectRequest(object):
         if not kwargs['headers']['X-Org-ID']:
             del kwargs['headers']['X-Org-ID']
 
-        self._logger.debug('YandexConnectRequest with "%s"' % method)
-        self._logger.debug('URL: %s' % url)
-        self._logger.debug(kwargs)
+        return method, url, kwargs
 
-        try:
-            r = getattr(requests, method)(url, **kwargs)
-        except Exception:
-            raise YandexConnectException(u'Request error: send', name, data)
+    def error_classify(self, exc):
+        """
+        Kind of send error for retry policy
+        :param exc: exception
+        :return: YandexConnectRetryPolicy.ERROR_CONNECT | ERROR_TRANSIENT | None — not retryable
+        """
+        return self.transport.error_classify(exc)
 
-        self._logger.debug('Response code: %s' % r.status_code)
-        self._logger.debug('Response text: %s' % r.text)
+    def timeout_check(self, exc):
+        """
+        Send error is timeout of response
+        :param exc: exception
+        :return: bool
+        """
+        return self.transport.timeout_check(exc)
 
-        if r.status_code > 299:
+    def hook_add(self, pre=None, post=None):
+        """
+        Add request hooks, called for every attempt with YandexConnectRequestEvent
+        :param pre: callback before sending
+        :param post: callback after response or send error
+        :return: None
+        """
+        if pre is not None:
+            self._hooks_pre = self._hooks_pre + [pre]
+        if post is not None:
+            self._hooks_post = self._hooks_post + [post]
+
+    def hook_del(self, hook):
+        """
+        Remove request hook
+        :param hook: callback
+        :return: None
+        """
+        self._hooks_pre = [item for item in self._hooks_pre if item is not hook]
+        self._hooks_post = [item for item in self._hooks_post if item is not hook]
+
+    def _hooks_call(self, hooks, event):
+        """
+        Call hooks, hook exceptions are logged and ignored
+        :return: None
+        """
+        for hook in hooks:
             try:
-                msg = r.json()
+                hook(event)
             except Exception:
-                msg = r.text
-            if 500 <= r.status_code <= 599:
-                if retry_count <= self._retry_max:
-                    return self(name, data=data, method=method, retry_count=retry_count + 1)
-            raise YandexConnectExceptionY(r.status_code, msg, url, kwargs)
-        if method == 'delete':
-            return True
-        try:
-            ret = r.json()
-        except Exception:
-            return True
+                self._logger.exception('Request hook %r failed', hook)
+
+    def _event_create(self, name, method, retry_count, time_serialize, kwargs):
+        """
+        Create request event and call pre hooks
+        :return: YandexConnectRequestEvent
+        """
+        event = YandexConnectRequestEvent(name, method, org_id=self._org_id, retry_count=retry_count)
+        event.time_serialize = time_serialize
+        event.bytes_out = len(kwargs.get('data') or '')
+        self._hooks_call(self._hooks_pre, event)
+        return event
+
+    def __call__(self, name, data=None, method='post', retry_count=0):
+        """
+        Base request method
+        Failed request is repeated according to retry policy
+        Identical GET requests sent at the same time share one response
+        GET response is taken from response cache if it is fresh, write drops cached responses
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param retry_count: retries already done
+        :raise YandexConnectException: bad request, jsonify failed
+        :raise YandexConnectExceptionY: yandex exception
+        :return: dict
+        """
+        start = time.perf_counter()
+        method, url, kwargs = self.prepare(name, data, method)
+        time_serialize = time.perf_counter() - start
+        if self._response_cache is not None:
+            if method != 'get':
+                try:
+                    return self.send(name, data, method, url, kwargs, retry_count, time_serialize)
+                finally:
+                    self._response_cache.invalidate(self._org_id, name)
+            cache_key = self._response_cache.key_get(self._org_id, name, url, kwargs['params'])
+            entry = self._response_cache.get(cache_key) if cache_key is not None else None
+            if entry is not None:
+                if self._response_cache.fresh(entry):
+                    return self._response_cache.value_get(entry)
+                kwargs['headers'].update(self._response_cache.headers_conditional(entry))
+            if self._flight is not None:
+                return self.send_coalesced(name, data, method, url, kwargs, retry_count, time_serialize,
+                                           cache_key, entry)
+            return self.send(name, data, method, url, kwargs, retry_count, time_serialize, cache_key, entry)
+        if method == 'get' and self._flight is not None:
+            return self.send_coalesced(name, data, method, url, kwargs, retry_count, time_serialize)
+        return self.send(name, data, method, url, kwargs, retry_count, time_serialize)
+
+    def send_sized(self, *args):
+        """
+        Send prepared request, see send
+        :return: tuple(result, response size)
+        """
+        ret = self.send(*args)
+        return ret, self._response_size.get()
+
+    def send_coalesced(self, name, data, method, url, kwargs, *args):
+        """
+        Send prepared request, identical requests sent at the same time share one response,
+        response size is set for every caller
+        :return: dict
+        """
+        ret, size = self._flight.do(self.flight_key(url, kwargs), self.send_sized, name, data, method, url, kwargs,
+                                    *args)
+        self._response_size.set(size)
         return ret
 
+    def flight_key(self, url, kwargs):
+        """
+        Key of identical requests for coalescing
+        :param url: request url
+        :param kwargs: request arguments
+        :return: tuple
+        """
+        params = kwargs.get('params')
+        return url, self._org_id, tuple(sorted((key, str(value)) for key, value in params.items())) if params else ()
+
+    def send(self, name, data, method, url, kwargs, retry_count=0, time_serialize=0.0, cache_key=None, entry=None):
+        """
+        Send prepared request
+        Failed request is repeated according to retry policy
+        Response of request with cache_key is stored to response cache, 304 Not Modified returns entry
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method
+        :param url: request url
+        :param kwargs: request arguments
+        :param retry_count: retries already done
+        :param time_serialize: seconds spent on request preparation
+        :param cache_key: key of response in response cache, None — response is not cached
+        :param entry: expired cached response, revalidated by conditional request
+        :raise YandexConnectException: bad request, jsonify failed
+        :raise YandexConnectExceptionY: yandex exception
+        :return: dict
+        """
+        hooked = bool(self._hooks_pre or self._hooks_post)
+
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug('YandexConnectRequest with "%s"', method)
+            self._logger.debug('URL: %s', url)
+            self._logger.debug(kwargs)
+
+        self._retry_policy.request_started()
+        while True:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire(method)
+
+            event = self._event_create(name, method, retry_count, time_serialize, kwargs) if hooked else None
+            start = time.perf_counter()
+            try:
+                r = self.transport.request(method, url, **kwargs)
+            except Exception as e:
+                if event is not None:
+                    event.time_network = time.perf_counter() - start
+                    event.error = e
+                    self._hooks_call(self._hooks_post, event)
+                delay = self._retry_policy.delay(method, retry_count, error=self.error_classify(e))
+                if delay is None:
+                    raise YandexConnectException(u'Request error: send', name, data) from e
+                self._logger.debug('Retry in %.2fs after error: %r', delay, e)
+                time.sleep(delay)
+                retry_count += 1
+                continue
+            if event is not None:
+                event.time_network = time.perf_counter() - start
+                event.status = r.status_code
+                event.bytes_in = len(r.content)
+
+            if debug:
+                self._logger.debug('Response code: %s', r.status_code)
+                self._logger.debug('Response text: %s', r.text)
+
+            if r.status_code == 304 and entry is not None:
+                if event is not None:
+                    self._hooks_call(self._hooks_post, event)
+                return self._response_cache.revalidated(name, cache_key, entry, r.headers)
+
+            if r.status_code > 299:
+                if event is not None:
+                    self._hooks_call(self._hooks_post, event)
+                delay = self._retry_policy.delay(method, retry_count, status_code=r.status_code, headers=r.headers)
+                if delay is not None:
+                    self._logger.debug('Retry in %.2fs after status %s', delay, r.status_code)
+                    time.sleep(delay)
+                    retry_count += 1
+                    continue
+                try:
+                    msg = r.json()
+                except Exception:
+                    msg = r.text
+                raise YandexConnectExceptionY(r.status_code, msg, url, kwargs)
+            if method == 'delete':
+                ret = True
+            else:
+                self._response_size.set(len(r.content))
+                start = time.perf_counter()
+                try:
+                    ret = r.json()
+                except Exception:
+                    ret = True
+                if event is not None:
+                    event.time_decode = time.perf_counter() - start
+                if cache_key is not None and ret is not True:
+                    self._response_cache.set(name, cache_key, r)
+            if event is not None:
+                self._hooks_call(self._hooks_post, event)
+            return ret
+
 
 class YandexConnectBase(object):
     """ Yandex connect API base class"""
@@ -199,16 +532,95 @@ class YandexConnectBase(object):
     DOMAIN = None  # Request Domain
 
     request = None  # Request object
-    cache = None  # Cache dict
-
-    def __init__(self, oauth_token, org_id=None, version=6, retry_max=3):
+    cache = None  # Cache object, YandexConnectCache
+    list_concurrency = 4  # Max pages fetched in parallel by list_full
+    page_sizer = None  # Page size of list sweeps, YandexConnectPageSizer
+    flight = None  # Single flight of cache fills, None — coalescing is off
+
+    def __init__(self, oauth_token, org_id=None, version=6, retry_max=3, pool_size=10, session=None,
+                 list_concurrency=4, cache=None, rate_limiter=None, retry_policy=None, domain=None,
+                 page_sizer=None, coalesce=True, transport=None, response_cache=None, timeout=(10, 60)):
         """
         :param oauth_token: OAuth token
         :param org_id: ID org
         :param version: API version
+        :param retry_max: max retry count, used if retry_policy is not set
+        :param pool_size: max keep-alive connections per host
+        :param session: requests.Session to share between clients
+        :param list_concurrency: max pages fetched in parallel by list_full
+        :param cache: YandexConnectCache, by default — YandexConnectMemoryCache
+        :param rate_limiter: YandexConnectRateLimiter, may be shared between clients
+        :param retry_policy: YandexConnectRetryPolicy, may be shared between clients
+        :param domain: request domain instead of DOMAIN, e.g. YandexConnectFakeServer.url
+        :param page_sizer: YandexConnectPageSizer, e.g. with per endpoint caps
+        :param coalesce: identical GET requests and cache fills running at the same time share one execution
+        :param transport: YandexConnectTransport, e.g. YandexConnectUrllib3Transport, may be shared between clients,
+                          it is not closed by close()
+        :param response_cache: YandexConnectResponseCache of read endpoints, may be shared between clients
+        :param timeout: seconds of default transport — (connect, read) | one value for both, None — without timeout
+        """
+        self.request = YandexConnectRequest(domain or self.DOMAIN, oauth_token, org_id=org_id, version=version, retry_max=retry_max,
+                                            pool_size=pool_size, session=session, rate_limiter=rate_limiter,
+                                            retry_policy=retry_policy, coalesce=coalesce, transport=transport,
+                                            response_cache=response_cache, timeout=timeout)
+        self.cache = cache if cache is not None else YandexConnectMemoryCache()
+        self.list_concurrency = list_concurrency
+        self.page_sizer = page_sizer if page_sizer is not None else YandexConnectPageSizer()
+        self.flight = self.request.flight_create(copy_result=False) if coalesce else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close connection pool
+        :return: None
+        """
+        self.request.close()
+
+    def coalesce(self, key, func, *args, **kwargs):
+        """
+        Execute cache fill, concurrent calls with the same key share one execution
+        :param key: hashable
+        :param func: callable, coroutine function for asyncio client
+        :return: result of func
+        """
+        if self.flight is None:
+            return func(*args, **kwargs)
+        return self.flight.do(key, func, *args, **kwargs)
+
+    def hook_add(self, pre=None, post=None):
+        """
+        Add request hooks, see YandexConnectRequest.hook_add
+        :param pre: callback before sending
+        :param post: callback after response or send error, e.g. YandexConnectStats
+        :return: None
+        """
+        self.request.hook_add(pre=pre, post=post)
+
+    def bulk(self, workers=8, progress=None):
+        """
+        Create bulk executor for different methods
+        :param workers: max simultaneous calls, should not exceed pool_size
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :return: YandexConnectBulk
+        """
+        return YandexConnectBulk(self, workers=workers, progress=progress)
+
+    def map(self, method, items, workers=8, progress=None):
+        """
+        Call method for every kwargs of items on a thread pool
+        :param method: method name, e.g. 'user_upd'
+        :param items: iterable of kwargs dict
+        :param workers: max simultaneous calls, should not exceed pool_size
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :return: list of YandexConnectBulkResult in input order
         """
-        self.request = YandexConnectRequest(self.DOMAIN, oauth_token, org_id=org_id, version=version, retry_max=retry_max)
-        self.cache = {}
+        total = len(items) if hasattr(items, '__len__') else None
+        return self.bulk(workers=workers, progress=progress).execute(((method, kwargs) for kwargs in items), total=total)
 
     @staticmethod
     def prepare_fields(fields, title_field, only_title_field=False):
@@ -230,26 +642,151 @@ class YandexConnectBase(object):
             fields = u','.join([el.strip() for el in fields.split(',') if el.strip()])
         return fields
 
+    def page_oversized(self, exc):
+        """
+        Check that page failed because of its size: response timeout or 413,
+        not because of server errors or throttling
+        :param exc: exception
+        :return: bool
+        """
+        if isinstance(exc, YandexConnectExceptionY):
+            return exc.args[0] == 413
+        return (isinstance(exc, YandexConnectException) and exc.__cause__ is not None
+                and self.request.timeout_check(exc.__cause__))
+
+    @staticmethod
+    def page_parts(kwargs):
+        """
+        Params of pages of half size which cover page: two for even size,
+        two or three for odd one, items out of page are dropped by page_parts_merge
+        :param kwargs: params of page
+        :return: list of dict
+        """
+        per_page = (kwargs['per_page'] + 1) // 2
+        start = (kwargs['page'] - 1) * kwargs['per_page']
+        end = start + kwargs['per_page']
+        return [dict(kwargs, page=page, per_page=per_page)
+                for page in range(start // per_page + 1, (end - 1) // per_page + 2)]
+
+    @staticmethod
+    def page_parts_merge(kwargs, parts):
+        """
+        Page response from responses of its parts
+        :param kwargs: params of page
+        :param parts: list of tuple(params of part, response of part), parts after last page are skipped
+        :return: yandex request dict
+        """
+        first_kwargs, first = parts[0]
+        total = first.get('total')
+        if total is None:
+            total = first['pages'] * first_kwargs['per_page']
+        items = []
+        for _, r in parts:
+            items += r['result']
+        offset = (kwargs['page'] - 1) * kwargs['per_page'] - (first_kwargs['page'] - 1) * first_kwargs['per_page']
+        return dict(first, result=items[offset:offset + kwargs['per_page']], page=kwargs['page'],
+                    per_page=kwargs['per_page'], pages=max(1, (total + kwargs['per_page'] - 1) // kwargs['per_page']))
+
+    def list_range(self, callback, **kwargs):
+        """
+        Request one page and record its time and size in page_sizer
+        Retries are done by retry policy of request, page failed because of its
+        size is requested by pages of half size, which are split again while
+        they fail, down to per_page_min of page_sizer
+        :param callback: callback function
+        :param kwargs: params with page and per_page
+        :return: yandex request dict
+        """
+        endpoint = callback.__name__
+        start = time.perf_counter()
+        try:
+            r = callback(**kwargs)
+        except Exception as e:
+            if not self.page_oversized(e) or not self.page_sizer.splittable(kwargs['per_page']):
+                raise
+            self.page_sizer.fail(endpoint, kwargs['per_page'])
+            parts = []
+            for part in self.page_parts(kwargs):
+                if parts and part['page'] > parts[0][1]['pages']:
+                    break
+                parts.append((part, self.list_range(callback, **part)))
+            return self.page_parts_merge(kwargs, parts)
+        self.page_sizer.observe(endpoint, kwargs['fields'], len(r['result']), time.perf_counter() - start,
+                                self.request.response_size)
+        return r
+
     def list_full(self, callback, default_field, **kwargs):
         """
         List full
+        First page is requested to get pages count, the rest are requested
+        in parallel, up to list_concurrency at once
+        Page size is chosen by page_sizer from fields and previous sweeps
         :param callback: callback function
         :param default_field: default field
         :param kwargs: params
         :return: list
         """
         kwargs['fields'] = self.prepare_fields(kwargs.get('fields'), default_field)
-        kwargs['per_page'] = 100
-        pages = None
-        page = 1
-        ret = []
-        while True:
-            kwargs['page'] = page
-            r = callback(**kwargs)
-            if pages is None:
-                pages = r['pages']
+        kwargs['per_page'] = self.page_sizer.size(callback.__name__, kwargs['fields'])
+        kwargs['page'] = 1
+        r = self.list_range(callback, **kwargs)
+        pages = r['pages']
+        ret = list(r['result'])
+        if pages <= 1:
+            return ret
+        page_kwargs = [dict(kwargs, page=page) for page in range(2, pages + 1)]
+        workers = min(self.list_concurrency, len(page_kwargs))
+        if workers <= 1:
+            results = [self.list_range(callback, **item) for item in page_kwargs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda item: self.list_range(callback, **item), page_kwargs))
+        for r in results:
             ret += r['result']
-            if page >= pages:
-                break
-            page += 1
         return ret
+
+    def list_pages(self, callback, default_field, page=1, per_page=None, prefetch=1, **kwargs):
+        """
+        Iterate over pages starting from given one
+        Up to prefetch next pages are requested in background while current page is consumed
+        :param callback: callback function
+        :param default_field: default field
+        :param page: first page
+        :param per_page: page size, by default — chosen by page_sizer
+        :param prefetch: pages requested in background
+        :param kwargs: params
+        :return: generator of tuple(page, yandex request dict)
+        """
+        kwargs['fields'] = self.prepare_fields(kwargs.get('fields'), default_field)
+        kwargs['per_page'] = per_page or self.page_sizer.size(callback.__name__, kwargs['fields'])
+        prefetch = max(1, prefetch)
+        executor = ThreadPoolExecutor(max_workers=prefetch)
+        try:
+            r = self.list_range(callback, **dict(kwargs, page=page))
+            pages = r['pages']
+            futures = collections.deque()
+            next_page = page + 1
+            while True:
+                while next_page <= pages and len(futures) < prefetch:
+                    futures.append(executor.submit(self.list_range, callback, **dict(kwargs, page=next_page)))
+                    next_page += 1
+                yield page, r
+                if not futures:
+                    break
+                r = futures.popleft().result()
+                page += 1
+        finally:
+            executor.shutdown(wait=False)
+
+    def list_iter(self, callback, default_field, **kwargs):
+        """
+        Iterate over all items page by page
+        Next page is requested in background while current page is consumed
+        :param callback: callback function
+        :param default_field: default field
+        :param kwargs: params
+        :return: generator
+        """
+        for page, r in self.list_pages(callback, default_field, **kwargs):
+            for item in r['result']:
+                yield item
@@ -0,0 +1,187 @@
+# coding: utf8
+
+"""
+Yandex.Connect bulk execution module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class YandexConnectBulkResult(object):
+    """ Result of one call of bulk execution """
+
+    __slots__ = ('index', 'method', 'kwargs', 'result', 'error')
+
+    def __init__(self, index, method, kwargs, result=None, error=None):
+        """
+        :param index: position in input
+        :param method: method name
+        :param kwargs: call arguments
+        :param result: method result
+        :param error: raised exception
+        """
+        self.index = index
+        self.method = method
+        self.kwargs = kwargs
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """
+        Call finished without exception
+        :return: bool
+        """
+        return self.error is None
+
+    def __repr__(self):
+        return '<YandexConnectBulkResult %s %s %s>' % (self.index, self.method, 'ok' if self.ok else repr(self.error))
+
+
+class YandexConnectBulk(object):
+    """
+    Run many client calls on a bounded thread pool
+    All calls share connection pool, cache and resolver of client,
+    exception of one call does not abort others
+    """
+
+    api = None  # Client object
+    workers = 8  # Max simultaneous calls
+    progress = None  # Callback — progress(done, total, result)
+
+    def __init__(self, api, workers=8, progress=None):
+        """
+        :param api: YandexConnectDirectory
+        :param workers: max simultaneous calls, should not exceed pool_size of client
+        :param progress: callback — progress(done, total, YandexConnectBulkResult), total is None for iterators
+        """
+        self.api = api
+        self.workers = workers
+        self.progress = progress
+        self._calls = []
+
+    def add(self, method, **kwargs):
+        """
+        Add call
+        :param method: method name, e.g. 'user_upd'
+        :param kwargs: call arguments
+        :return: self
+        """
+        self._calls.append((method, kwargs))
+        return self
+
+    def __len__(self):
+        return len(self._calls)
+
+    def run(self):
+        """
+        Execute added calls
+        :return: list of YandexConnectBulkResult in order of adding
+        """
+        calls, self._calls = self._calls, []
+        return self.execute(calls, total=len(calls))
+
+    def _call(self, index, method, kwargs):
+        """
+        Execute one call
+        :return: YandexConnectBulkResult
+        """
+        try:
+            return YandexConnectBulkResult(index, method, kwargs, result=getattr(self.api, method)(**kwargs))
+        except Exception as e:
+            return YandexConnectBulkResult(index, method, kwargs, error=e)
+
+    def execute(self, calls, total=None, keep=True):
+        """
+        Execute calls, input is consumed lazily, at most 2 * workers calls are queued
+        :param calls: iterable of tuple(method name, kwargs)
+        :param total: count of calls for progress callback
+        :param keep: collect results, False — results are passed only to progress callback
+        :return: list of YandexConnectBulkResult in input order, empty if keep is not set
+        """
+        ret = []
+        pending = set()
+        done_count = 0
+        calls = iter(enumerate(calls))
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            while True:
+                for index, (method, kwargs) in calls:
+                    pending.add(executor.submit(self._call, index, method, kwargs))
+                    if len(pending) >= 2 * self.workers:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if keep:
+                        ret.append(result)
+                    done_count += 1
+                    if self.progress is not None:
+                        self.progress(done_count, total, result)
+        ret.sort(key=lambda item: item.index)
+        return ret
+
+
+class AsyncYandexConnectBulk(YandexConnectBulk):
+    """
+    Run many coroutine calls of asyncio client, at most workers at once
+    All calls share session, cache and resolver of client,
+    exception of one call does not abort others
+    """
+
+    async def run(self):
+        """
+        Execute added calls
+        :return: list of YandexConnectBulkResult in order of adding
+        """
+        calls, self._calls = self._calls, []
+        return await self.execute(calls, total=len(calls))
+
+    async def _call(self, index, method, kwargs):
+        """
+        Execute one call
+        :return: YandexConnectBulkResult
+        """
+        try:
+            return YandexConnectBulkResult(index, method, kwargs, result=await getattr(self.api, method)(**kwargs))
+        except Exception as e:
+            return YandexConnectBulkResult(index, method, kwargs, error=e)
+
+    async def execute(self, calls, total=None, keep=True):
+        """
+        Execute calls, input is consumed lazily, at most workers calls are running
+        :param calls: iterable of tuple(method name, kwargs)
+        :param total: count of calls for progress callback
+        :param keep: collect results, False — results are passed only to progress callback
+        :return: list of YandexConnectBulkResult in input order, empty if keep is not set
+        """
+        import asyncio
+        ret = []
+        pending = set()
+        done_count = 0
+        calls = iter(enumerate(calls))
+        try:
+            while True:
+                for index, (method, kwargs) in calls:
+                    pending.add(asyncio.ensure_future(self._call(index, method, kwargs)))
+                    if len(pending) >= max(1, self.workers):
+                        break
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if keep:
+                        ret.append(result)
+                    done_count += 1
+                    if self.progress is not None:
+                        self.progress(done_count, total, result)
+        finally:
+            for task in pending:
+                task.cancel()
+        ret.sort(key=lambda item: item.index)
+        return ret
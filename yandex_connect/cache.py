@@ -0,0 +1,436 @@
+# coding: utf8
+
+"""
+Yandex.Connect cache module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class YandexConnectCache(object):
+    """
+    Cache interface
+    Values are stored by namespace and key, every namespace may have own TTL,
+    count of entries is bounded by max_size, least recently used are evicted first
+    """
+
+    ttl = 3600  # Default TTL in seconds, None — without expiration
+    ttls = None  # TTL by namespace
+    max_size = 100000  # Max count of entries
+
+    def __init__(self, ttl=3600, ttls=None, max_size=100000):
+        """
+        :param ttl: default TTL in seconds, None — without expiration
+        :param ttls: dict, TTL by namespace
+        :param max_size: max count of entries
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_size = max_size
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def ttl_get(self, namespace, ttl=None):
+        """
+        TTL of namespace
+        :param namespace: str
+        :param ttl: TTL to use instead of namespace TTL
+        :return: float | None
+        """
+        if ttl is not None:
+            return ttl
+        return self.ttls.get(namespace, self.ttl)
+
+    def expire_get(self, namespace, ttl=None):
+        """
+        Expiration timestamp for new entry of namespace
+        :param namespace: str
+        :param ttl: TTL to use instead of namespace TTL
+        :return: float | None
+        """
+        ttl = self.ttl_get(namespace, ttl)
+        if ttl is None:
+            return None
+        return time.time() + ttl
+
+    def stat_add(self, namespace, hit):
+        """
+        Count hit / miss
+        :param namespace: str
+        :param hit: bool
+        :return: None
+        """
+        with self._stats_lock:
+            stat = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            stat['hits' if hit else 'misses'] += 1
+
+    def stats(self):
+        """
+        Hit / miss counters
+        :return: dict — {namespace: {'hits': int, 'misses': int}}
+        """
+        with self._stats_lock:
+            return {namespace: dict(stat) for namespace, stat in self._stats.items()}
+
+    def get(self, namespace, key, default=None):
+        """
+        Get value
+        :param namespace: str
+        :param key: str / int
+        :param default: value if not found or expired
+        :return: value
+        """
+        raise NotImplementedError()
+
+    def set(self, namespace, key, value, ttl=None):
+        """
+        Set value
+        :param namespace: str
+        :param key: str / int
+        :param value: json serializable value
+        :param ttl: TTL instead of namespace TTL
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def set_many(self, namespace, mapping, ttl=None):
+        """
+        Set values
+        :param namespace: str
+        :param mapping: dict
+        :param ttl: TTL instead of namespace TTL
+        :return: None
+        """
+        for key, value in mapping.items():
+            self.set(namespace, key, value, ttl=ttl)
+
+    def replace(self, namespace, mapping, ttl=None):
+        """
+        Replace all values of namespace, readers do not see it empty:
+        new values are set first, then stale keys are deleted
+        :param namespace: str
+        :param mapping: dict
+        :param ttl: TTL instead of namespace TTL
+        :return: None
+        """
+        self.set_many(namespace, mapping, ttl=ttl)
+        for key, _ in self.items(namespace):
+            if key not in mapping:
+                self.delete(namespace, key)
+
+    def delete(self, namespace, key):
+        """
+        Delete value
+        :param namespace: str
+        :param key: str / int
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def items(self, namespace):
+        """
+        Not expired entries of namespace
+        :param namespace: str
+        :return: list of tuple(key, value)
+        """
+        raise NotImplementedError()
+
+    def clear(self, namespace=None):
+        """
+        Delete all values of namespace, or all values
+        :param namespace: str | None
+        :return: None
+        """
+        raise NotImplementedError()
+
+
+class YandexConnectMemoryCache(YandexConnectCache):
+    """
+    In-process cache
+    Every namespace has own LRU of max_size entries, so namespaces do not evict
+    each other. replace() keeps the whole mapping: bound of the namespace grows
+    to the size of the last replaced mapping, so max_size should be above the
+    usual size of set() namespaces, not of the largest list sweep
+    """
+
+    def __init__(self, ttl=3600, ttls=None, max_size=100000):
+        """
+        :param ttl: default TTL in seconds, None — without expiration
+        :param ttls: dict, TTL by namespace
+        :param max_size: max count of entries of one namespace
+        """
+        super(YandexConnectMemoryCache, self).__init__(ttl=ttl, ttls=ttls, max_size=max_size)
+        self._data = {}  # namespace: OrderedDict — key: (expire, value)
+        self._sizes = {}  # namespace: size of last replaced mapping
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(data) for data in self._data.values())
+
+    def _evict(self, namespace, data):
+        """
+        Delete least recently used entries of namespace over its bound
+        :return: None
+        """
+        size = max(self.max_size, self._sizes.get(namespace, 0))
+        while len(data) > size:
+            data.popitem(last=False)
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            data = self._data.get(namespace)
+            item = data.get(key) if data is not None else None
+            if item is not None and item[0] is not None and item[0] <= time.time():
+                del data[key]
+                item = None
+            if item is not None:
+                data.move_to_end(key)
+        self.stat_add(namespace, item is not None)
+        if item is None:
+            return default
+        return item[1]
+
+    def set(self, namespace, key, value, ttl=None):
+        expire = self.expire_get(namespace, ttl)
+        with self._lock:
+            data = self._data.setdefault(namespace, OrderedDict())
+            data[key] = (expire, value)
+            data.move_to_end(key)
+            self._evict(namespace, data)
+
+    def set_many(self, namespace, mapping, ttl=None):
+        expire = self.expire_get(namespace, ttl)
+        with self._lock:
+            data = self._data.setdefault(namespace, OrderedDict())
+            for key, value in mapping.items():
+                data[key] = (expire, value)
+                data.move_to_end(key)
+            self._evict(namespace, data)
+
+    def replace(self, namespace, mapping, ttl=None):
+        expire = self.expire_get(namespace, ttl)
+        data = OrderedDict((key, (expire, value)) for key, value in mapping.items())
+        with self._lock:
+            self._data[namespace] = data
+            self._sizes[namespace] = len(data)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            data = self._data.get(namespace)
+            if data is not None:
+                data.pop(key, None)
+
+    def items(self, namespace):
+        now = time.time()
+        with self._lock:
+            data = self._data.get(namespace)
+            if data is None:
+                return []
+            return [(key, item[1]) for key, item in data.items() if item[0] is None or item[0] > now]
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+                self._sizes.clear()
+                return
+            self._data.pop(namespace, None)
+            self._sizes.pop(namespace, None)
+
+
+class YandexConnectSQLiteCache(YandexConnectCache):
+    """
+    SQLite file cache, may be shared by several processes on one host
+    Keys and values are stored as json
+    """
+
+    EVICT_EVERY = 100  # Check size after every N writes
+
+    def __init__(self, path, ttl=3600, ttls=None, max_size=100000, timeout=30):
+        """
+        :param path: database file path
+        :param ttl: default TTL in seconds, None — without expiration
+        :param ttls: dict, TTL by namespace
+        :param max_size: max count of entries
+        :param timeout: seconds to wait for database lock
+        """
+        super(YandexConnectSQLiteCache, self).__init__(ttl=ttl, ttls=ttls, max_size=max_size)
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        with self.connection as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, expire REAL, atime REAL NOT NULL, '
+                         'PRIMARY KEY (namespace, key))')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_atime ON cache (atime)')
+
+    @property
+    def connection(self):
+        """
+        Connection of current thread
+        :return: sqlite3.Connection
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = conn
+        return conn
+
+    def close(self):
+        """
+        Close connection of current thread
+        :return: None
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+    def _evict(self, conn, force=False):
+        """
+        Delete expired and least recently used entries over max_size
+        :return: None
+        """
+        self._writes += 1
+        if not force and self._writes % self.EVICT_EVERY:
+            return
+        conn.execute('DELETE FROM cache WHERE expire IS NOT NULL AND expire <= ?', (time.time(),))
+        conn.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY atime '
+                     'LIMIT max(0, (SELECT COUNT(*) FROM cache) - ?))', (self.max_size,))
+
+    def get(self, namespace, key, default=None):
+        key = json.dumps(key)
+        now = time.time()
+        with self.connection as conn:
+            row = conn.execute('SELECT value, expire FROM cache WHERE namespace = ? AND key = ?',
+                               (namespace, key)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+                row = None
+            if row is not None:
+                conn.execute('UPDATE cache SET atime = ? WHERE namespace = ? AND key = ?', (now, namespace, key))
+        self.stat_add(namespace, row is not None)
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        self.set_many(namespace, {key: value}, ttl=ttl)
+
+    def set_many(self, namespace, mapping, ttl=None):
+        expire = self.expire_get(namespace, ttl)
+        now = time.time()
+        with self.connection as conn:
+            conn.executemany('INSERT OR REPLACE INTO cache (namespace, key, value, expire, atime) VALUES (?, ?, ?, ?, ?)',
+                             [(namespace, json.dumps(key), json.dumps(value), expire, now)
+                              for key, value in mapping.items()])
+            self._evict(conn, force=len(mapping) > 1)
+
+    def replace(self, namespace, mapping, ttl=None):
+        expire = self.expire_get(namespace, ttl)
+        now = time.time()
+        with self.connection as conn:
+            conn.execute('DELETE FROM cache WHERE namespace = ?', (namespace,))
+            conn.executemany('INSERT OR REPLACE INTO cache (namespace, key, value, expire, atime) VALUES (?, ?, ?, ?, ?)',
+                             [(namespace, json.dumps(key), json.dumps(value), expire, now)
+                              for key, value in mapping.items()])
+            self._evict(conn, force=True)
+
+    def delete(self, namespace, key):
+        with self.connection as conn:
+            conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, json.dumps(key)))
+
+    def items(self, namespace):
+        rows = self.connection.execute('SELECT key, value FROM cache WHERE namespace = ? AND (expire IS NULL OR expire > ?)',
+                                       (namespace, time.time())).fetchall()
+        return [(json.loads(key), json.loads(value)) for key, value in rows]
+
+    def clear(self, namespace=None):
+        with self.connection as conn:
+            if namespace is None:
+                conn.execute('DELETE FROM cache')
+            else:
+                conn.execute('DELETE FROM cache WHERE namespace = ?', (namespace,))
+
+
+class YandexConnectCacheNamespace(YandexConnectCache):
+    """
+    View of shared cache with own prefix of namespaces, e.g. per organization
+    TTL of namespace is taken from shared cache ttls by namespace without prefix
+    """
+
+    cache = None  # Shared YandexConnectCache
+    prefix = None  # Namespace prefix
+
+    def __init__(self, cache, prefix):
+        """
+        :param cache: shared YandexConnectCache
+        :param prefix: namespace prefix, e.g. organization ID
+        """
+        super(YandexConnectCacheNamespace, self).__init__(ttl=cache.ttl, ttls=cache.ttls, max_size=cache.max_size)
+        self.cache = cache
+        self.prefix = prefix
+        self._namespaces = set()
+        self._lock = threading.Lock()
+
+    def namespace_get(self, namespace):
+        """
+        Namespace in shared cache, TTL of namespace is copied to shared cache on first use
+        :param namespace: str
+        :return: str
+        """
+        ret = '%s:%s' % (self.prefix, namespace)
+        if namespace not in self._namespaces:
+            with self._lock:
+                if namespace in self.cache.ttls:
+                    self.cache.ttls.setdefault(ret, self.cache.ttls[namespace])
+                self._namespaces.add(namespace)
+        return ret
+
+    def stats(self):
+        start = '%s:' % self.prefix
+        return {namespace[len(start):]: stat for namespace, stat in self.cache.stats().items()
+                if namespace.startswith(start)}
+
+    def get(self, namespace, key, default=None):
+        return self.cache.get(self.namespace_get(namespace), key, default=default)
+
+    def set(self, namespace, key, value, ttl=None):
+        self.cache.set(self.namespace_get(namespace), key, value, ttl=ttl)
+
+    def set_many(self, namespace, mapping, ttl=None):
+        self.cache.set_many(self.namespace_get(namespace), mapping, ttl=ttl)
+
+    def replace(self, namespace, mapping, ttl=None):
+        self.cache.replace(self.namespace_get(namespace), mapping, ttl=ttl)
+
+    def delete(self, namespace, key):
+        self.cache.delete(self.namespace_get(namespace), key)
+
+    def items(self, namespace):
+        return self.cache.items(self.namespace_get(namespace))
+
+    def clear(self, namespace=None):
+        """
+        Delete all values of namespace, or of all namespaces used by this view
+        :param namespace: str | None
+        :return: None
+        """
+        if namespace is not None:
+            self.cache.clear(self.namespace_get(namespace))
+            return
+        with self._lock:
+            namespaces = list(self._namespaces)
+        for namespace in namespaces:
+            self.cache.clear(self.namespace_get(namespace))
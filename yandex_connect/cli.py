@@ -0,0 +1,169 @@
+# coding: utf8
+
+"""
+Yandex.Connect command line module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .base import token_get_by_code
+from .directory import YandexConnectDirectory
+from .exporter import YandexConnectExport
+from .importer import YandexConnectImport, rows_read
+
+
+def progress_print(stream=sys.stderr, interval=0.5):
+    """
+    Progress callback printing rows, errors and throughput not more often than interval
+    :param stream: output stream
+    :param interval: seconds between lines
+    :return: func — progress(YandexConnectImportStats)
+    """
+    last = [0.0]
+
+    def progress(stats):
+        now = time.monotonic()
+        if now - last[0] < interval and stats.finished is None:
+            return
+        last[0] = now
+        stream.write('\rrows: %s, done: %s, errors: %s, %.1f rows/s ' % (
+            stats.offset, stats.done, stats.errors, stats.rate
+        ))
+        stream.flush()
+    return progress
+
+
+def token_check(args):
+    """
+    OAuth token from arguments or environment
+    :param args: argparse.Namespace
+    :return: str | None
+    """
+    token = args.token or os.environ.get('YANDEX_CONNECT_TOKEN')
+    if not token:
+        sys.stderr.write('OAuth token is required: --token or YANDEX_CONNECT_TOKEN\n')
+    return token
+
+
+def import_run(args):
+    """
+    Command import
+    :param args: argparse.Namespace
+    :return: int — exit code
+    """
+    token = token_check(args)
+    if not token:
+        return 2
+    checkpoint = args.checkpoint
+    if checkpoint is None and args.path != '-':
+        checkpoint = '%s.checkpoint' % args.path
+    progress = progress_print() if not args.quiet else None
+    with YandexConnectDirectory(token, org_id=args.org_id, pool_size=max(10, args.workers), domain=args.url) as api:
+        importer = YandexConnectImport(api, args.entity, workers=args.workers, log=args.log, checkpoint=checkpoint,
+                                       checkpoint_every=args.checkpoint_every, progress=progress)
+        stats = importer.run(rows_read(args.path, fmt=args.format, encoding=args.encoding))
+    if progress is not None:
+        progress(stats)
+        sys.stderr.write('\n')
+    return 1 if stats.errors else 0
+
+
+def export_run(args):
+    """
+    Command export
+    :param args: argparse.Namespace
+    :return: int — exit code
+    """
+    token = token_check(args)
+    if not token:
+        return 2
+    last = [0.0]
+
+    def progress(entity, count):
+        now = time.monotonic()
+        if now - last[0] >= 0.5:
+            last[0] = now
+            sys.stderr.write('\r%s: %s ' % (entity, count))
+            sys.stderr.flush()
+
+    with YandexConnectDirectory(token, org_id=args.org_id, pool_size=max(10, args.workers), domain=args.url) as api:
+        exporter = YandexConnectExport(api, args.path, fmt=args.format,
+                                       compress=None if args.compress == 'none' else args.compress,
+                                       entities=args.entities.split(','), members=args.members,
+                                       workers=args.workers, progress=None if args.quiet else progress)
+        counts = exporter.run()
+    if not args.quiet:
+        sys.stderr.write('\r%s\n' % ', '.join('%s: %s' % item for item in counts.items()))
+    return 0
+
+
+def token_run(args):
+    """
+    Command token
+    :param args: argparse.Namespace
+    :return: int — exit code
+    """
+    token_get_by_code()
+    return 0
+
+
+def parser_create():
+    """
+    Command line arguments parser
+    :return: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog='yandex-connect', description='Yandex.Connect Directory API tools')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    command = commands.add_parser('import', help='import users, departments or group members from CSV / JSONL')
+    command.add_argument('entity', choices=YandexConnectImport.ENTITIES)
+    command.add_argument('path', help='CSV / JSONL file, - for stdin')
+    command.add_argument('--format', choices=('csv', 'jsonl'), help='input format, by default — by extension')
+    command.add_argument('--encoding', default='utf-8')
+    command.add_argument('--token', help='OAuth token, by default — YANDEX_CONNECT_TOKEN environment variable')
+    command.add_argument('--org-id', type=int)
+    command.add_argument('--url', help='Directory API url, for tests')
+    command.add_argument('--workers', type=int, default=8, help='rows in parallel')
+    command.add_argument('--log', help='JSONL results log file, appended')
+    command.add_argument('--checkpoint', help='checkpoint file, by default — <path>.checkpoint')
+    command.add_argument('--checkpoint-every', type=int, default=100, help='rows between checkpoint saves')
+    command.add_argument('--quiet', action='store_true', help='do not print progress')
+    command.set_defaults(func=import_run)
+
+    command = commands.add_parser('export', help='export users, departments, groups and members to JSONL / CSV')
+    command.add_argument('path', help='export directory, unfinished export in it is continued')
+    command.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    command.add_argument('--compress', choices=('gzip', 'bz2', 'xz', 'none'), default='gzip')
+    command.add_argument('--entities', default='users,departments,groups', help='comma separated entities')
+    command.add_argument('--members', action='store_true', help='export group members')
+    command.add_argument('--token', help='OAuth token, by default — YANDEX_CONNECT_TOKEN environment variable')
+    command.add_argument('--org-id', type=int)
+    command.add_argument('--url', help='Directory API url, for tests')
+    command.add_argument('--workers', type=int, default=8, help='pages in advance and member requests in parallel')
+    command.add_argument('--quiet', action='store_true', help='do not print progress')
+    command.set_defaults(func=export_run)
+
+    command = commands.add_parser('token', help='get OAuth token by confirmation code')
+    command.set_defaults(func=token_run)
+    return parser
+
+
+def main(argv=None):
+    """
+    Console script entry point
+    :param argv: arguments, by default — sys.argv
+    :return: int — exit code
+    """
+    args = parser_create().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
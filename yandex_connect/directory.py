@@ -8,13 +8,31 @@ Yandex.Connect Directory API module
 """
 
 from .base import *
-from inspect import currentframe
+from .membership import YandexConnectMembershipGraph
+from .reconcile import YandexConnectReconcile
+from .records import fields_id_add, YandexConnectRecordList, YandexConnectUser, YandexConnectDepartment, YandexConnectGroup
+from .resolver import YandexConnectResolver
+from .tree import YandexConnectDepartmentTree
 
 
 class YandexConnectDirectory(YandexConnectBase):
     """ Yandex connect directory API base class """
 
     DOMAIN = u'https://api.directory.yandex.net'  # Request Domain
+    MEMBERS_CHUNK_SIZE = 500  # Max operations in one members bulk-update request
+
+    resolver = None  # Identity resolver
+    tree = None  # Department tree index, see department_tree
+    membership = None  # Transitive group membership graph, see group_membership
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param negative_ttl: seconds to remember not found nickname / email
+        Other params are the same as in YandexConnectBase
+        """
+        negative_ttl = kwargs.pop('negative_ttl', 60)
+        super(YandexConnectDirectory, self).__init__(*args, **kwargs)
+        self.resolver = YandexConnectResolver(self, negative_ttl=negative_ttl)
 
     # ------------------------------------------------------------------------------------------------------------------
     # Helper functions
@@ -69,21 +87,11 @@ class YandexConnectDirectory(YandexConnectBase):
     def user_get_id_by_nickname(self, nickname):
         """
         Get user id by nickname
-        :param nickname: nickname / email
+        :param nickname: nickname / alias / email
+        :raise YandexConnectException: not found
         :return: int
         """
-        if nickname.find('@') > -1:
-            nickname = nickname[:nickname.find('@')]
-        if 'user_id_by_email' not in self.cache:
-            self.cache['user_id_by_email'] = {}
-        if nickname not in self.cache['user_id_by_email']:
-            user_items = self.user_list_full(nickname=nickname)
-            if user_items:
-                val = user_items[0]['id']
-            else:
-                raise YandexConnectException('No found user by nickname "%s"' % nickname)
-            self.cache['user_id_by_email'][nickname] = val
-        return self.cache['user_id_by_email'][nickname]
+        return self.resolver.user_id(nickname)
 
     def user_id_check(self, user_id):
         """
@@ -98,6 +106,14 @@ class YandexConnectDirectory(YandexConnectBase):
                 user_id = int(user_id)
         return user_id
 
+    def user_ids_check(self, user_ids):
+        """
+        Prepare list of user_id to request, all nicknames / emails are resolved at once
+        :param user_ids: list of int / str
+        :return: list of int
+        """
+        return self.member_ids_check(user_ids, 'user')
+
     def user_info(self, user_id, fields=None):
         """
         Получение информации о сотруднике
@@ -149,6 +165,44 @@ class YandexConnectDirectory(YandexConnectBase):
         group_id = self.group_id_check(group_id)
         return self.list_full(self.user_list, 'nickname', **inspect_args_func(currentframe()))
 
+    def iter_users(self, fields=None, id=None, nickname=None, department_id=None, recursive_department_id=None, group_id=None, recursive_group_id=None, is_dismissed=None):
+        """
+        Перебор всех сотрудников по страницам, следующая страница загружается в фоне
+        :param fields: поля, по умолчанию id, nickname
+        :param id: фильтр
+        :param nickname: фильтр
+        :param department_id: фильтр
+        :param recursive_department_id: фильтр
+        :param group_id: фильтр
+        :param recursive_group_id: фильтр
+        :param is_dismissed: фильтр
+        :url man: https://tech.yandex.ru/connect/directory/api/concepts/users/read-users-list-docpage/
+        :return: generator - сотрудники
+        """
+        group_id = self.group_id_check(group_id)
+        return self.list_iter(self.user_list, 'nickname', **inspect_args_func(currentframe()))
+
+    def user_record(self, user_id, fields=None):
+        """
+        Сотрудник в виде YandexConnectUser, остальные поля загружаются при обращении
+        :param user_id: ID | nickname | email
+        :param fields: поля, по умолчанию: id, nickname
+        :return: YandexConnectUser
+        """
+        return YandexConnectUser(self.user_info(user_id, fields=fields_id_add(fields, ['nickname'])), api=self)
+
+    def user_records(self, fields=None, **filters):
+        """
+        Полный список сотрудников в виде YandexConnectUser
+        Поле, которого нет в записи, при первом обращении загружается
+        сразу для всего списка одним обходом user_list_full
+        :param fields: поля, по умолчанию id, nickname
+        :param filters: фильтры user_list_full
+        :return: YandexConnectRecordList
+        """
+        items = self.user_list_full(fields=fields_id_add(fields, ['nickname']), **filters)
+        return YandexConnectRecordList(self, YandexConnectUser, items, filters)
+
     def user_add(self, nickname, password, about=None, aliases=None, birthday=None, contacts=None, department_id=1, gender='male', is_admin=None, is_dismissed=None, name=None, secname=None, sername=None, position=None):
         """
         Добавление сотрудника
@@ -158,7 +212,7 @@ class YandexConnectDirectory(YandexConnectBase):
         :param aliases: list, ['псевдоним1', ...]
         :param birthday: datetime.date, день рождения
         :param contacts: list, Контакты в типах яндекса, либо [tuple('type', 'value'), ...]
-        :param department_id: ID отдела, 1
+        :param department_id: ID | label отдела, 1
         :param gender: Пол — male|female
         :param is_admin: bool, Администор
         :param is_dismissed: bool, Увольнение
@@ -169,13 +223,18 @@ class YandexConnectDirectory(YandexConnectBase):
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/users/add-user-docpage/
         :return: yandex request dict — созданный сотрудник
         """
+        department_id = self.department_id_check(department_id)
         data = inspect_args_func(currentframe())
         spos = data['nickname'].find('@')
         if spos > -1:
             data['nickname'] = data['nickname'][:spos]
         self.prepare_name(data)
         data['contacts'] = self.prepare_contacts(data['contacts'])
-        return self.request('users', data, method='post')
+        ret = self.request('users', data, method='post')
+        self.resolver.item_set('user', ret)
+        if self.tree is not None:
+            self.tree.user_set(ret)
+        return ret
 
     def user_upd(self, user_id, password=None, about=None, birthday=None, contacts=None, department_id=None, gender=None, is_admin=None, is_dismissed=None, name=None, secname=None, sername=None, position=None, is_enabled=None):
         """
@@ -186,7 +245,7 @@ class YandexConnectDirectory(YandexConnectBase):
         :param aliases: list, ['псевдоним1', ...]
         :param birthday: datetime.date, день рождения
         :param contacts: list, Контакты в типах яндекса, либо [tuple('type', 'value'), ...]
-        :param department_id: ID отдела, 1
+        :param department_id: ID | label отдела
         :param gender: Пол — male|female
         :param is_admin: bool, Администор
         :param is_dismissed: bool, Увольнение
@@ -199,10 +258,16 @@ class YandexConnectDirectory(YandexConnectBase):
         :return: yandex request dict — измененный сотрудник
         """
         user_id = self.user_id_check(user_id)
+        department_id = self.department_id_check(department_id)
         data = inspect_args_func(currentframe())
         self.prepare_name(data)
         data['contacts'] = self.prepare_contacts(data['contacts'])
-        return self.request('users/%s' % user_id, data, method='patch')
+        ret = self.request('users/%s' % user_id, data, method='patch')
+        if self.membership is not None and department_id is not None:
+            self.membership.user_set(user_id, department_id)
+        if self.tree is not None and department_id is not None:
+            self.tree.user_set({'id': user_id, 'department_id': department_id})
+        return ret
 
     def user_alias_add(self, user_id, name):
         """
@@ -213,12 +278,27 @@ class YandexConnectDirectory(YandexConnectBase):
         :return: yandex request dict
         """
         user_id = self.user_id_check(user_id)
-        return self.request('users/%s/aliases' % user_id, inspect_args_func(currentframe()), method='post')
+        ret = self.request('users/%s/aliases' % user_id, inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('user', {'id': user_id, 'aliases': [name]})
+        return ret
 
     # ------------------------------------------------------------------------------------------------------------------
     # Department
     # ------------------------------------------------------------------------------------------------------------------
 
+    def department_id_check(self, department_id):
+        """
+        Prepare department_id for request
+        :param department_id: int / str — ID, label or name
+        :return: int
+        """
+        if isinstance(department_id, str):
+            if not department_id.isdigit():
+                department_id = self.resolver.department_id(department_id)
+            else:
+                department_id = int(department_id)
+        return department_id
+
     def department_list(self, fields=None, page=None, per_page=None):
         """
         Получение списка отделов
@@ -241,6 +321,15 @@ class YandexConnectDirectory(YandexConnectBase):
         """
         return self.list_full(self.department_list, 'name', **inspect_args_func(currentframe()))
 
+    def iter_departments(self, fields=None):
+        """
+        Перебор всех отделов по страницам, следующая страница загружается в фоне
+        :param fields: поля, по умолчанию - id, name
+        :url man: https://tech.yandex.ru/connect/directory/api/concepts/departments/read-departments-list-docpage/
+        :return: generator - отделы
+        """
+        return self.list_iter(self.department_list, 'name', **inspect_args_func(currentframe()))
+
     def department_info(self, department_id, fields=None):
         """
         Получение информации об отделе
@@ -248,8 +337,42 @@ class YandexConnectDirectory(YandexConnectBase):
         :param fields: поля, по умолчанию - id
         :return: yandex request dict
         """
+        department_id = self.department_id_check(department_id)
         return self.request('departments/%s' % department_id, inspect_args_func(currentframe()), method='get')
 
+    def department_record(self, department_id, fields=None):
+        """
+        Отдел в виде YandexConnectDepartment, остальные поля загружаются при обращении
+        :param department_id: ID | label | name
+        :param fields: поля, по умолчанию - id, name
+        :return: YandexConnectDepartment
+        """
+        item = self.department_info(department_id, fields=','.join(fields_id_add(fields, ['name'])))
+        return YandexConnectDepartment(item, api=self)
+
+    def department_records(self, fields=None):
+        """
+        Полный список отделов в виде YandexConnectDepartment
+        :param fields: поля, по умолчанию - id, name
+        :return: YandexConnectRecordList
+        """
+        items = self.department_list_full(fields=fields_id_add(fields, ['name']))
+        return YandexConnectRecordList(self, YandexConnectDepartment, items)
+
+    def department_tree(self, users=True, refresh=False):
+        """
+        Индекс дерева отделов: родитель, путь до корня, поддерево и сотрудники
+        отдела без запросов к API. Строится одним обходом department_list_full
+        (и user_list_full), изменения через department_add / department_upd /
+        department_del применяются к индексу локально
+        :param users: загружать отделы сотрудников
+        :param refresh: перестроить индекс заново
+        :return: YandexConnectDepartmentTree
+        """
+        if self.tree is None or refresh or (users and not self.tree.with_users):
+            self.tree = self.coalesce(('department_tree', users), YandexConnectDepartmentTree(self, users=users).refresh)
+        return self.tree
+
     def department_add(self, name, label, description=None, head_id=None, parent_id=1):
         """
         Добавление отдела
@@ -257,11 +380,16 @@ class YandexConnectDirectory(YandexConnectBase):
         :param label: рассылка
         :param description: описание
         :param head_id: id руководителя отдела
-        :param parent_id:  id родительского отдела, 1
+        :param parent_id:  id | label родительского отдела, 1
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/departments/create-department-docpage/
         :return: yandex request dict - созданный отдел
         """
-        return self.request('departments', inspect_args_func(currentframe()), method='post')
+        parent_id = self.department_id_check(parent_id)
+        ret = self.request('departments', inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('department', ret)
+        if self.tree is not None and isinstance(ret, dict):
+            self.tree.item_set(dict({'parent_id': parent_id}, **ret))
+        return ret
 
     def department_upd(self, department_id, name=None, description=None, head_id=None, label=None, parent_id=None):
         """
@@ -271,11 +399,20 @@ class YandexConnectDirectory(YandexConnectBase):
         :param label: рассылка
         :param description: описание
         :param head_id: id руководителя отдела
-        :param parent_id: id родительского отдела
+        :param parent_id: id | label родительского отдела
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/departments/edit-department-docpage/
         :return: yandex request dict - созданный отдел
         """
-        return self.request('departments/%s' % department_id, inspect_args_func(currentframe()), method='patch')
+        department_id = self.department_id_check(department_id)
+        parent_id = self.department_id_check(parent_id)
+        ret = self.request('departments/%s' % department_id, inspect_args_func(currentframe()), method='patch')
+        self.resolver.item_set('department', ret)
+        if self.tree is not None:
+            item = dict(ret) if isinstance(ret, dict) else {'id': department_id}
+            if parent_id is not None:
+                item.setdefault('parent_id', parent_id)
+            self.tree.item_set(item)
+        return ret
 
     def department_del(self, department_id):
         """
@@ -284,7 +421,12 @@ class YandexConnectDirectory(YandexConnectBase):
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/departments/delete-department-docpage/
         :return: bool
         """
-        return self.request('departments/%s' % department_id, method='delete')
+        department_id = self.department_id_check(department_id)
+        ret = self.request('departments/%s' % department_id, method='delete')
+        self.resolver.item_del('department', department_id)
+        if self.tree is not None:
+            self.tree.item_del(department_id)
+        return ret
 
     # ------------------------------------------------------------------------------------------------------------------
     # Group
@@ -295,24 +437,16 @@ class YandexConnectDirectory(YandexConnectBase):
         Set cache for groups
         :return: None
         """
-        all_groups = self.group_list_full(fields='id,email,name')
-        self.cache['group_id_by_email'] = {}
-        self.cache['group_id_by_name'] = {}
-        for item in all_groups:
-            self.cache['group_id_by_email'][item['email']] = item['id']
-            self.cache['group_id_by_name'][item['name']] = item['id']
+        self.resolver.refresh('group')
 
     def group_get_id_by_email(self, email):
         """
         Get group ID by email
-        :param email: email
+        :param email: email / name
+        :raise YandexConnectException: not found
         :return: int
         """
-        if 'group_id_by_email' not in self.cache:
-            self._group_cache_set()
-        if email not in self.cache['group_id_by_email']:
-            raise YandexConnectException('No found group by email "%s"' % email)
-        return self.cache['group_id_by_email'][email]
+        return self.resolver.group_id(email)
 
     def group_id_check(self, group_id):
         """
@@ -321,7 +455,7 @@ class YandexConnectDirectory(YandexConnectBase):
         :return: int
         """
         if isinstance(group_id, str):
-            if group_id.find('@') > -1:
+            if not group_id.isdigit():
                 group_id = self.group_get_id_by_email(group_id)
             else:
                 group_id = int(group_id)
@@ -351,6 +485,17 @@ class YandexConnectDirectory(YandexConnectBase):
             fields = ['name', 'email']
         return self.list_full(self.group_list, 'name', **inspect_args_func(currentframe()))
 
+    def iter_groups(self, fields=None):
+        """
+        Перебор всех команд по страницам, следующая страница загружается в фоне
+        :param fields: поля, по умолчанию — id, name, email
+        :url man: https://tech.yandex.ru/connect/directory/api/concepts/groups/read-groups-list-docpage/
+        :return: generator - команды
+        """
+        if not fields:
+            fields = ['name', 'email']
+        return self.list_iter(self.group_list, 'name', **inspect_args_func(currentframe()))
+
     def group_info(self, group_id, fields=None):
         """
         Получение информации о команде
@@ -364,6 +509,24 @@ class YandexConnectDirectory(YandexConnectBase):
         data['fields'] = self.prepare_fields(data['fields'], 'name')
         return self.request('groups/%s' % group_id, data, method='get')
 
+    def group_record(self, group_id, fields=None):
+        """
+        Команда в виде YandexConnectGroup, остальные поля загружаются при обращении
+        :param group_id: ID | email
+        :param fields: поля, по умолчанию — id, name
+        :return: YandexConnectGroup
+        """
+        return YandexConnectGroup(self.group_info(group_id, fields=fields_id_add(fields, ['name'])), api=self)
+
+    def group_records(self, fields=None):
+        """
+        Полный список команд в виде YandexConnectGroup
+        :param fields: поля, по умолчанию — id, name, email
+        :return: YandexConnectRecordList
+        """
+        items = self.group_list_full(fields=fields_id_add(fields, ['name', 'email']))
+        return YandexConnectRecordList(self, YandexConnectGroup, items)
+
     def group_add(self, name, label, admins=None, description=None, members=None, type=None):
         """
         Добавление команды
@@ -376,7 +539,13 @@ class YandexConnectDirectory(YandexConnectBase):
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/groups/create-group-docpage/
         :return: yandex request dict - созданная команда
         """
-        return self.request('groups', inspect_args_func(currentframe()), method='post')
+        if members is not None:
+            members = self.members_check(members)
+        ret = self.request('groups', inspect_args_func(currentframe()), method='post')
+        self.resolver.item_set('group', ret)
+        if self.membership is not None and isinstance(ret, dict):
+            self.membership.group_set(ret['id'], members)
+        return ret
 
     def group_upd(self, group_id, name=None, label=None, admins=None, description=None, members=None, type=None):
         """
@@ -392,7 +561,13 @@ class YandexConnectDirectory(YandexConnectBase):
         :return: yandex request dict - измененная команда
         """
         group_id = self.group_id_check(group_id)
-        return self.request('groups/%s' % group_id, inspect_args_func(currentframe()), method='patch')
+        if members is not None:
+            members = self.members_check(members)
+        ret = self.request('groups/%s' % group_id, inspect_args_func(currentframe()), method='patch')
+        self.resolver.item_set('group', ret)
+        if self.membership is not None and members is not None:
+            self.membership.group_set(group_id, members)
+        return ret
 
     def group_member_list(self, group_id):
         """
@@ -404,52 +579,159 @@ class YandexConnectDirectory(YandexConnectBase):
         group_id = self.group_id_check(group_id)
         return self.request('groups/%s/members' % group_id, method='get')
 
+    def group_membership(self, refresh=False):
+        """
+        Граф участников команд с транзитивным замыканием: действующие
+        сотрудники команды с учетом вложенных команд и отделов, проверка
+        членства и циклы — без запросов к API. Строится списком команд,
+        параллельной загрузкой group_member_list и деревом отделов.
+        Изменения участников через клиента пересчитывают только измененную
+        команду и команды, в которые она входит
+        :param refresh: построить граф заново
+        :return: YandexConnectMembershipGraph
+        """
+        if self.membership is None or refresh:
+            self.membership = self.coalesce('group_membership',
+                                            YandexConnectMembershipGraph(self, workers=self.list_concurrency).refresh)
+        return self.membership
+
+    def member_ids_check(self, member_ids, member_type='user'):
+        """
+        Prepare list of member IDs to request, all strings are resolved at once
+        :param member_ids: list of int / str
+        :param member_type: user|group|department
+        :return: list of int
+        """
+        keys = [item for item in member_ids if isinstance(item, str) and not item.isdigit()]
+        resolved = {}
+        if keys:
+            resolved = dict(zip(keys, self.resolver.resolve_many(member_type, keys)))
+        ret = []
+        for item in member_ids:
+            if item in resolved:
+                item = resolved[item]
+            elif isinstance(item, str):
+                item = int(item)
+            ret.append(item)
+        return ret
+
+    def members_check(self, members):
+        """
+        Prepare members to request, IDs of every type are resolved at once
+        :param members: list — [{"type": "<user|group|department>", "id": ID | email | nickname},...]
+        :return: list — members with int IDs
+        """
+        ids = {}
+        for item in members:
+            ids.setdefault(item.get('type', 'user'), []).append(item['id'])
+        resolved = {member_type: iter(self.member_ids_check(items, member_type)) for member_type, items in ids.items()}
+        return [dict(item, id=next(resolved[item.get('type', 'user')])) for item in members]
+
+    def _group_member_bulk(self, group_id, operation_type, member_ids, member_type='user'):
+        """
+        Add / remove many members by chunked bulk-update requests
+        :param group_id: ID
+        :param operation_type: add|remove
+        :param member_ids: list of ID / email
+        :param member_type: user|group|department
+        :return: list — yandex request per chunk
+        """
+        member_ids = self.member_ids_check(member_ids, member_type)
+        actions = [{'operation_type': operation_type, 'value': {'id': member_id, 'type': member_type}}
+                   for member_id in member_ids]
+        ret = []
+        for i in range(0, len(actions), self.MEMBERS_CHUNK_SIZE):
+            ret.append(self.group_member_update(group_id, actions[i:i + self.MEMBERS_CHUNK_SIZE]))
+        return ret
+
     def group_member_add(self, group_id, user_id, user_type='user'):
         """
         Добавить участника команды
+        Список участников сначала целиком преобразуется в ID, затем
+        добавляется запросами bulk-update, до MEMBERS_CHUNK_SIZE в каждом
         :param group_id: ID | email
         :type group_id: int | str
         :param user_id: User ID | list | email
         :type user_id: int | list | str
         :param user_type: Тип - user|group|department
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/groups/add-group-member-docpage/
-        :return: yandex request dict | list
+        :return: yandex request dict | list — ответы bulk-update для списка
         """
         group_id = self.group_id_check(group_id)
         if isinstance(user_id, list):
-            ret = []
-            for user_item_id in user_id:
-                ret.append(self.group_member_add(group_id, user_item_id, user_type=user_type))
-            return ret
-        user_id = self.user_id_check(user_id)
+            return self._group_member_bulk(group_id, 'add', user_id, member_type=user_type)
+        user_id = self.member_ids_check([user_id], user_type)[0]
         data = {
             'id': user_id,
             'type': user_type
         }
-        return self.request('groups/%s/members' % group_id, data, method='post')
+        ret = self.request('groups/%s/members' % group_id, data, method='post')
+        if self.membership is not None:
+            self.membership.update(group_id, [{'operation_type': 'add', 'value': data}])
+        return ret
 
-    def group_member_del(self, group_id, user_id):
+    def group_member_del(self, group_id, user_id, user_type='user'):
         """
         Удалить участника команды
-        :param group_id: ID
-        :param user_id: User ID
+        :param group_id: ID | email
+        :param user_id: User ID | list | email
+        :param user_type: Тип - user|group|department
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/groups/bulk-add-group-member-docpage/
-        :return: True
+        :return: yandex request | list — ответы bulk-update для списка
         """
         group_id = self.group_id_check(group_id)
-        user_id = self.user_id_check(user_id)
-        return self.group_member_update(group_id, [{'operation_type': 'remove', 'value': {'id': user_id, 'type': 'user'}}])
+        if isinstance(user_id, list):
+            return self._group_member_bulk(group_id, 'remove', user_id, member_type=user_type)
+        user_id = self.member_ids_check([user_id], user_type)[0]
+        return self.group_member_update(group_id, [{'operation_type': 'remove', 'value': {'id': user_id, 'type': user_type}}])
 
     def group_member_update(self, group_id, actions):
         """
         Изменение участников команды
         :param group_id: ID
-        :param actions: list, [{"operation_type": "<add|remove>", "value": {"type": "<user|group|department>", "id": ID User}},..]
+        :param actions: list, [{"operation_type": "<add|remove>", "value": {"type": "<user|group|department>", "id": ID | email | nickname}},..]
         :url man: https://tech.yandex.ru/connect/directory/api/concepts/groups/bulk-add-group-member-docpage/
         :return: True
         """
         group_id = self.group_id_check(group_id)
-        return self.request('groups/%s/members/bulk-update' % group_id, data=actions, method='post')
+        members = self.members_check([action['value'] for action in actions])
+        actions = [dict(action, value=value) for action, value in zip(actions, members)]
+        ret = self.request('groups/%s/members/bulk-update' % group_id, data=actions, method='post')
+        if self.membership is not None:
+            self.membership.update(group_id, actions)
+        return ret
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Reconcile
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def reconcile(self, departments=None, users=None, groups=None, members_remove=True, dry_run=False, workers=8, progress=None,
+                  missing_ok=False):
+        """
+        Привести организацию к желаемому состоянию минимальным числом запросов
+        Текущее состояние загружается обходами списков, для отделов и сотрудников
+        отправляются только измененные поля (department_upd / user_upd), участники
+        команд — пакетами bulk-update. Этапы выполняются по порядку: отделы,
+        сотрудники, участники; запросы одного этапа — параллельно. Отсутствующие
+        отделы (label и name) и сотрудники (nickname и password) создаются,
+        новые отделы — волнами, сначала родители
+        :param departments: list — [{"id" | "label": ..., "name": ..., "parent_id": ID | label, ...}, ...]
+        :param users: list — [{"id" | "nickname": ..., "position": ..., "department_id": ID | label, ...}, ...]
+        :param groups: dict — {ID | email группы: [ID | nickname | (type, ID | email | label), ...]}
+        :param members_remove: удалять участников команд, которых нет в желаемом списке
+        :param dry_run: только составить план
+        :param workers: максимум одновременных запросов
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :param missing_ok: выполнять план, если часть объектов не найдена и не может быть создана
+        :raise YandexConnectException: в плане есть plan.missing и missing_ok не задан
+        :return: YandexConnectReconcilePlan — план, results и errors после выполнения
+        """
+        plan = YandexConnectReconcile(self, workers=self.list_concurrency).plan(
+            departments=departments, users=users, groups=groups, members_remove=members_remove
+        )
+        if not dry_run:
+            plan.run(self, workers=workers, progress=progress, missing_ok=missing_ok)
+        return plan
 
     # ------------------------------------------------------------------------------------------------------------------
     # Domain
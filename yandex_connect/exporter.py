@@ -0,0 +1,271 @@
+# coding: utf8
+
+"""
+Yandex.Connect streaming export module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import bz2
+import collections
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import YandexConnectException, json_default
+from .snapshot import YandexConnectSnapshot
+
+
+class YandexConnectExport(object):
+    """
+    Export of users, departments, groups and group members to JSONL / CSV files
+    Pages are written to file as they arrive, so memory does not depend on
+    organization size. Every page is written as separate compressed stream
+    (gzip / bz2 / xz files may consist of many streams) and the checkpoint
+    is saved after it, interrupted export is continued from the last written
+    page: file is truncated to the saved size and pages are requested again
+    with the same page size. Group members are written in order of group ID,
+    members of groups are requested in parallel
+    """
+
+    ENTITIES = {
+        'users': ('user_list', 'nickname', 'id,nickname,email,name,gender,position,department_id,about,birthday,'
+                                           'contacts,aliases,is_admin,is_dismissed,is_enabled,groups'),
+        'departments': ('department_list', 'name', 'id,name,label,email,description,parent_id,head,members_count'),
+        'groups': ('group_list', 'name', 'id,name,label,email,type,description,members_count,admins'),
+    }  # entity: (list method name, default field, default exported fields)
+    MEMBER_FIELDS = ('group_id', 'type', 'id')  # Exported member fields
+    COMPRESSORS = {
+        None: ('', None),
+        'gzip': ('.gz', lambda raw: gzip.GzipFile(fileobj=raw, mode='wb')),
+        'bz2': ('.bz2', lambda raw: bz2.BZ2File(raw, 'wb')),
+        'xz': ('.xz', lambda raw: lzma.LZMAFile(raw, 'wb')),
+    }  # compress: (file suffix, stream factory)
+    CHECKPOINT = 'export.checkpoint'  # Checkpoint file name in export directory
+
+    api = None  # YandexConnectDirectory
+    path = None  # Export directory
+    fmt = 'jsonl'  # jsonl|csv
+    compress = 'gzip'  # gzip|bz2|xz|None
+    entities = ('users', 'departments', 'groups')  # Exported entities
+    members = False  # Export group members
+    fields = None  # dict — {entity: comma separated fields}
+    workers = 8  # Pages requested in advance, group_member_list requests in parallel
+    progress = None  # Callback — progress(entity, count)
+
+    def __init__(self, api, path, fmt='jsonl', compress='gzip', entities=('users', 'departments', 'groups'),
+                 members=False, fields=None, workers=8, progress=None):
+        """
+        :param api: YandexConnectDirectory
+        :param path: export directory, created if not exists
+        :param fmt: jsonl|csv
+        :param compress: gzip|bz2|xz|None
+        :param entities: list of users|departments|groups
+        :param members: export group members to members file
+        :param fields: dict — {entity: comma separated fields}, by default — ENTITIES fields
+        :param workers: pages requested in advance, group_member_list requests in parallel
+        :param progress: callback — progress(entity, count of written items)
+        """
+        if fmt not in ('jsonl', 'csv'):
+            raise YandexConnectException('Unknown format "%s", expected jsonl|csv' % fmt)
+        if compress not in self.COMPRESSORS:
+            raise YandexConnectException('Unknown compression "%s", expected gzip|bz2|xz' % compress)
+        for entity in entities:
+            if entity not in self.ENTITIES:
+                raise YandexConnectException('Unknown entity "%s", expected %s' % (entity, '|'.join(self.ENTITIES)))
+        self.api = api
+        self.path = path
+        self.fmt = fmt
+        self.compress = compress
+        self.entities = tuple(entities)
+        self.members = members
+        self.fields = dict(fields or {})
+        self.workers = workers
+        self.progress = progress
+
+    def file_path(self, entity):
+        """
+        Export file path of entity
+        :param entity: users|departments|groups|members
+        :return: str
+        """
+        return os.path.join(self.path, '%s.%s%s' % (entity, self.fmt, self.COMPRESSORS[self.compress][0]))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Checkpoint
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def checkpoint_load(self):
+        """
+        Load checkpoint of unfinished export with the same settings
+        :return: dict — {entity: state}
+        """
+        checkpoint_path = os.path.join(self.path, self.CHECKPOINT)
+        if not os.path.exists(checkpoint_path):
+            return {}
+        with open(checkpoint_path, encoding='utf-8') as f:
+            ret = json.load(f)
+        if ret.get('finished') or ret.get('fmt') != self.fmt or ret.get('compress') != self.compress:
+            return {}
+        return ret.get('entities', {})
+
+    def checkpoint_save(self, state, finished=False):
+        """
+        Save checkpoint atomically
+        :param state: dict — {entity: state}
+        :param finished: export is finished
+        :return: None
+        """
+        checkpoint_path = os.path.join(self.path, self.CHECKPOINT)
+        tmp_path = '%s.tmp' % checkpoint_path
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fmt': self.fmt, 'compress': self.compress, 'finished': finished, 'entities': state}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def file_open(self, entity, size):
+        """
+        Open export file for writing from size
+        :param entity: users|departments|groups|members
+        :param size: bytes written before, 0 — new file
+        :return: file object
+        """
+        file_path = self.file_path(entity)
+        if not size or not os.path.exists(file_path):
+            return open(file_path, 'wb')
+        raw = open(file_path, 'r+b')
+        raw.truncate(size)
+        raw.seek(size)
+        return raw
+
+    def dump(self, items, fields, header=False):
+        """
+        Serialize items
+        :param items: list of dict
+        :param fields: list of field names, CSV columns
+        :param header: write CSV header
+        :return: bytes
+        """
+        if self.fmt == 'jsonl':
+            return ''.join(json.dumps(item, ensure_ascii=False, default=json_default) + '\n'
+                           for item in items).encode('utf-8')
+        stream = io.StringIO()
+        writer = csv.writer(stream)
+        if header:
+            writer.writerow(fields)
+        for item in items:
+            writer.writerow([
+                json.dumps(item[field], ensure_ascii=False) if isinstance(item.get(field), (dict, list))
+                else item.get(field, '') for field in fields
+            ])
+        return stream.getvalue().encode('utf-8')
+
+    def write(self, raw, data):
+        """
+        Write data as separate compressed stream
+        :param raw: file object
+        :param data: bytes
+        :return: None
+        """
+        factory = self.COMPRESSORS[self.compress][1]
+        if factory is None:
+            raw.write(data)
+        else:
+            stream = factory(raw)
+            stream.write(data)
+            stream.close()
+        raw.flush()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def entity_export(self, entity, state, checkpoint):
+        """
+        Export pages of entity list from the last written page
+        :param entity: users|departments|groups
+        :param state: dict — page, per_page, size, count, done
+        :param checkpoint: dict — {entity: state}, saved after every page
+        :return: None
+        """
+        method, default_field, fields = self.ENTITIES[entity]
+        fields = self.fields.get(entity, fields)
+        columns = fields.split(',')
+        callback = getattr(self.api, method)
+        with self.file_open(entity, state.get('size')) as raw:
+            pages = self.api.list_pages(callback, default_field, page=state.get('page', 0) + 1,
+                                        per_page=state.get('per_page'), prefetch=self.workers, fields=fields)
+            for page, r in pages:
+                self.write(raw, self.dump(r['result'], columns, header=page == 1))
+                state.update(page=page, per_page=r.get('per_page') or state.get('per_page'), size=raw.tell(),
+                             count=state.get('count', 0) + len(r['result']))
+                self.checkpoint_save(checkpoint)
+                if self.progress is not None:
+                    self.progress(entity, state['count'])
+        state['done'] = True
+        self.checkpoint_save(checkpoint)
+
+    def members_export(self, state, checkpoint):
+        """
+        Export direct members of groups with ID after the last written group
+        :param state: dict — group_id, size, count, done
+        :param checkpoint: dict — {entity: state}, saved after every group
+        :return: None
+        """
+        last_id = state.get('group_id', 0)
+        group_ids = sorted(item['id'] for item in self.api.group_list_full(fields='id') if item['id'] > last_id)
+
+        def members_get(group_id):
+            return [{'group_id': group_id, 'type': member_type, 'id': member_id} for member_type, member_id in
+                    (YandexConnectSnapshot.member_prepare(item) for item in self.api.group_member_list(group_id))]
+
+        with self.file_open('members', state.get('size')) as raw:
+            header = not state.get('size')
+            futures = collections.deque()
+            group_ids = iter(group_ids)
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+                while True:
+                    for group_id in group_ids:
+                        futures.append((group_id, executor.submit(members_get, group_id)))
+                        if len(futures) >= 2 * self.workers:
+                            break
+                    if not futures:
+                        break
+                    group_id, future = futures.popleft()
+                    items = future.result()
+                    self.write(raw, self.dump(items, self.MEMBER_FIELDS, header=header))
+                    header = False
+                    state.update(group_id=group_id, size=raw.tell(), count=state.get('count', 0) + len(items))
+                    self.checkpoint_save(checkpoint)
+                    if self.progress is not None:
+                        self.progress('members', state['count'])
+        state['done'] = True
+        self.checkpoint_save(checkpoint)
+
+    def run(self):
+        """
+        Export entities, continue unfinished export if checkpoint exists
+        :return: dict — {entity: count of items}
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        checkpoint = self.checkpoint_load()
+        entities = list(self.entities) + (['members'] if self.members else [])
+        for entity in entities:
+            state = checkpoint.setdefault(entity, {})
+            if state.get('done'):
+                continue
+            if entity == 'members':
+                self.members_export(state, checkpoint)
+            else:
+                self.entity_export(entity, state, checkpoint)
+        self.checkpoint_save(checkpoint, finished=True)
+        return {entity: checkpoint[entity].get('count', 0) for entity in entities}
@@ -0,0 +1,377 @@
+# coding: utf8
+
+"""
+Yandex.Connect local fake Directory API server for benchmarks and tests
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class YandexConnectFakeServer(object):
+    """
+    In-process HTTP server implementing users / departments / groups / domains /
+    organizations endpoints of Directory API v6 with pagination, configurable
+    latency, injected 5xx / 429 errors and generated organization of given size
+    GET responses have ETag changed by every write through API, request with
+    the same If-None-Match is answered 304 Not Modified
+    """
+
+    PER_PAGE_MAX = 1000  # Max per_page of list endpoints
+
+    def __init__(self, users=1000, departments=20, groups=50, members=20, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=0, seed=0, host='127.0.0.1', port=0):
+        """
+        :param users: count of generated users
+        :param departments: count of generated departments
+        :param groups: count of generated groups
+        :param members: users per generated group
+        :param latency: seconds added to every response
+        :param error_rate: share of requests answered 503
+        :param throttle_rate: share of requests answered 429
+        :param retry_after: Retry-After header value of 429 response
+        :param seed: random seed
+        :param host: listen host
+        :param port: listen port, 0 — any free
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._version = 0  # Count of writes, ETag of GET responses
+        self.data = {'users': {}, 'departments': {}, 'groups': {}, 'domains': {}}
+        self.members = {}
+        self.generate(users, departments, groups, members)
+        self._server = ThreadingHTTPServer((host, port), self.handler_create())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Data
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def id_next(self, collection):
+        """
+        Next object ID of collection
+        :param collection: users|departments|groups
+        :return: int
+        """
+        self._ids[collection] = self._ids.get(collection, {'users': 1000000000000000}.get(collection, 0)) + 1
+        return self._ids[collection]
+
+    def generate(self, users, departments, groups, members):
+        """
+        Generate organization
+        :return: None
+        """
+        rnd = self._random
+        for i in range(max(1, departments)):
+            item_id = self.id_next('departments')
+            self.data['departments'][item_id] = {
+                'id': item_id,
+                'name': 'Department %s' % item_id if item_id > 1 else 'Root',
+                'label': 'department%s' % item_id,
+                'parent_id': rnd.randint(1, item_id - 1) if item_id > 1 else None,
+            }
+        department_ids = list(self.data['departments'])
+        for i in range(users):
+            item_id = self.id_next('users')
+            self.data['users'][item_id] = {
+                'id': item_id,
+                'nickname': 'user%s' % i,
+                'email': 'user%s@example.com' % i,
+                'aliases': ['alias%s' % i],
+                'department_id': rnd.choice(department_ids),
+                'name': {'first': 'First%s' % i, 'last': 'Last%s' % i},
+                'position': rnd.choice(['Engineer', 'Manager', 'Analyst']),
+                'is_dismissed': False,
+            }
+        user_ids = list(self.data['users'])
+        for i in range(groups):
+            item_id = self.id_next('groups')
+            self.data['groups'][item_id] = {
+                'id': item_id,
+                'name': 'Group %s' % item_id,
+                'email': 'group%s@example.com' % item_id,
+                'label': 'group%s' % item_id,
+                'type': 'generic',
+            }
+            self.members[item_id] = [('user', user_id) for user_id in rnd.sample(user_ids, min(members, len(user_ids)))]
+        self.data['domains']['example.com'] = {'name': 'example.com', 'master': True}
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Server
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def url(self):
+        """
+        Base url of server, use as domain of client
+        :return: str
+        """
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        """
+        Start server in background thread
+        :return: self
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop server
+        :return: None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def client(self, cls=None, **kwargs):
+        """
+        Client connected to server
+        :param cls: client class, by default — YandexConnectDirectory
+        :param kwargs: client params
+        :return: client object
+        """
+        if cls is None:
+            from .directory import YandexConnectDirectory
+            cls = YandexConnectDirectory
+        return cls('fake-token', domain=self.url, **kwargs)
+
+    def transport(self):
+        """
+        In-process transport to server data without sockets, server need not be started
+        :return: YandexConnectMemoryTransport
+        """
+        from .transport import YandexConnectMemoryTransport
+        return YandexConnectMemoryTransport(self.handle)
+
+    def handler_create(self):
+        """
+        Request handler class bound to server
+        :return: class
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # Headers and body are sent separately, keep-alive responses stall otherwise
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, payload = server.handle(self.command.lower(), self.path, body, self.headers)
+                raw = b'' if payload is None else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+        return Handler
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------------------------------------------------------
+
+    ROUTE = re.compile(r'^/v\d+/(?P<collection>[a-z]+)/(?:(?P<id>[^/]+)/)?(?:(?P<sub>[a-z]+)/)?(?:(?P<action>[a-z-]+)/)?$')
+
+    def handle(self, method, path, body, headers=None):
+        """
+        Handle request
+        :param method: get/post/patch/delete
+        :param path: path with query
+        :param body: raw body
+        :param headers: request headers
+        :return: tuple(status, headers, payload)
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(path)
+        match = self.ROUTE.match(url.path)
+        endpoint = url.path
+        if match:
+            endpoint = '/'.join(part for part in [
+                match.group('collection'), match.group('id') and '{id}', match.group('sub'), match.group('action')
+            ] if part)
+        with self._lock:
+            self.calls[(method, endpoint)] += 1
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429, {'Retry-After': str(self.retry_after)}, {'code': 'too_many_requests'}
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, {}, {'code': 'unavailable'}
+        if not match:
+            return 404, {}, {'code': 'not_found'}
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        data = json.loads(body.decode('utf-8')) if body else None
+        with self._lock:
+            status, response_headers, payload = self.route(method, match.group('collection'), match.group('id'),
+                                                            match.group('sub'), match.group('action'), query, data)
+            if method != 'get':
+                if status < 300:
+                    self._version += 1
+                return status, response_headers, payload
+            etag = 'W/"%s"' % self._version
+        if status != 200:
+            return status, response_headers, payload
+        if headers is not None and headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, None
+        return status, dict(response_headers, ETag=etag), payload
+
+    @staticmethod
+    def fields_apply(item, fields):
+        """
+        Keep only requested fields
+        :return: dict
+        """
+        if not fields:
+            return dict(item)
+        return {key: item[key] for key in fields.split(',') if key in item}
+
+    def page_get(self, items, query):
+        """
+        Paginated list response
+        :return: dict
+        """
+        per_page = min(int(query.get('per_page') or 20), self.PER_PAGE_MAX)
+        page = int(query.get('page') or 1)
+        total = len(items)
+        pages = max(1, (total + per_page - 1) // per_page)
+        result = [self.fields_apply(item, query.get('fields')) for item in items[(page - 1) * per_page:page * per_page]]
+        return {'result': result, 'page': page, 'pages': pages, 'per_page': per_page, 'total': total}
+
+    def subtree_get(self, department_id):
+        """
+        IDs of department and all subdepartments
+        :return: set
+        """
+        ret = {department_id}
+        changed = True
+        while changed:
+            changed = False
+            for item in self.data['departments'].values():
+                if item['parent_id'] in ret and item['id'] not in ret:
+                    ret.add(item['id'])
+                    changed = True
+        return ret
+
+    def users_filter(self, query):
+        """
+        Apply users list filters
+        :return: list
+        """
+        items = list(self.data['users'].values())
+        if 'id' in query:
+            items = [item for item in items if str(item['id']) == query['id']]
+        if 'nickname' in query:
+            items = [item for item in items if item['nickname'] == query['nickname']]
+        if 'department_id' in query:
+            items = [item for item in items if str(item['department_id']) == query['department_id']]
+        if 'recursive_department_id' in query:
+            subtree = self.subtree_get(int(query['recursive_department_id']))
+            items = [item for item in items if item['department_id'] in subtree]
+        if 'group_id' in query:
+            user_ids = {member_id for member_type, member_id in self.members.get(int(query['group_id']), [])
+                        if member_type == 'user'}
+            items = [item for item in items if item['id'] in user_ids]
+        if 'is_dismissed' in query:
+            is_dismissed = query['is_dismissed'].lower() == 'true'
+            items = [item for item in items if item['is_dismissed'] == is_dismissed]
+        return items
+
+    def route(self, method, collection, item_id, sub, action, query, data):
+        """
+        Route request to collection
+        :return: tuple(status, headers, payload)
+        """
+        if collection == 'organizations' and method == 'get':
+            return 200, {}, self.page_get([{'id': 1, 'name': 'Organization'}], query)
+        if collection == 'domains':
+            if method == 'get':
+                return 200, {}, [self.fields_apply(item, query.get('fields')) for item in self.data['domains'].values()]
+            if method == 'post':
+                self.data['domains'][data['name']] = {'name': data['name'], 'master': False}
+                return 201, {}, self.data['domains'][data['name']]
+            if method == 'delete' and self.data['domains'].pop(item_id, None):
+                return 200, {}, None
+            return 404, {}, {'code': 'not_found'}
+        if collection not in ('users', 'departments', 'groups'):
+            return 404, {}, {'code': 'not_found'}
+        items = self.data[collection]
+        if item_id is None:
+            if method == 'get':
+                if collection == 'users':
+                    return 200, {}, self.page_get(self.users_filter(query), query)
+                return 200, {}, self.page_get(list(items.values()), query)
+            if method == 'post':
+                new_id = self.id_next(collection)
+                items[new_id] = dict(data or {}, id=new_id)
+                items[new_id].pop('password', None)
+                if collection == 'groups':
+                    self.members[new_id] = [(member['type'], member['id']) for member in (data or {}).get('members') or []]
+                return 201, {}, items[new_id]
+            return 405, {}, {'code': 'method_not_allowed'}
+        item_id = int(item_id)
+        if item_id not in items:
+            return 404, {}, {'code': 'not_found'}
+        if sub is None:
+            if method == 'get':
+                return 200, {}, self.fields_apply(items[item_id], query.get('fields'))
+            if method == 'patch':
+                items[item_id].update(data or {})
+                items[item_id].pop('password', None)
+                return 200, {}, items[item_id]
+            if method == 'delete':
+                del items[item_id]
+                return 200, {}, None
+        if collection == 'users' and sub == 'aliases' and method == 'post':
+            items[item_id].setdefault('aliases', []).append(data['name'])
+            return 201, {}, {'name': data['name']}
+        if collection == 'groups' and sub == 'members':
+            members = self.members.setdefault(item_id, [])
+            if action is None and method == 'get':
+                return 200, {}, [{'type': member_type, 'object': {'id': member_id}} for member_type, member_id in members]
+            if action is None and method == 'post':
+                member = (data.get('type', 'user'), int(data['id']))
+                if member not in members:
+                    members.append(member)
+                return 201, {}, {'type': member[0], 'id': member[1]}
+            if action == 'bulk-update' and method == 'post':
+                for operation in data:
+                    member = (operation['value'].get('type', 'user'), int(operation['value']['id']))
+                    if operation['operation_type'] == 'add' and member not in members:
+                        members.append(member)
+                    elif operation['operation_type'] == 'remove' and member in members:
+                        members.remove(member)
+                return 200, {}, [{'type': member_type, 'id': member_id} for member_type, member_id in members]
+        return 404, {}, {'code': 'not_found'}
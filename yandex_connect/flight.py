@@ -0,0 +1,116 @@
+# coding: utf8
+
+"""
+Yandex.Connect request coalescing module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import copy
+import threading
+
+
+class YandexConnectFlight(object):
+    """ One execution shared by concurrent callers """
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self, event=None):
+        """
+        :param event: event set when execution is finished, created by the first waiter if not set
+        """
+        self.event = event
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class YandexConnectSingleFlight(object):
+    """
+    Concurrent calls with the same key share one execution and its result
+    or exception, the next call after it finished is executed again
+    With copy_result, if somebody waited for execution, every caller gets own
+    deep copy of result, so a caller may change its result
+    """
+
+    copy_result = False  # Callers get own deep copies of shared result
+
+    def __init__(self, copy_result=False):
+        """
+        :param copy_result: callers get own deep copies of shared result, e.g. of API responses
+        """
+        self.copy_result = copy_result
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # Calls served by execution of another caller
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Execute func or wait for execution with the same key
+        :param key: hashable
+        :param func: callable
+        :return: result of func
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = YandexConnectFlight()
+                leader = True
+            else:
+                if flight.event is None:
+                    flight.event = threading.Event()
+                flight.waiters += 1
+                self.shared += 1
+                leader = False
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result) if self.copy_result else flight.result
+        try:
+            flight.result = func(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                event = flight.event
+            if event is not None:
+                event.set()
+        return copy.deepcopy(flight.result) if self.copy_result and flight.waiters else flight.result
+
+
+class AsyncYandexConnectSingleFlight(YandexConnectSingleFlight):
+    """ Single flight of coroutines of one event loop """
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        Await func or execution with the same key
+        :param key: hashable
+        :param func: coroutine function
+        :return: result of func
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            if flight.event is None:
+                import asyncio
+                flight.event = asyncio.Event()
+            flight.waiters += 1
+            self.shared += 1
+            await flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result) if self.copy_result else flight.result
+        flight = self._flights[key] = YandexConnectFlight()
+        try:
+            flight.result = await func(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            del self._flights[key]
+            if flight.event is not None:
+                flight.event.set()
+        return copy.deepcopy(flight.result) if self.copy_result and flight.waiters else flight.result
@@ -0,0 +1,235 @@
+# coding: utf8
+
+"""
+Yandex.Connect HTTP response cache module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+from .cache import YandexConnectMemoryCache
+from .metrics import endpoint_get
+
+
+class YandexConnectResponseCache(object):
+    """
+    Cache of GET responses of read endpoints, keyed by organization, path and
+    query params (fields too). Fresh response is returned without request,
+    expired response with ETag / Last-Modified is kept for stale_ttl and
+    revalidated by conditional request: 304 Not Modified makes it fresh again
+
+    Write through the client drops responses of written collection and related
+    collections: every collection of organization has random generation in
+    the cache, write replaces it, so invalidation does not scan entries and
+    is seen by other processes sharing YandexConnectSQLiteCache
+    """
+
+    NAMESPACE = 'response'  # Namespace of responses in cache
+    NAMESPACE_GENERATION = 'response_generation'  # Namespace of collection generations in cache
+    TTLS = {
+        'users/{id}': 300,
+        'departments/{id}': 300,
+        'groups/{id}': 300,
+        'domains': 3600,
+        'organizations': 3600,
+    }  # TTL in seconds by endpoint, responses of other endpoints are not cached
+    INVALIDATES = {
+        'users': ('users', 'departments', 'groups'),
+        'departments': ('departments', 'users', 'groups'),
+        'groups': ('groups', 'users', 'departments'),
+        'domains': ('domains', 'organizations'),
+    }  # Written collection: dropped collections, by default — written collection only
+
+    cache = None  # YandexConnectCache of responses
+    ttls = None  # TTL by endpoint
+    stale_ttl = 86400  # Seconds to keep expired response with ETag / Last-Modified for revalidation
+
+    def __init__(self, cache=None, ttls=None, stale_ttl=86400, max_size=10000):
+        """
+        :param cache: YandexConnectCache, e.g. YandexConnectSQLiteCache shared by processes,
+                      by default — YandexConnectMemoryCache of max_size
+        :param ttls: dict, TTL by endpoint, e.g. {'groups/{id}/members': 60}, added to TTLS, None — not cached
+        :param stale_ttl: seconds to keep expired response with ETag / Last-Modified for revalidation
+        :param max_size: max count of responses in default cache
+        """
+        self.cache = cache if cache is not None else YandexConnectMemoryCache(max_size=max_size)
+        self.ttls = dict(self.TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self._stats = {'hits': 0, 'not_modified': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def ttl_get(self, name):
+        """
+        TTL of endpoint
+        :param name: url path, e.g. users/12
+        :return: float | None — not cached
+        """
+        return self.ttls.get(endpoint_get(name))
+
+    def stat_add(self, kind):
+        """
+        Count response source
+        :param kind: hits|not_modified|misses
+        :return: None
+        """
+        with self._lock:
+            self._stats[kind] += 1
+
+    def stats(self):
+        """
+        Counters of responses: from cache, revalidated by 304 and requested
+        :return: dict — {'hits': int, 'not_modified': int, 'misses': int}
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Generations
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def generation_new(self, org_id, collection):
+        """
+        Replace generation of collection, responses of previous generation are not used any more
+        :param org_id: organization ID
+        :param collection: users|departments|groups|domains|organizations
+        :return: str
+        """
+        ret = '%08x' % random.getrandbits(32)
+        self.cache.set(self.NAMESPACE_GENERATION, '%s:%s' % (org_id, collection), ret, ttl=self.stale_ttl)
+        return ret
+
+    def generation_get(self, org_id, collection):
+        """
+        Generation of collection, new one if not found
+        :param org_id: organization ID
+        :param collection: users|departments|groups|domains|organizations
+        :return: str
+        """
+        ret = self.cache.get(self.NAMESPACE_GENERATION, '%s:%s' % (org_id, collection))
+        if ret is None:
+            ret = self.generation_new(org_id, collection)
+        return ret
+
+    def invalidate(self, org_id, name):
+        """
+        Drop responses of collections changed by write
+        :param org_id: organization ID
+        :param name: url path of write, e.g. groups/12/members
+        :return: None
+        """
+        collection = name.strip('/').split('/')[0]
+        for item in self.INVALIDATES.get(collection, (collection,)):
+            self.generation_new(org_id, item)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Responses
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def key_get(self, org_id, name, url, params=None):
+        """
+        Cache key of GET request
+        :param org_id: organization ID
+        :param name: url path
+        :param url: request url
+        :param params: dict — query params
+        :return: str | None — endpoint is not cached
+        """
+        if self.ttl_get(name) is None:
+            return None
+        return '%s:%s:%s?%s' % (org_id, self.generation_get(org_id, name.strip('/').split('/')[0]), url,
+                                urlencode(sorted((key, str(value)) for key, value in params.items()))
+                                if params else '')
+
+    def get(self, key):
+        """
+        Cached response
+        :param key: cache key
+        :return: dict — content, expire, etag, last_modified | None
+        """
+        return self.cache.get(self.NAMESPACE, key)
+
+    @staticmethod
+    def fresh(entry):
+        """
+        Cached response may be returned without request
+        :param entry: cached response
+        :return: bool
+        """
+        return entry['expire'] > time.time()
+
+    def value_get(self, entry):
+        """
+        Result of fresh cached response
+        :param entry: cached response
+        :return: dict
+        """
+        self.stat_add('hits')
+        return json.loads(entry['content'])
+
+    @staticmethod
+    def headers_conditional(entry):
+        """
+        Headers of revalidation request
+        :param entry: expired cached response
+        :return: dict
+        """
+        ret = {}
+        if entry.get('etag'):
+            ret['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            ret['If-Modified-Since'] = entry['last_modified']
+        return ret
+
+    def set(self, name, key, response):
+        """
+        Cache response
+        :param name: url path
+        :param key: cache key
+        :param response: transport response
+        :return: None
+        """
+        self.stat_add('misses')
+        self.entry_set(name, key, response.text, response.headers)
+
+    def entry_set(self, name, key, content, headers, entry=None):
+        """
+        Store response, expired response is kept for revalidation if it has ETag / Last-Modified
+        :param name: url path
+        :param key: cache key
+        :param content: str — body
+        :param headers: response headers
+        :param entry: previous cached response, its validators are used if response has not own
+        :return: dict — cached response
+        """
+        ttl = self.ttl_get(name)
+        etag = headers.get('ETag') or (entry or {}).get('etag')
+        last_modified = headers.get('Last-Modified') or (entry or {}).get('last_modified')
+        ret = {'content': content, 'expire': time.time() + ttl, 'etag': etag, 'last_modified': last_modified}
+        self.cache.set(self.NAMESPACE, key, ret, ttl=max(ttl, self.stale_ttl) if etag or last_modified else ttl)
+        return ret
+
+    def revalidated(self, name, key, entry, headers):
+        """
+        Make cached response fresh after 304 Not Modified
+        :param name: url path
+        :param key: cache key
+        :param entry: expired cached response
+        :param headers: headers of 304 response
+        :return: dict — result of cached response
+        """
+        self.stat_add('not_modified')
+        return json.loads(self.entry_set(name, key, entry['content'], headers, entry=entry)['content'])
+
+    def clear(self):
+        """
+        Drop all cached responses
+        :return: None
+        """
+        self.cache.clear(self.NAMESPACE)
+        self.cache.clear(self.NAMESPACE_GENERATION)
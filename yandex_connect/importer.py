@@ -0,0 +1,384 @@
+# coding: utf8
+
+"""
+Yandex.Connect streaming import module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from .base import YandexConnectException
+from .bulk import YandexConnectBulk
+
+
+def rows_read(path, fmt=None, encoding='utf-8'):
+    """
+    Read rows of CSV / JSONL file one by one
+    :param path: file path, '-' — stdin
+    :param fmt: csv|jsonl, by default — by file extension
+    :param encoding: file encoding
+    :return: generator of dict
+    """
+    if fmt is None:
+        fmt = 'jsonl' if path.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+    if path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, newline='')
+    else:
+        stream = open(path, encoding=encoding, newline='')
+    with stream:
+        if fmt == 'csv':
+            for row in csv.DictReader(stream):
+                yield row
+        else:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+class YandexConnectImport(object):
+    """
+    Streaming import of users, departments or group members
+    Rows are read lazily and executed on YandexConnectBulk thread pool:
+    existing objects are updated, missing ones are created, members are
+    added or removed. Every row result is written to JSONL log, number of
+    finished leading rows and numbers of rows finished after them — to
+    checkpoint file, so interrupted import is continued from it without
+    repeating finished rows. Rows which were running at interruption are
+    executed again on resume
+
+    Departments are created in file order: row waits for its parent row
+    if it is still running, parents should be placed before children.
+    Row with parent which is not found and is placed after it fails
+    """
+
+    ENTITIES = ('users', 'departments', 'members')  # Supported entities
+    USER_FIELDS = ('password', 'about', 'aliases', 'birthday', 'contacts', 'department_id', 'gender', 'is_admin',
+                   'is_dismissed', 'name', 'secname', 'sername', 'position', 'is_enabled')  # user_add / user_upd fields
+    DEPARTMENT_FIELDS = ('name', 'label', 'description', 'head_id', 'parent_id')  # department_add / upd fields
+    BOOL_FIELDS = ('is_admin', 'is_dismissed', 'is_enabled')  # Fields parsed as bool
+    TRUE_VALUES = ('1', 'true', 'yes', 'y', 'да')  # Strings parsed as True
+
+    api = None  # YandexConnectDirectory
+    entity = 'users'  # Imported entity
+    workers = 8  # Max rows in parallel
+    log_path = None  # JSONL results log file path
+    checkpoint_path = None  # Checkpoint file path
+    checkpoint_every = 100  # Rows between checkpoint saves
+    progress = None  # Callback — progress(YandexConnectImportStats)
+
+    def __init__(self, api, entity='users', workers=8, log=None, checkpoint=None, checkpoint_every=100, progress=None):
+        """
+        :param api: YandexConnectDirectory
+        :param entity: users|departments|members
+        :param workers: max rows in parallel, should not exceed pool_size of client
+        :param log: JSONL results log file path, appended
+        :param checkpoint: checkpoint file path, import is continued from it if exists
+        :param checkpoint_every: rows between checkpoint saves
+        :param progress: callback — progress(YandexConnectImportStats), called after every row
+        """
+        if entity not in self.ENTITIES:
+            raise YandexConnectException('Unknown entity "%s", expected %s' % (entity, '|'.join(self.ENTITIES)))
+        self.api = api
+        self.entity = entity
+        self.workers = workers
+        self.log_path = log
+        self.checkpoint_path = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.progress = progress
+        self._running = {}  # department label: tuple(row number, threading.Event) of row which is not finished
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Values
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @classmethod
+    def row_prepare(cls, row):
+        """
+        Drop empty values, parse CSV strings: bools, JSON lists, comma separated aliases,
+        contacts as "type:value,type:value"
+        :param row: dict
+        :return: dict
+        """
+        ret = {}
+        for key, value in row.items():
+            if key is None or value is None:
+                continue
+            key = key.strip()
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    continue
+                if key in cls.BOOL_FIELDS:
+                    value = value.lower() in cls.TRUE_VALUES
+                elif key in ('aliases', 'contacts'):
+                    if value.startswith('['):
+                        value = json.loads(value)
+                    else:
+                        value = [item.strip() for item in value.split(',') if item.strip()]
+                        if key == 'contacts':
+                            value = [tuple(item.split(':', 1)) for item in value if ':' in item]
+            if key == 'contacts':
+                value = [tuple(item) if isinstance(item, list) else item for item in value]
+            ret[key] = value
+        return ret
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def user_import(self, row):
+        """
+        Update user found by id or nickname, create if not found
+        :param row: dict — id or nickname and fields of USER_FIELDS, department_id may be label
+        :return: dict — action and ID
+        """
+        kwargs = {key: row[key] for key in self.USER_FIELDS if key in row}
+        if 'department_id' in kwargs:
+            kwargs['department_id'] = self.api.department_id_check(kwargs['department_id'])
+        user_id = row.get('id')
+        if user_id is None:
+            if not row.get('nickname'):
+                raise YandexConnectException('Row has no id or nickname')
+            user_id = self.api.resolver.lookup('user', row['nickname'])
+        if user_id is None:
+            if not kwargs.get('password'):
+                raise YandexConnectException('New user "%s" has no password' % row['nickname'])
+            kwargs.pop('is_enabled', None)
+            ret = self.api.user_add(row['nickname'], **kwargs)
+            return {'action': 'add', 'id': ret.get('id') if isinstance(ret, dict) else None}
+        kwargs.pop('aliases', None)
+        self.api.user_upd(user_id, **kwargs)
+        return {'action': 'upd', 'id': int(user_id)}
+
+    def department_import(self, row, index=None):
+        """
+        Update department found by id or label, create if not found
+        :param row: dict — id or label and fields of DEPARTMENT_FIELDS, parent_id may be label,
+            head_id — nickname
+        :param index: row number, parent row is waited only if it is placed before
+        :return: dict — action and ID
+        """
+        kwargs = {key: row[key] for key in self.DEPARTMENT_FIELDS if key in row}
+        if 'parent_id' in kwargs:
+            parent = kwargs['parent_id']
+            running = None
+            if isinstance(parent, str) and parent.lower() != str(row.get('label', '')).lower():
+                with self._lock:
+                    running = self._running.get(parent.lower())
+            if running is not None:
+                parent_index, event = running
+                if index is None or parent_index < index:
+                    event.wait()
+                elif self.api.resolver.lookup('department', parent) is None:
+                    raise YandexConnectException('Parent department "%s" is created by row %s after this row, '
+                                                 'parents should be placed before children' % (parent, parent_index))
+            kwargs['parent_id'] = self.api.department_id_check(parent)
+        if 'head_id' in kwargs:
+            kwargs['head_id'] = self.api.user_id_check(kwargs['head_id'])
+        department_id = row.get('id')
+        if department_id is None:
+            if not row.get('label'):
+                raise YandexConnectException('Row has no id or label')
+            department_id = self.api.resolver.lookup('department', row['label'])
+        if department_id is None:
+            if not kwargs.get('name'):
+                raise YandexConnectException('New department "%s" has no name' % row['label'])
+            ret = self.api.department_add(**kwargs)
+            return {'action': 'add', 'id': ret.get('id') if isinstance(ret, dict) else None}
+        self.api.department_upd(department_id, **kwargs)
+        return {'action': 'upd', 'id': int(department_id)}
+
+    def member_import(self, row):
+        """
+        Add or remove group member
+        :param row: dict — group (ID | email), member (ID | nickname | label | email),
+            type (user|group|department, user by default), operation (add|remove, add by default)
+        :return: dict — action and group ID
+        """
+        if row.get('group') is None or row.get('member') is None:
+            raise YandexConnectException('Row has no group or member')
+        group_id = self.api.group_id_check(row['group'])
+        member_type = row.get('type', 'user')
+        operation = row.get('operation', 'add')
+        if operation == 'add':
+            self.api.group_member_add(group_id, row['member'], member_type)
+        elif operation == 'remove':
+            self.api.group_member_del(group_id, row['member'], member_type)
+        else:
+            raise YandexConnectException('Unknown operation "%s"' % operation)
+        return {'action': operation, 'id': group_id}
+
+    def row_import(self, row, index=None, label=None):
+        """
+        Import one row
+        :param row: prepared row
+        :param index: row number
+        :param label: department label registered as running
+        :return: dict
+        """
+        try:
+            if self.entity == 'departments':
+                return self.department_import(row, index=index)
+            return getattr(self, {'users': 'user_import', 'members': 'member_import'}[self.entity])(row)
+        finally:
+            if label is not None:
+                with self._lock:
+                    running = self._running.pop(label, None)
+                if running is not None:
+                    running[1].set()
+
+    @staticmethod
+    def row_key(row):
+        """
+        Key of row for log
+        :param row: dict
+        :return: value
+        """
+        for key in ('id', 'nickname', 'label', 'group'):
+            if row.get(key) is not None:
+                return row[key] if key != 'group' else '%s:%s' % (row['group'], row.get('member'))
+        return None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Checkpoint
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def checkpoint_load(self):
+        """
+        Load checkpoint
+        :return: dict — offset, done, errors, ahead — numbers of rows finished after offset
+        """
+        ret = {'offset': 0, 'done': 0, 'errors': 0, 'ahead': []}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                ret.update(json.load(f))
+        return ret
+
+    def checkpoint_save(self, stats):
+        """
+        Save checkpoint atomically
+        :param stats: YandexConnectImportStats
+        :return: None
+        """
+        if not self.checkpoint_path:
+            return
+        tmp_path = '%s.tmp' % self.checkpoint_path
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entity': self.entity, 'offset': stats.offset, 'done': stats.done, 'errors': stats.errors,
+                       'ahead': sorted(stats.ahead)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _calls(self, rows, offset, ahead=()):
+        """
+        Bulk calls of rows after offset
+        :param ahead: numbers of rows finished before, they are skipped
+        :return: generator of tuple(method name, kwargs)
+        """
+        for index, row in enumerate(itertools.islice(rows, offset, None), offset):
+            if index in ahead:
+                continue
+            row = self.row_prepare(row)
+            label = None
+            if self.entity == 'departments' and isinstance(row.get('label'), str):
+                label = row['label'].lower()
+                with self._lock:
+                    self._running[label] = (index, threading.Event())
+            yield 'row_import', {'row': row, 'index': index, 'label': label}
+
+    def run(self, rows):
+        """
+        Import rows
+        :param rows: iterable of dict, e.g. rows_read(path)
+        :return: YandexConnectImportStats
+        """
+        checkpoint = self.checkpoint_load()
+        stats = YandexConnectImportStats(checkpoint['offset'], checkpoint['done'], checkpoint['errors'],
+                                         checkpoint['ahead'])
+        log = open(self.log_path, 'a', encoding='utf-8') if self.log_path else None
+
+        def row_finished(count, total, result):
+            index = result.kwargs['index']
+            row = result.kwargs['row']
+            item = {'row': index, 'entity': self.entity, 'key': self.row_key(row), 'ok': result.ok}
+            if result.ok:
+                item.update(result.result)
+                stats.done += 1
+            else:
+                item['error'] = str(result.error)
+                stats.errors += 1
+            if log is not None:
+                log.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+            stats.ahead.add(index)
+            while stats.offset in stats.ahead:
+                stats.ahead.remove(stats.offset)
+                stats.offset += 1
+            if (stats.done + stats.errors) % self.checkpoint_every == 0:
+                if log is not None:
+                    log.flush()
+                self.checkpoint_save(stats)
+            if self.progress is not None:
+                self.progress(stats)
+
+        # Maps are filled once, rows decide between add and upd without requests
+        for entity in {'users': ('user', 'department'), 'departments': ('department', 'user'),
+                       'members': ('group', 'user')}[self.entity]:
+            self.api.resolver.refresh(entity)
+        try:
+            YandexConnectBulk(self, workers=self.workers, progress=row_finished).execute(
+                self._calls(rows, stats.offset, set(stats.ahead)), keep=False
+            )
+        finally:
+            if log is not None:
+                log.close()
+            self.checkpoint_save(stats)
+        stats.finished = time.monotonic()
+        return stats
+
+
+class YandexConnectImportStats(object):
+    """ Counters of import """
+
+    def __init__(self, offset=0, done=0, errors=0, ahead=()):
+        """
+        :param offset: rows finished before start
+        :param done: successful rows before start
+        :param errors: failed rows before start
+        :param ahead: numbers of rows after offset finished before start
+        """
+        self.start = offset
+        self.offset = offset  # Leading rows finished
+        self.ahead = set(ahead)  # Numbers of rows after offset finished
+        self.done = done
+        self.errors = errors
+        self.started = time.monotonic()
+        self.finished = None
+        self._done_start = done + errors
+
+    @property
+    def rate(self):
+        """
+        Rows per second in this run
+        :return: float
+        """
+        seconds = (self.finished or time.monotonic()) - self.started
+        return (self.done + self.errors - self._done_start) / seconds if seconds > 0 else 0.0
+
+    def __repr__(self):
+        return '<YandexConnectImportStats rows=%s done=%s errors=%s %.1f rows/s>' % (
+            self.offset, self.done, self.errors, self.rate
+        )
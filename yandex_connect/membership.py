@@ -0,0 +1,293 @@
+# coding: utf8
+
+"""
+Yandex.Connect transitive group membership module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .snapshot import YandexConnectSnapshot
+
+
+class YandexConnectMembershipGraph(object):
+    """
+    Graph of group members built by bulk requests: groups by one sweep,
+    direct members of all groups in parallel, users of departments by
+    department tree index
+
+    Effective users of every group are precomputed, groups which contain
+    each other (cycles) share one set. After group_member_update through
+    the client only the changed group and groups containing it are recomputed
+    """
+
+    api = None  # YandexConnectDirectory
+    workers = 8  # Max group_member_list requests in parallel
+    tree = None  # YandexConnectDepartmentTree of client, users of member departments
+
+    def __init__(self, api, workers=8):
+        """
+        :param api: YandexConnectDirectory
+        :param workers: max group_member_list requests in parallel
+        """
+        self.api = api
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._members = {}  # group ID: set of (type, ID) — direct members
+        self._parents = {}  # group ID: set of group IDs which have it as member
+        self._users = {}  # group ID: frozenset of user IDs — effective members
+        self._cycles = {}  # group ID: frozenset of group IDs of its cycle
+
+    member_prepare = staticmethod(YandexConnectSnapshot.member_prepare)
+
+    def refresh(self):
+        """
+        Load groups, members and departments, compute all groups
+        :return: self
+        """
+        tree = self.api.department_tree(refresh=True)
+        group_ids = [item['id'] for item in self.api.group_list_full(fields='id')]
+
+        def members_get(group_id):
+            return group_id, set(self.member_prepare(item) for item in self.api.group_member_list(group_id))
+
+        workers = max(1, min(self.workers, len(group_ids)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            members = dict(executor.map(members_get, group_ids))
+        with self._lock:
+            self.tree = tree
+            self._members = members
+            self._parents = {}
+            for group_id, items in members.items():
+                for member_type, member_id in items:
+                    if member_type == 'group':
+                        self._parents.setdefault(member_id, set()).add(group_id)
+            self._users = {}
+            self._cycles = {}
+            self._compute(set(members))
+        return self
+
+    def _department_users(self, department_id):
+        """
+        Users of department with nested departments
+        :return: list
+        """
+        try:
+            return self.tree.users(department_id)
+        except KeyError:
+            return []
+
+    def _compute(self, group_ids):
+        """
+        Compute effective users of groups, closures of other groups are reused
+        Strongly connected components are found by Tarjan algorithm, components
+        are finished in reverse topological order, so nested groups are ready
+        :param group_ids: set of group IDs to compute
+        :return: None
+        """
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        counter = 0
+        for start in sorted(group_ids):
+            if start in index:
+                continue
+            work = [(start, iter(self._group_members(start, group_ids)))]
+            index[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, children = work[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self._group_members(child, group_ids))))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        item = stack.pop()
+                        on_stack.discard(item)
+                        component.append(item)
+                        if item == node:
+                            break
+                    self._component_compute(component)
+
+    def _group_members(self, group_id, group_ids):
+        """
+        Member groups of group which should be computed
+        :return: list
+        """
+        return [member_id for member_type, member_id in self._members.get(group_id, ())
+                if member_type == 'group' and member_id in group_ids and member_id in self._members]
+
+    def _component_compute(self, component):
+        """
+        Compute effective users of strongly connected component
+        :param component: list of group IDs
+        :return: None
+        """
+        groups = set(component)
+        users = set()
+        for group_id in component:
+            for member_type, member_id in self._members.get(group_id, ()):
+                if member_type == 'user':
+                    users.add(member_id)
+                elif member_type == 'department':
+                    users.update(self._department_users(member_id))
+                elif member_type == 'group' and member_id not in groups:
+                    users.update(self._users.get(member_id, ()))
+        users = frozenset(users)
+        cycle = frozenset(groups) if len(groups) > 1 or component[0] in self._group_members(component[0], groups) else None
+        for group_id in component:
+            self._users[group_id] = users
+            if cycle is not None:
+                self._cycles[group_id] = cycle
+            else:
+                self._cycles.pop(group_id, None)
+
+    def _affected(self, group_id):
+        """
+        Group and all groups which contain it
+        :param group_id: ID
+        :return: set
+        """
+        ret = {group_id}
+        queue = [group_id]
+        while queue:
+            for parent_id in self._parents.get(queue.pop(), ()):
+                if parent_id not in ret:
+                    ret.add(parent_id)
+                    queue.append(parent_id)
+        return ret
+
+    def update(self, group_id, actions):
+        """
+        Apply members bulk-update operations and recompute affected groups,
+        members with not resolved IDs (email, nickname) are skipped
+        :param group_id: ID
+        :param actions: list, [{"operation_type": "<add|remove>", "value": {"type": "...", "id": ID}},..]
+        :return: None
+        """
+        with self._lock:
+            members = self._members.setdefault(group_id, set())
+            for action in actions:
+                member_id = action['value']['id']
+                if isinstance(member_id, str) and member_id.isdigit():
+                    member_id = int(member_id)
+                elif not isinstance(member_id, int):
+                    continue
+                member = (action['value'].get('type', 'user'), member_id)
+                if action['operation_type'] == 'add':
+                    members.add(member)
+                    if member[0] == 'group':
+                        self._parents.setdefault(member[1], set()).add(group_id)
+                elif action['operation_type'] == 'remove':
+                    members.discard(member)
+                    if member[0] == 'group':
+                        self._parents.get(member[1], set()).discard(group_id)
+            self._compute(self._affected(group_id))
+
+    def group_set(self, group_id, members):
+        """
+        Replace direct members of group and recompute affected groups
+        :param group_id: ID
+        :param members: list — [{"type": "<user|group|department>", "id": ID},...]
+        :return: None
+        """
+        with self._lock:
+            for member_type, member_id in self._members.get(group_id, ()):
+                if member_type == 'group':
+                    self._parents.get(member_id, set()).discard(group_id)
+            self._members[group_id] = set()
+        self.update(group_id, [{'operation_type': 'add', 'value': item} for item in members or ()])
+
+    def user_set(self, user_id, department_id):
+        """
+        Move user to department in tree and recompute groups which have
+        old or new department of user (or their ancestors) as member
+        :param user_id: ID
+        :param department_id: ID of new department
+        :return: None
+        """
+        with self._lock:
+            if self.tree is None:
+                return
+            old_id = self.tree.user_department(user_id)
+            self.tree.user_set({'id': user_id, 'department_id': department_id})
+            if old_id == department_id:
+                return
+            department_ids = set()
+            for item_id in (old_id, department_id):
+                if item_id is not None and item_id in self.tree:
+                    department_ids.update(self.tree.path(item_id))
+            group_ids = set()
+            for group_id, members in self._members.items():
+                if any(member_type == 'department' and member_id in department_ids
+                       for member_type, member_id in members):
+                    group_ids |= self._affected(group_id)
+            if group_ids:
+                self._compute(group_ids)
+
+    def members(self, group_id):
+        """
+        Effective users of group: direct, of member departments and of member groups
+        :param group_id: ID | email
+        :return: frozenset of user IDs, empty for unknown group
+        """
+        group_id = self.api.group_id_check(group_id)
+        with self._lock:
+            return self._users.get(group_id, frozenset())
+
+    def direct_members(self, group_id):
+        """
+        Direct members of group
+        :param group_id: ID | email
+        :return: set of tuple(type, ID)
+        """
+        group_id = self.api.group_id_check(group_id)
+        with self._lock:
+            return set(self._members.get(group_id, ()))
+
+    def is_member(self, user_id, group_id):
+        """
+        Is user effectively a member of group
+        :param user_id: ID | nickname | email
+        :param group_id: ID | email
+        :return: bool
+        """
+        user_id = self.api.user_id_check(user_id)
+        return user_id in self.members(group_id)
+
+    def user_groups(self, user_id):
+        """
+        Groups where user is effectively a member
+        :param user_id: ID | nickname | email
+        :return: list of group IDs
+        """
+        user_id = self.api.user_id_check(user_id)
+        with self._lock:
+            return sorted(group_id for group_id, users in self._users.items() if user_id in users)
+
+    @property
+    def cycles(self):
+        """
+        Groups which contain each other
+        :return: list of sorted lists of group IDs
+        """
+        with self._lock:
+            return sorted(sorted(cycle) for cycle in set(self._cycles.values()))
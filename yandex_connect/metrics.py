@@ -0,0 +1,212 @@
+# coding: utf8
+
+"""
+Yandex.Connect request metrics module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import bisect
+import threading
+
+
+def endpoint_get(name):
+    """
+    Endpoint template of url path, object ID is replaced by {id}
+    :param name: url path, e.g. groups/12/members
+    :return: str, e.g. groups/{id}/members
+    """
+    parts = name.strip('/').split('/')
+    if len(parts) > 1:
+        parts[1] = '{id}'
+    return '/'.join(parts)
+
+
+class YandexConnectRequestEvent(object):
+    """
+    One request attempt, passed to pre and post request hooks
+    Pre hook gets event before sending, status and timings are not set yet
+    """
+
+    __slots__ = ('endpoint', 'name', 'method', 'org_id', 'retry_count', 'status', 'error', 'bytes_out', 'bytes_in',
+                 'time_serialize', 'time_network', 'time_decode')
+
+    def __init__(self, name, method, org_id=None, retry_count=0):
+        """
+        :param name: url path
+        :param method: request method
+        :param org_id: organization ID
+        :param retry_count: retries done before this attempt
+        """
+        self.endpoint = endpoint_get(name)
+        self.name = name
+        self.method = method
+        self.org_id = org_id
+        self.retry_count = retry_count
+        self.status = None  # response status, None on send error
+        self.error = None  # send exception
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.time_serialize = 0.0  # seconds, request preparation and json encode
+        self.time_network = 0.0  # seconds, send and receive
+        self.time_decode = 0.0  # seconds, json decode
+
+    @property
+    def time_total(self):
+        """
+        Sum of timings
+        :return: float — seconds
+        """
+        return self.time_serialize + self.time_network + self.time_decode
+
+    def __repr__(self):
+        return '<YandexConnectRequestEvent %s %s %s retry=%s %.1fms>' % (
+            self.method.upper(), self.endpoint, self.status, self.retry_count, self.time_total * 1000
+        )
+
+
+class YandexConnectStats(object):
+    """
+    In-memory registry of request counters and latency histograms by
+    method and endpoint, use as post request hook:
+    api.hook_add(post=stats)
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Latency histogram bounds, seconds
+
+    def __init__(self, buckets=None):
+        """
+        :param buckets: latency histogram bounds in seconds
+        """
+        self.buckets = tuple(sorted(buckets or self.BUCKETS))
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """
+        Record request event
+        :param event: YandexConnectRequestEvent
+        :return: None
+        """
+        key = (event.method, event.endpoint)
+        total = event.time_total
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                item = self._data[key] = {
+                    'requests': 0, 'errors': 0, 'retries': 0, 'statuses': {}, 'bytes_out': 0, 'bytes_in': 0,
+                    'time_serialize': 0.0, 'time_network': 0.0, 'time_decode': 0.0, 'time_total': 0.0,
+                    'histogram': [0] * (len(self.buckets) + 1),
+                }
+            item['requests'] += 1
+            if event.error is not None or (event.status is not None and event.status > 299):
+                item['errors'] += 1
+            if event.retry_count:
+                item['retries'] += 1
+            status = str(event.status) if event.status is not None else 'error'
+            item['statuses'][status] = item['statuses'].get(status, 0) + 1
+            item['bytes_out'] += event.bytes_out
+            item['bytes_in'] += event.bytes_in
+            item['time_serialize'] += event.time_serialize
+            item['time_network'] += event.time_network
+            item['time_decode'] += event.time_decode
+            item['time_total'] += total
+            item['histogram'][bisect.bisect_left(self.buckets, total)] += 1
+
+    def as_dict(self):
+        """
+        Copy of counters
+        :return: dict — {(method, endpoint): counters}
+        """
+        with self._lock:
+            ret = {}
+            for key, item in self._data.items():
+                ret[key] = dict(item, statuses=dict(item['statuses']), histogram=list(item['histogram']))
+            return ret
+
+    def reset(self):
+        """
+        Clear counters
+        :return: None
+        """
+        with self._lock:
+            self._data = {}
+
+    def openmetrics(self, prefix='yandex_connect'):
+        """
+        Counters in OpenMetrics / Prometheus text format, every metric family
+        is one block of TYPE, HELP and samples of all endpoints
+        :param prefix: metric name prefix
+        :return: str
+        """
+        items = sorted(self.as_dict().items())
+        lines = []
+
+        def family(name, kind, text, samples):
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            lines.append('# HELP %s_%s %s' % (prefix, name, text))
+            for (method, endpoint), item in items:
+                labels = 'method="%s",endpoint="%s"' % (method, endpoint)
+                for suffix, extra, value in samples(item):
+                    lines.append('%s_%s%s{%s%s} %s' % (prefix, name, suffix, labels, extra, value))
+
+        family('requests', 'counter', 'Directory API requests', lambda item: [
+            ('_total', ',status="%s"' % status, value) for status, value in sorted(item['statuses'].items())
+        ])
+        for name, text in (('errors', 'Failed requests'), ('retries', 'Retried requests'),
+                           ('bytes_out', 'Request bytes'), ('bytes_in', 'Response bytes')):
+            family('request_%s' % name, 'counter', text, lambda item, name=name: [('_total', '', item[name])])
+        family('request_phase_seconds', 'counter', 'Request time by phase', lambda item: [
+            ('_total', ',phase="%s"' % phase, item['time_%s' % phase]) for phase in ('serialize', 'network', 'decode')
+        ])
+
+        def histogram(item):
+            ret = []
+            count = 0
+            for bound, value in zip(self.buckets + ('+Inf',), item['histogram']):
+                count += value
+                ret.append(('_bucket', ',le="%s"' % bound, count))
+            return ret + [('_count', '', count), ('_sum', '', item['time_total'])]
+
+        family('request_seconds', 'histogram', 'Request time', histogram)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def prometheus_register(self, registry=None, prefix='yandex_connect'):
+        """
+        Register collector in prometheus_client registry, prometheus_client is required
+        :param registry: CollectorRegistry, by default — REGISTRY
+        :param prefix: metric name prefix
+        :return: collector
+        """
+        from prometheus_client import REGISTRY
+        from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+        stats = self
+
+        class Collector(object):
+            def collect(self):
+                requests = CounterMetricFamily('%s_requests' % prefix, 'Directory API requests',
+                                               labels=['method', 'endpoint', 'status'])
+                errors = CounterMetricFamily('%s_request_errors' % prefix, 'Failed requests', labels=['method', 'endpoint'])
+                bytes_in = CounterMetricFamily('%s_request_bytes_in' % prefix, 'Response bytes', labels=['method', 'endpoint'])
+                bytes_out = CounterMetricFamily('%s_request_bytes_out' % prefix, 'Request bytes', labels=['method', 'endpoint'])
+                seconds = HistogramMetricFamily('%s_request_seconds' % prefix, 'Request time', labels=['method', 'endpoint'])
+                for (method, endpoint), item in stats.as_dict().items():
+                    for status, value in item['statuses'].items():
+                        requests.add_metric([method, endpoint, status], value)
+                    errors.add_metric([method, endpoint], item['errors'])
+                    bytes_in.add_metric([method, endpoint], item['bytes_in'])
+                    bytes_out.add_metric([method, endpoint], item['bytes_out'])
+                    buckets = []
+                    count = 0
+                    for bound, value in zip([str(bound) for bound in stats.buckets] + ['+Inf'], item['histogram']):
+                        count += value
+                        buckets.append((bound, count))
+                    seconds.add_metric([method, endpoint], buckets, item['time_total'])
+                return [requests, errors, bytes_in, bytes_out, seconds]
+
+        collector = Collector()
+        (registry or REGISTRY).register(collector)
+        return collector
@@ -0,0 +1,130 @@
+# coding: utf8
+
+"""
+Yandex.Connect adaptive page size module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import threading
+
+
+class YandexConnectPageSizer(object):
+    """
+    Page size of list sweeps by endpoint
+    First sweep uses size estimated from requested fields, next sweeps —
+    size at which a page takes about target_latency seconds and target_size
+    bytes by observed time and size per item. Failed page halves the size,
+    successful pages grow it back step by step
+    """
+
+    PER_PAGE_MAX = 1000  # API max per_page
+    PER_PAGE_MIN = 20  # Min page size
+    HEAVY_FIELDS = ('contacts', 'groups', 'department', 'members', 'admins', 'aliases', 'about', 'name')  # Large fields
+    SMOOTHING = 0.3  # Weight of new observation
+    GROWTH = 1.5  # Max growth of size after successful page
+
+    def __init__(self, per_page_max=1000, per_page_min=20, target_latency=2.0, target_size=2 * 1024 * 1024, caps=None):
+        """
+        :param per_page_max: API max per_page
+        :param per_page_min: min page size
+        :param target_latency: desired seconds per page
+        :param target_size: desired bytes per page
+        :param caps: dict — {list method name: max per_page}, e.g. {'user_list': 500}
+        """
+        self.per_page_max = per_page_max
+        self.per_page_min = per_page_min
+        self.target_latency = target_latency
+        self.target_size = target_size
+        self.caps = dict(caps or {})
+        self._stats = {}  # endpoint: [seconds per item, bytes per item]
+        self._limits = {}  # endpoint: max size after failures
+        self._lock = threading.Lock()
+
+    def cap_get(self, endpoint):
+        """
+        Max page size of endpoint
+        :param endpoint: list method name
+        :return: int
+        """
+        return max(self.per_page_min, min(self.per_page_max, self.caps.get(endpoint, self.per_page_max),
+                                          self._limits.get(endpoint, self.per_page_max)))
+
+    def estimate(self, fields):
+        """
+        Page size by requested fields
+        :param fields: str — comma separated
+        :return: int
+        """
+        fields = [field for field in (fields or '').split(',') if field]
+        weight = sum(4 if field in self.HEAVY_FIELDS else 1 for field in fields)
+        return self.per_page_max * 3 // max(3, weight)
+
+    def size(self, endpoint, fields):
+        """
+        Page size of next sweep
+        :param endpoint: list method name
+        :param fields: str — comma separated requested fields
+        :return: int
+        """
+        with self._lock:
+            stats = self._stats.get((endpoint, fields))
+            cap = self.cap_get(endpoint)
+        if stats is None:
+            size = self.estimate(fields)
+        else:
+            seconds, size_bytes = stats
+            size = self.per_page_max
+            if seconds > 0:
+                size = min(size, self.target_latency / seconds)
+            if size_bytes > 0:
+                size = min(size, self.target_size / size_bytes)
+        return int(max(self.per_page_min, min(cap, size)))
+
+    def observe(self, endpoint, fields, count, seconds, size_bytes=None):
+        """
+        Record successful page
+        :param endpoint: list method name
+        :param fields: str — requested fields
+        :param count: items on page
+        :param seconds: request time
+        :param size_bytes: response size, None if unknown
+        :return: None
+        """
+        if count <= 0:
+            return
+        item = [seconds / count, (size_bytes or 0) / count]
+        with self._lock:
+            stats = self._stats.get((endpoint, fields))
+            if stats is not None:
+                item = [old + self.SMOOTHING * (new - old) for old, new in zip(stats, item)]
+                if size_bytes is None:
+                    item[1] = stats[1]
+            self._stats[(endpoint, fields)] = item
+            limit = self._limits.get(endpoint)
+            if limit is not None:
+                limit = int(limit * self.GROWTH)
+                if limit >= self.per_page_max:
+                    del self._limits[endpoint]
+                else:
+                    self._limits[endpoint] = limit
+
+    def fail(self, endpoint, per_page):
+        """
+        Record failed page, halve max size of endpoint
+        :param endpoint: list method name
+        :param per_page: size of failed page
+        :return: None
+        """
+        with self._lock:
+            self._limits[endpoint] = max(self.per_page_min, min(self._limits.get(endpoint, self.per_page_max),
+                                                                per_page // 2))
+
+    def splittable(self, per_page):
+        """
+        Can failed page be requested by pages of half size, odd size is split to ceil half
+        :param per_page: page size
+        :return: bool
+        """
+        return per_page > 1 and (per_page + 1) // 2 >= self.per_page_min
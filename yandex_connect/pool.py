@@ -0,0 +1,283 @@
+# coding: utf8
+
+"""
+Yandex.Connect multi-organization client pool module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import YandexConnectException
+from .bulk import YandexConnectBulkResult
+from .cache import YandexConnectMemoryCache, YandexConnectCacheNamespace
+from .paging import YandexConnectPageSizer
+from .retry import YandexConnectRetryPolicy
+from .transport import YandexConnectTransport, YandexConnectRequestsTransport
+
+
+class YandexConnectScheduler(object):
+    """
+    Limit of requests in progress: total and per organization
+    Free slot is given to waiting organization with fewest requests in
+    progress, requests of one organization are served in arrival order,
+    so busy organization does not delay others
+    """
+
+    max_concurrency = 20  # Max requests in progress
+    org_concurrency = 4  # Max requests in progress of one organization
+
+    def __init__(self, max_concurrency=20, org_concurrency=4):
+        """
+        :param max_concurrency: max requests in progress
+        :param org_concurrency: max requests in progress of one organization
+        """
+        self.max_concurrency = max_concurrency
+        self.org_concurrency = org_concurrency
+        self._condition = threading.Condition()
+        self._active = collections.Counter()  # org ID: requests in progress
+        self._total = 0
+        self._waiting = collections.OrderedDict()  # org ID: deque of waiting tickets, in order of waiting
+
+    def _next_org(self):
+        """
+        Organization which gets next free slot
+        :return: org ID | None
+        """
+        ret = None
+        for org_id in self._waiting:
+            if self._active[org_id] < self.org_concurrency and (ret is None or self._active[org_id] < self._active[ret]):
+                ret = org_id
+        return ret
+
+    def acquire(self, org_id):
+        """
+        Wait for request slot
+        :param org_id: organization ID
+        :return: None
+        """
+        ticket = object()
+        with self._condition:
+            self._waiting.setdefault(org_id, collections.deque()).append(ticket)
+            while (self._total >= self.max_concurrency or self._waiting[org_id][0] is not ticket
+                   or self._next_org() != org_id):
+                self._condition.wait()
+            queue = self._waiting[org_id]
+            queue.popleft()
+            if not queue:
+                del self._waiting[org_id]
+            self._active[org_id] += 1
+            self._total += 1
+            self._condition.notify_all()
+
+    def release(self, org_id):
+        """
+        Free request slot
+        :param org_id: organization ID
+        :return: None
+        """
+        with self._condition:
+            self._active[org_id] -= 1
+            if not self._active[org_id]:
+                del self._active[org_id]
+            self._total -= 1
+            self._condition.notify_all()
+
+    @property
+    def active(self):
+        """
+        Requests in progress by organization
+        :return: dict
+        """
+        with self._condition:
+            return dict(self._active)
+
+
+class YandexConnectOrgTransport(YandexConnectTransport):
+    """ Transport of one organization: shared transport, requests are sent within scheduler slots """
+
+    def __init__(self, transport, scheduler, org_id):
+        """
+        :param transport: shared YandexConnectTransport
+        :param scheduler: YandexConnectScheduler
+        :param org_id: organization ID
+        """
+        self.transport = transport
+        self.scheduler = scheduler
+        self.org_id = org_id
+
+    def request(self, method, url, **kwargs):
+        self.scheduler.acquire(self.org_id)
+        try:
+            return self.transport.request(method, url, **kwargs)
+        finally:
+            self.scheduler.release(self.org_id)
+
+    def error_classify(self, exc):
+        return self.transport.error_classify(exc)
+
+    def timeout_check(self, exc):
+        return self.transport.timeout_check(exc)
+
+    def close(self):
+        """
+        Shared transport is closed by pool
+        :return: None
+        """
+
+
+class YandexConnectClientPool(object):
+    """
+    Clients of many organizations sharing one transport with connection pool,
+    scheduler of requests, retry policy and page sizer. Every organization has own
+    client with own resolver and namespace in shared cache
+
+    pool[org_id] returns client of organization, map / fanout run one method
+    for all organizations in parallel
+    """
+
+    cls = None  # Client class, by default — YandexConnectDirectory
+    scheduler = None  # YandexConnectScheduler
+    transport = None  # Shared YandexConnectTransport
+    cache = None  # Shared YandexConnectCache
+    retry_policy = None  # Shared YandexConnectRetryPolicy
+    page_sizer = None  # Shared YandexConnectPageSizer
+
+    def __init__(self, oauth_token=None, orgs=None, cls=None, pool_size=20, org_concurrency=4, cache=None,
+                 retry_policy=None, page_sizer=None, transport=None, timeout=(10, 60), **kwargs):
+        """
+        :param oauth_token: OAuth token of organizations without own token
+        :param orgs: list of org ID | dict — {org ID: OAuth token | None}
+        :param cls: client class, by default — YandexConnectDirectory
+        :param pool_size: keep-alive connections and max requests in progress of all organizations
+        :param org_concurrency: max requests in progress of one organization
+        :param cache: shared YandexConnectCache, by default — YandexConnectMemoryCache
+        :param retry_policy: shared YandexConnectRetryPolicy
+        :param page_sizer: shared YandexConnectPageSizer
+        :param transport: shared YandexConnectTransport, by default — YandexConnectRequestsTransport,
+                          passed transport is not closed by close()
+        :param timeout: seconds of default transport — (connect, read) | one value for both, None — without timeout
+        :param kwargs: other client params, e.g. rate_limiter, domain, list_concurrency
+        """
+        if cls is None:
+            from .directory import YandexConnectDirectory
+            cls = YandexConnectDirectory
+        self.cls = cls
+        self.oauth_token = oauth_token
+        self.scheduler = YandexConnectScheduler(max_concurrency=pool_size, org_concurrency=org_concurrency)
+        self.transport = transport if transport is not None else YandexConnectRequestsTransport(pool_size, timeout=timeout)
+        self._transport_owned = transport is None
+        self.cache = cache if cache is not None else YandexConnectMemoryCache()
+        self.retry_policy = retry_policy if retry_policy is not None else YandexConnectRetryPolicy()
+        self.page_sizer = page_sizer if page_sizer is not None else YandexConnectPageSizer()
+        self.kwargs = kwargs
+        self._tokens = collections.OrderedDict()  # org ID: token
+        self._clients = {}
+        self._lock = threading.Lock()
+        if isinstance(orgs, dict):
+            for org_id, token in orgs.items():
+                self.org_add(org_id, token)
+        else:
+            for org_id in orgs or ():
+                self.org_add(org_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def org_add(self, org_id, oauth_token=None):
+        """
+        Add organization
+        :param org_id: organization ID
+        :param oauth_token: OAuth token, by default — token of pool
+        :return: None
+        """
+        oauth_token = oauth_token or self.oauth_token
+        if not oauth_token:
+            raise YandexConnectException('No OAuth token for organization %s' % org_id)
+        with self._lock:
+            self._tokens[org_id] = oauth_token
+            self._clients.pop(org_id, None)
+
+    @property
+    def org_ids(self):
+        """
+        Organization IDs in order of adding
+        :return: list
+        """
+        with self._lock:
+            return list(self._tokens)
+
+    def client(self, org_id):
+        """
+        Client of organization, created on first use
+        :param org_id: organization ID
+        :return: client object
+        """
+        with self._lock:
+            ret = self._clients.get(org_id)
+            if ret is None:
+                if org_id not in self._tokens:
+                    raise KeyError(org_id)
+                ret = self._clients[org_id] = self.cls(
+                    self._tokens[org_id], org_id=org_id,
+                    transport=YandexConnectOrgTransport(self.transport, self.scheduler, org_id),
+                    cache=YandexConnectCacheNamespace(self.cache, org_id), retry_policy=self.retry_policy,
+                    page_sizer=self.page_sizer, **self.kwargs
+                )
+        return ret
+
+    __getitem__ = client
+
+    def fanout(self, method, *args, **kwargs):
+        """
+        Call method of clients of all organizations in parallel, takes as long as the slowest organization
+        :param method: method name, e.g. 'user_list_full', or func(client, *args, **kwargs)
+        :param args: method arguments
+        :param kwargs: method arguments, org_ids — list of organizations instead of all
+        :return: dict — {org ID: YandexConnectBulkResult}
+        """
+        org_ids = kwargs.pop('org_ids', None)
+        org_ids = self.org_ids if org_ids is None else list(org_ids)
+        name = method if isinstance(method, str) else getattr(method, '__name__', repr(method))
+
+        def call(index, org_id):
+            try:
+                client = self.client(org_id)
+                func = getattr(client, method) if isinstance(method, str) else lambda *a, **kw: method(client, *a, **kw)
+                return YandexConnectBulkResult(index, name, dict(kwargs, org_id=org_id), result=func(*args, **kwargs))
+            except Exception as e:
+                return YandexConnectBulkResult(index, name, dict(kwargs, org_id=org_id), error=e)
+
+        if not org_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(org_ids)) as executor:
+            results = list(executor.map(call, range(len(org_ids)), org_ids))
+        return collections.OrderedDict((org_id, result) for org_id, result in zip(org_ids, results))
+
+    def map(self, method, *args, **kwargs):
+        """
+        Call method of clients of all organizations in parallel
+        :param method: method name or func(client, *args, **kwargs)
+        :raise Exception: first error of organizations
+        :return: dict — {org ID: result}
+        """
+        ret = collections.OrderedDict()
+        for org_id, result in self.fanout(method, *args, **kwargs).items():
+            if not result.ok:
+                raise result.error
+            ret[org_id] = result.result
+        return ret
+
+    def close(self):
+        """
+        Close shared transport created by pool
+        :return: None
+        """
+        if self._transport_owned:
+            self.transport.close()
@@ -0,0 +1,125 @@
+# coding: utf8
+
+"""
+Yandex.Connect rate limit module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class YandexConnectRateLimiter(object):
+    """
+    Token bucket rate limiter, one bucket for read (GET) and one for write requests
+    Object is thread-safe, pass one object to several clients to share budget
+    """
+
+    READ_METHODS = ('get',)  # Methods counted by read bucket
+
+    def __init__(self, rate, burst=None, write_rate=None, write_burst=None):
+        """
+        :param rate: read requests per second
+        :param burst: max read requests at once, by default — rate
+        :param write_rate: write requests per second, by default — rate
+        :param write_burst: max write requests at once, by default — write_rate
+        """
+        write_rate = rate if write_rate is None else write_rate
+        self.limits = {
+            'read': (float(rate), float(burst if burst is not None else max(rate, 1))),
+            'write': (float(write_rate), float(write_burst if write_burst is not None else max(write_rate, 1))),
+        }
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def bucket_get(self, method):
+        """
+        Bucket name of request method
+        :param method: get/post/patch/delete
+        :return: read|write
+        """
+        return 'read' if method.lower() in self.READ_METHODS else 'write'
+
+    def take(self, state, bucket, now):
+        """
+        Take one token from bucket state, token may be borrowed
+        :param state: dict — {bucket: [tokens, updated]}
+        :param bucket: read|write
+        :param now: timestamp
+        :return: float — seconds to wait before request
+        """
+        rate, burst = self.limits[bucket]
+        tokens, updated = state.get(bucket, (burst, now))
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        tokens -= 1
+        state[bucket] = [tokens, now]
+        if tokens >= 0:
+            return 0.0
+        return -tokens / rate
+
+    def reserve(self, method):
+        """
+        Reserve request slot
+        :param method: request method
+        :return: float — seconds to wait before request
+        """
+        with self._lock:
+            return self.take(self._state, self.bucket_get(method), time.monotonic())
+
+    def acquire(self, method):
+        """
+        Wait for request slot
+        :param method: request method
+        :return: float — waited seconds
+        """
+        wait = self.reserve(method)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class YandexConnectFileRateLimiter(YandexConnectRateLimiter):
+    """
+    Token bucket rate limiter with state in a file, shares budget between
+    processes on one host. Unix only, file is locked by fcntl.flock
+    """
+
+    def __init__(self, path, rate, burst=None, write_rate=None, write_burst=None):
+        """
+        :param path: state file path
+        :param rate: read requests per second
+        :param burst: max read requests at once, by default — rate
+        :param write_rate: write requests per second, by default — rate
+        :param write_burst: max write requests at once, by default — write_rate
+        """
+        super(YandexConnectFileRateLimiter, self).__init__(rate, burst=burst, write_rate=write_rate, write_burst=write_burst)
+        self.path = path
+
+    def reserve(self, method):
+        import fcntl
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = b''
+                while True:
+                    chunk = os.read(fd, 4096)
+                    if not chunk:
+                        break
+                    raw += chunk
+                try:
+                    state = json.loads(raw.decode('utf-8')) if raw else {}
+                except ValueError:
+                    state = {}
+                wait = self.take(state, self.bucket_get(method), time.time())
+                data = json.dumps(state).encode('utf-8')
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        return wait
@@ -0,0 +1,462 @@
+# coding: utf8
+
+"""
+Yandex.Connect desired state reconcile module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import YandexConnectException
+from .bulk import YandexConnectBulk
+from .snapshot import YandexConnectSnapshot
+
+
+class YandexConnectReconcilePlan(object):
+    """
+    Calls which bring organization to desired state
+    Stages are executed one after another, calls of one stage — in parallel.
+    New departments are created before all stages, by waves: departments
+    of wave N have parents in organization or in waves before N
+    """
+
+    STAGES = ('departments', 'users', 'members')  # Execution order after waves of new departments
+    WAVE = 'department_add_%s'  # Stage name of wave of new departments
+
+    def __init__(self):
+        self.stages = {stage: [] for stage in self.STAGES}  # stage: list of tuple(method name, kwargs)
+        self.waves = 0  # Count of waves of new departments
+        self.missing = []  # list of tuple(entity, key) — desired objects neither found nor created
+        self.results = []  # list of YandexConnectBulkResult after run
+
+    def add(self, stage, method, **kwargs):
+        """
+        Add call
+        :param stage: departments|users|members|department_add_<wave>
+        :param method: client method name
+        :param kwargs: call arguments
+        :return: None
+        """
+        self.stages.setdefault(stage, []).append((method, kwargs))
+
+    def department_add(self, wave, **kwargs):
+        """
+        Add creation of department
+        :param wave: 0 — parent is in organization, N — parent is created in wave N - 1
+        :param kwargs: department_add arguments
+        :return: None
+        """
+        self.waves = max(self.waves, wave + 1)
+        self.add(self.WAVE % wave, 'department_add', **kwargs)
+
+    @property
+    def order(self):
+        """
+        Stage names in execution order
+        :return: list
+        """
+        return [self.WAVE % wave for wave in range(self.waves)] + list(self.STAGES)
+
+    @property
+    def calls(self):
+        """
+        All calls in execution order
+        :return: list of tuple(method name, kwargs)
+        """
+        return [call for stage in self.order for call in self.stages[stage]]
+
+    def __len__(self):
+        return sum(len(calls) for calls in self.stages.values())
+
+    def __repr__(self):
+        return '<YandexConnectReconcilePlan %s missing=%s>' % (
+            ' '.join('%s=%s' % (stage, len(self.stages[stage])) for stage in self.order), len(self.missing)
+        )
+
+    @property
+    def errors(self):
+        """
+        Failed calls
+        :return: list of YandexConnectBulkResult
+        """
+        return [result for result in self.results if not result.ok]
+
+    def run(self, api, workers=8, progress=None, missing_ok=False):
+        """
+        Execute calls
+        :param api: YandexConnectDirectory
+        :param workers: max simultaneous calls
+        :param progress: callback — progress(done, total, YandexConnectBulkResult)
+        :param missing_ok: execute plan with missing objects, by default — raise before any call
+        :raise YandexConnectException: plan has missing objects
+        :return: list of YandexConnectBulkResult
+        """
+        if self.missing and not missing_ok:
+            raise YandexConnectException('Desired objects are not found and can not be created: %s' % ', '.join(
+                '%s %s' % item for item in self.missing
+            ))
+        total = len(self)
+        done = [0]
+
+        def stage_progress(count, stage_total, result):
+            done[0] += 1
+            if progress is not None:
+                progress(done[0], total, result)
+
+        bulk = YandexConnectBulk(api, workers=workers, progress=stage_progress)
+        self.results = []
+        for stage in self.order:
+            if self.stages[stage]:
+                self.results += bulk.execute(self.stages[stage], total=len(self.stages[stage]))
+        return self.results
+
+
+class YandexConnectReconcile(object):
+    """
+    Compare desired users, departments and group members with current state,
+    fetched by bulk requests, and plan only changed fields and members
+
+    Departments with label and name and users with nickname and password
+    missing in organization are created, new departments — parents first.
+    Other missing objects (and groups) are listed in plan.missing; users,
+    departments and members absent in desired state are kept, except
+    members of desired groups if members_remove is set
+    """
+
+    DEPARTMENT_FIELDS = ('name', 'label', 'description', 'parent_id', 'head_id')  # Compared department fields
+    USER_FIELDS = ('name', 'position', 'department_id', 'about', 'birthday', 'contacts', 'gender', 'is_admin',
+                   'is_dismissed')  # Compared user fields
+    USER_ADD_FIELDS = ('nickname', 'password', 'about', 'aliases', 'birthday', 'contacts', 'department_id', 'gender',
+                       'is_admin', 'is_dismissed', 'position')  # Passed user_add fields, name is prepared
+
+    api = None  # YandexConnectDirectory
+    workers = 8  # Max requests in parallel while fetching current state
+
+    def __init__(self, api, workers=8):
+        """
+        :param api: YandexConnectDirectory
+        :param workers: max requests in parallel while fetching current state
+        """
+        self.api = api
+        self.workers = workers
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Normalization
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def name_prepare(item):
+        """
+        User name as dict, from API dict or user_upd arguments name / secname / sername
+        :param item: desired user dict
+        :return: dict | None
+        """
+        name = item.get('name')
+        if name is None or isinstance(name, dict):
+            if 'secname' not in item and 'sername' not in item:
+                return {key: value for key, value in name.items() if value} if name else name
+            name = (name or {}).get('first')
+        ret = {'first': name, 'last': item.get('secname'), 'middle': item.get('sername')}
+        return {key: value for key, value in ret.items() if value}
+
+    @staticmethod
+    def contacts_prepare(contacts):
+        """
+        Comparable contacts, synthetic contacts made by Yandex are skipped
+        :param contacts: list of dict | tuple(type, value)
+        :return: list of tuple(type, value)
+        """
+        ret = set()
+        for item in contacts or ():
+            if isinstance(item, dict):
+                if item.get('synthetic'):
+                    continue
+                item = (item.get('type'), item.get('value'))
+            ret.add(tuple(item))
+        return sorted(ret)
+
+    @staticmethod
+    def value_prepare(value):
+        """
+        Comparable scalar value
+        :param value: value
+        :return: value
+        """
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def nickname_prepare(nickname):
+        """
+        Nickname without domain in lower case
+        :param nickname: str
+        :return: str
+        """
+        nickname = nickname.strip().lower()
+        return nickname[:nickname.find('@')] if '@' in nickname else nickname
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Current state
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def current_get(self, departments, users, groups):
+        """
+        Fetch current state by list sweeps in parallel
+        :return: dict
+        """
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = {
+                'departments': executor.submit(self.api.department_list_full,
+                                               fields='id,name,label,description,parent_id,head'),
+                'users': executor.submit(self.api.user_list_full,
+                                         fields='id,nickname,%s' % ','.join(self.USER_FIELDS)) if users or groups else None,
+                'groups': executor.submit(self.api.group_list_full, fields='id,name,email,label') if groups else None,
+            }
+            ret = {key: future.result() if future is not None else [] for key, future in futures.items()}
+        return ret
+
+    def members_get(self, group_ids):
+        """
+        Direct members of groups in parallel
+        :param group_ids: list of ID
+        :return: dict — {group ID: set of tuple(type, ID)}
+        """
+        def group_members_get(group_id):
+            members = self.api.group_member_list(group_id)
+            return group_id, set(YandexConnectSnapshot.member_prepare(item) for item in members)
+
+        if not group_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(group_ids)))) as executor:
+            return dict(executor.map(group_members_get, group_ids))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Plan
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def plan(self, departments=None, users=None, groups=None, members_remove=True):
+        """
+        Plan calls
+        :param departments: list of dict — id or label and fields of DEPARTMENT_FIELDS, parent_id may be label
+        :param users: list of dict — id or nickname and fields of USER_FIELDS, department_id may be label
+        :param groups: dict — {group ID | email | name: list of members}, member is user ID | nickname |
+            tuple(type, ID | email | label) | {"type": ..., "id": ...}
+        :param members_remove: remove members of desired groups which are not in desired list
+        :return: YandexConnectReconcilePlan
+        """
+        plan = YandexConnectReconcilePlan()
+        current = self.current_get(departments, users, groups)
+        department_items = {item['id']: item for item in current['departments']}
+        department_ids = {}
+        for item in current['departments']:
+            if item.get('label'):
+                department_ids[item['label'].lower()] = item['id']
+        user_items = {item['id']: item for item in current['users']}
+        user_ids = {self.nickname_prepare(item['nickname']): item['id'] for item in current['users'] if item.get('nickname')}
+        group_ids = {}
+        for item in current['groups']:
+            for key in ('email', 'name', 'label'):
+                if item.get(key):
+                    group_ids.setdefault(item[key].lower(), item['id'])
+            group_ids[item['id']] = item['id']
+
+        new_departments = {}  # label: desired department to create
+        for item in departments or ():
+            if 'id' not in item and item.get('label') and item.get('name') and \
+                    item['label'].lower() not in department_ids:
+                new_departments[item['label'].lower()] = item
+        new_users = {}  # nickname: desired user to create
+        for item in users or ():
+            if 'id' not in item and item.get('nickname') and item.get('password') and \
+                    self.nickname_prepare(item['nickname']) not in user_ids:
+                new_users[self.nickname_prepare(item['nickname'])] = item
+
+        # ID of department, label of department to create, None — not found
+        def department_id_get(key):
+            if isinstance(key, str) and not key.isdigit():
+                key = key.lower()
+                return department_ids.get(key, new_departments[key]['label'] if key in new_departments else None)
+            return int(key) if key is not None else None
+
+        # ID of user, nickname of user to create, None — not found
+        def user_id_get(key):
+            if isinstance(key, str) and not key.isdigit():
+                key = self.nickname_prepare(key)
+                return user_ids.get(key, key if key in new_users else None)
+            return int(key) if key is not None else None
+
+        def group_id_get(key):
+            if isinstance(key, str) and not key.isdigit():
+                return group_ids.get(key.lower())
+            return int(key) if key is not None else None
+
+        waves = {}  # label: wave of department to create, None — parent is not found or in cycle
+
+        def wave_get(label, path=()):
+            if label in path:
+                return None
+            if label not in waves:
+                parent = department_id_get(new_departments[label].get('parent_id') or 1)
+                if isinstance(parent, str):
+                    wave = wave_get(parent.lower(), path + (label,))
+                    waves[label] = wave + 1 if wave is not None else None
+                else:
+                    waves[label] = 0 if parent in department_items else None
+            return waves[label]
+
+        for item in departments or ():
+            department_id = department_id_get(item.get('id', item.get('label')))
+            if isinstance(department_id, str):
+                wave = wave_get(department_id.lower())
+                if wave is None:
+                    plan.missing.append(('department', item.get('parent_id')))
+                else:
+                    plan.department_add(wave, **self.department_new(item, department_id_get))
+                continue
+            if department_id not in department_items:
+                plan.missing.append(('department', item.get('id', item.get('label'))))
+                continue
+            kwargs = self.department_diff(department_items[department_id], item, department_id_get)
+            if kwargs:
+                plan.add('departments', 'department_upd', department_id=department_id, **kwargs)
+
+        for item in users or ():
+            user_id = user_id_get(item.get('id', item.get('nickname')))
+            if isinstance(user_id, str):
+                kwargs = self.user_new(item, department_id_get)
+                if kwargs is None:
+                    plan.missing.append(('department', item.get('department_id')))
+                else:
+                    plan.add('users', 'user_add', **kwargs)
+                continue
+            if user_id not in user_items:
+                plan.missing.append(('user', item.get('id', item.get('nickname'))))
+                continue
+            kwargs = self.user_diff(user_items[user_id], item, department_id_get)
+            if kwargs:
+                plan.add('users', 'user_upd', user_id=user_id, **kwargs)
+
+        desired = {}
+        for key, members in (groups or {}).items():
+            group_id = group_id_get(key)
+            if group_id not in group_ids:
+                plan.missing.append(('group', key))
+                continue
+            items = desired.setdefault(group_id, set())
+            for member in members:
+                if isinstance(member, dict):
+                    member = (member.get('type', 'user'), member['id'])
+                elif not isinstance(member, (tuple, list)):
+                    member = ('user', member)
+                member_type, member_id = member
+                member_id = {'user': user_id_get, 'department': department_id_get,
+                             'group': group_id_get}[member_type](member_id)
+                if member_id is None:
+                    plan.missing.append((member_type, member[1]))
+                    continue
+                items.add((member_type, member_id))
+        for group_id, items in self.members_get(list(desired)).items():
+            actions = [{'operation_type': 'add', 'value': {'type': member_type, 'id': member_id}}
+                       for member_type, member_id in sorted(desired[group_id] - items, key=str)]
+            if members_remove:
+                actions += [{'operation_type': 'remove', 'value': {'type': member_type, 'id': member_id}}
+                            for member_type, member_id in sorted(items - desired[group_id], key=str)]
+            for i in range(0, len(actions), self.api.MEMBERS_CHUNK_SIZE):
+                plan.add('members', 'group_member_update', group_id=group_id,
+                         actions=actions[i:i + self.api.MEMBERS_CHUNK_SIZE])
+        return plan
+
+    def department_new(self, desired, department_id_get):
+        """
+        Arguments of department creation
+        :param desired: desired department dict with label and name
+        :param department_id_get: func — department ID by ID or label
+        :return: dict — department_add arguments, parent_id may be label of created department
+        """
+        ret = {field: desired[field] for field in self.DEPARTMENT_FIELDS if desired.get(field) is not None}
+        if 'parent_id' in ret:
+            ret['parent_id'] = department_id_get(ret['parent_id'])
+        if 'head_id' in ret:
+            ret['head_id'] = int(ret['head_id'])
+        return ret
+
+    def user_new(self, desired, department_id_get):
+        """
+        Arguments of user creation
+        :param desired: desired user dict with nickname and password
+        :param department_id_get: func — department ID by ID or label
+        :return: dict — user_add arguments, department_id may be label of created department |
+            None — department is not found
+        """
+        ret = {field: desired[field] for field in self.USER_ADD_FIELDS if desired.get(field) is not None}
+        if 'department_id' in ret:
+            ret['department_id'] = department_id_get(ret['department_id'])
+            if ret['department_id'] is None:
+                return None
+        name = self.name_prepare(desired) or {}
+        for field, key in (('name', 'first'), ('secname', 'last'), ('sername', 'middle')):
+            if name.get(key):
+                ret[field] = name[key]
+        return ret
+
+    def department_diff(self, current, desired, department_id_get):
+        """
+        Changed department fields
+        :param current: department dict from API
+        :param desired: desired department dict
+        :param department_id_get: func — department ID by ID or label
+        :return: dict — department_upd arguments
+        """
+        ret = {}
+        for field in self.DEPARTMENT_FIELDS:
+            value = desired.get(field)
+            if value is None:
+                continue
+            if field == 'parent_id':
+                value = department_id_get(value)
+                if value is None:
+                    continue
+                old = current.get('parent_id')
+            elif field == 'head_id':
+                value = int(value)
+                old = (current.get('head') or {}).get('id')
+            else:
+                old = current.get(field)
+            if value != old:
+                ret[field] = value
+        return ret
+
+    def user_diff(self, current, desired, department_id_get):
+        """
+        Changed user fields
+        :param current: user dict from API
+        :param desired: desired user dict
+        :param department_id_get: func — department ID by ID or label
+        :return: dict — user_upd arguments
+        """
+        ret = {}
+        name = self.name_prepare(desired)
+        current_name = self.name_prepare({'name': current.get('name')}) or {}
+        if name and dict(current_name, **name) != current_name:
+            name = dict(current_name, **name)
+            ret['name'] = name.get('first')
+            ret['secname'] = name.get('last')
+            ret['sername'] = name.get('middle')
+        for field in self.USER_FIELDS:
+            value = desired.get(field)
+            if field == 'name' or value is None:
+                continue
+            if field == 'department_id':
+                value = department_id_get(value)
+                if value is not None and value != current.get(field):
+                    ret[field] = value
+            elif field == 'contacts':
+                if self.contacts_prepare(value) != self.contacts_prepare(current.get(field)):
+                    ret[field] = value
+            elif self.value_prepare(value) != self.value_prepare(current.get(field)):
+                ret[field] = value
+        return ret
@@ -0,0 +1,251 @@
+# coding: utf8
+
+"""
+Yandex.Connect typed records module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import sys
+import threading
+
+
+def intern_value(value, strings=False):
+    """
+    Intern dict keys of value, and strings too if strings is set
+    :param value: value from API response
+    :param strings: intern str values
+    :return: value
+    """
+    if isinstance(value, str):
+        return sys.intern(value) if strings else value
+    if isinstance(value, dict):
+        return {sys.intern(key): intern_value(item, strings) for key, item in value.items()}
+    if isinstance(value, list):
+        return [intern_value(item, strings) for item in value]
+    return value
+
+
+def fields_id_add(fields, default):
+    """
+    Fields of records request, ID is always requested
+    :param fields: list | str | None
+    :param default: list — fields if not set
+    :return: list
+    """
+    if not fields:
+        fields = default
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    return fields if 'id' in fields else ['id'] + list(fields)
+
+
+class YandexConnectRecord(object):
+    """
+    Compact record of API object with attribute access
+    Fields absent in record are loaded on first access: for record of
+    YandexConnectRecordList — for the whole list by one list sweep,
+    for single record — by one info request
+    """
+
+    __slots__ = ('_api', '_owner', '_extra')
+
+    ENTITY = None  # user|department|group
+    FIELDS = ()  # Known fields, stored in slots
+    INTERN = ()  # Fields with repeated string values, interned
+
+    def __init__(self, data, api=None, owner=None):
+        """
+        :param data: dict from API response
+        :param api: YandexConnectDirectory to load absent fields
+        :param owner: YandexConnectRecordList which batches loading
+        """
+        self._api = api
+        self._owner = owner
+        self._extra = None
+        self.update(data)
+
+    def update(self, data):
+        """
+        Set fields from API response
+        :param data: dict
+        :return: None
+        """
+        for key, value in data.items():
+            if key in self.FIELDS:
+                object.__setattr__(self, key, intern_value(value, key in self.INTERN))
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[sys.intern(key)] = intern_value(value)
+
+    def loaded(self, field):
+        """
+        Is field loaded
+        :param field: field name
+        :return: bool
+        """
+        if field in self.FIELDS:
+            try:
+                object.__getattribute__(self, field)
+                return True
+            except AttributeError:
+                return False
+        return self._extra is not None and field in self._extra
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'id' or name not in self.FIELDS:
+            extra = object.__getattribute__(self, '_extra')
+            if extra is not None and name in extra:
+                return extra[name]
+            raise AttributeError(name)
+        self.load(name)
+        return object.__getattribute__(self, name)
+
+    def get(self, field, default=None):
+        """
+        Field value, absent field is loaded
+        :param field: field name
+        :param default: value if API has no such field
+        :return: value
+        """
+        try:
+            value = getattr(self, field)
+        except AttributeError:
+            return default
+        return default if value is None else value
+
+    def load(self, *fields):
+        """
+        Load absent fields
+        :param fields: field names
+        :return: self
+        """
+        fields = [field for field in fields if not self.loaded(field)]
+        if not fields:
+            return self
+        if self._owner is not None:
+            self._owner.load(*fields)
+        elif self._api is not None:
+            info = getattr(self._api, '%s_info' % self.ENTITY)
+            self.update(info(self.id, fields=','.join(['id'] + fields)))
+        for field in fields:
+            if field in self.FIELDS and not self.loaded(field):
+                object.__setattr__(self, field, None)
+        return self
+
+    def as_dict(self):
+        """
+        Loaded fields as dict
+        :return: dict
+        """
+        ret = {field: getattr(self, field) for field in self.FIELDS if self.loaded(field)}
+        if self._extra:
+            ret.update(self._extra)
+        return ret
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.id == other.id
+
+    def __hash__(self):
+        return hash((self.ENTITY, self.id))
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.id)
+
+
+class YandexConnectUser(YandexConnectRecord):
+    """ User record """
+
+    ENTITY = 'user'
+    FIELDS = ('id', 'nickname', 'email', 'name', 'gender', 'position', 'about', 'birthday', 'contacts', 'aliases',
+              'department_id', 'department', 'groups', 'is_admin', 'is_dismissed', 'is_enabled', 'is_robot',
+              'external_id')
+    INTERN = ('gender', 'position', 'birthday')
+
+    __slots__ = FIELDS
+
+
+class YandexConnectDepartment(YandexConnectRecord):
+    """ Department record """
+
+    ENTITY = 'department'
+    FIELDS = ('id', 'name', 'label', 'email', 'description', 'parent_id', 'parent', 'head', 'members_count', 'aliases',
+              'external_id', 'removed', 'created')
+    INTERN = ('description',)
+
+    __slots__ = FIELDS
+
+
+class YandexConnectGroup(YandexConnectRecord):
+    """ Group record """
+
+    ENTITY = 'group'
+    FIELDS = ('id', 'name', 'label', 'email', 'description', 'type', 'members', 'admins', 'members_count', 'aliases',
+              'external_id', 'author', 'created')
+    INTERN = ('type',)
+
+    __slots__ = FIELDS
+
+
+class YandexConnectRecordList(list):
+    """
+    List of records of one list sweep
+    Absent field accessed on any record is loaded for all records at once
+    by one list sweep with the same filters
+    """
+
+    __slots__ = ('api', 'record_class', 'filters', '_lock')
+
+    def __init__(self, api, record_class, items=(), filters=None):
+        """
+        :param api: YandexConnectDirectory
+        :param record_class: YandexConnectRecord subclass
+        :param items: dicts from API response
+        :param filters: list method filters used to get items
+        """
+        super(YandexConnectRecordList, self).__init__(record_class(item, api=api, owner=self) for item in items)
+        self.api = api
+        self.record_class = record_class
+        self.filters = dict(filters or {})
+        self._lock = threading.Lock()
+
+    def by_id(self):
+        """
+        Records by ID
+        :return: dict
+        """
+        return {record.id: record for record in self}
+
+    def load(self, *fields):
+        """
+        Load absent fields for all records by one list sweep
+        Records missing in the sweep are loaded one by one
+        :param fields: field names
+        :return: self
+        """
+        with self._lock:
+            fields = [field for field in fields if any(not record.loaded(field) for record in self)]
+            if not fields:
+                return self
+            method = getattr(self.api, '%s_list_full' % self.record_class.ENTITY)
+            records = self.by_id()
+            for item in method(fields=['id'] + fields, **self.filters):
+                record = records.pop(item.get('id'), None)
+                if record is not None:
+                    record.update(item)
+            for record in self:
+                missing = [field for field in fields if not record.loaded(field)]
+                if not missing:
+                    continue
+                if record.id in records:
+                    owner, record._owner = record._owner, None
+                    try:
+                        record.load(*missing)
+                    finally:
+                        record._owner = owner
+                for field in missing:
+                    if field in record.FIELDS and not record.loaded(field):
+                        object.__setattr__(record, field, None)
+        return self
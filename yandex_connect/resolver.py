@@ -0,0 +1,338 @@
+# coding: utf8
+
+"""
+Yandex.Connect identity resolver module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import threading
+import time
+
+from .base import YandexConnectException
+
+
+class YandexConnectResolver(object):
+    """
+    Resolve nickname / alias / email / name / label to object ID
+    Maps of an entity type are built by one full list sweep and stored
+    in the cache of directory object, one namespace per map
+    """
+
+    # entity: (list method, fields, {cache key: item field})
+    ENTITIES = {
+        'user': ('user_list_full', 'id,nickname,aliases', {
+            'user_id_by_email': 'nickname',
+            'user_id_by_alias': 'aliases',
+        }),
+        'group': ('group_list_full', 'id,email,name', {
+            'group_id_by_email': 'email',
+            'group_id_by_name': 'name',
+        }),
+        'department': ('department_list_full', 'id,label,name', {
+            'department_id_by_label': 'label',
+            'department_id_by_name': 'name',
+        }),
+    }
+
+    api = None  # YandexConnectDirectory
+    negative_ttl = 60  # Seconds to remember not found keys
+    refresh_interval = 10  # Min seconds between refreshes of one entity type on miss
+
+    def __init__(self, api, negative_ttl=60, refresh_interval=10):
+        """
+        :param api: YandexConnectDirectory
+        :param negative_ttl: seconds to remember not found keys
+        :param refresh_interval: min seconds between refreshes of one entity type on miss
+        """
+        self.api = api
+        self.negative_ttl = negative_ttl
+        self.refresh_interval = refresh_interval
+        self._negative = {}
+        self._refreshed = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key_prepare(entity, key):
+        """
+        Normalize lookup key
+        :param entity: user|group|department
+        :param key: str
+        :return: str
+        """
+        key = key.strip().lower()
+        if entity == 'user' and key.find('@') > -1:
+            key = key[:key.find('@')]
+        return key
+
+    @classmethod
+    def item_keys(cls, entity, item):
+        """
+        Lookup keys of item
+        :param entity: user|group|department
+        :param item: dict
+        :return: generator of tuple(cache key, key)
+        """
+        for cache_key, field in cls.ENTITIES[entity][2].items():
+            values = item.get(field)
+            if not values:
+                continue
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                yield cache_key, cls.key_prepare(entity, value)
+
+    def refresh(self, entity):
+        """
+        Rebuild maps of entity type by one full list sweep
+        Concurrent refreshes of one entity type share one sweep
+        :param entity: user|group|department
+        :return: None
+        """
+        self.api.coalesce(('resolver', entity), self._refresh, entity)
+
+    def _refresh(self, entity, refreshed=False):
+        """
+        Rebuild maps of entity type
+        :param entity: user|group|department
+        :param refreshed: skip if maps were refreshed after this time
+        :return: None
+        """
+        if refreshed is not False and self._refreshed.get(entity) != refreshed:
+            return
+        method, fields, _ = self.ENTITIES[entity]
+        self._maps_set(entity, getattr(self.api, method)(fields=fields))
+
+    def _maps_set(self, entity, items):
+        """
+        Replace maps of entity type by items of full list sweep
+        :param entity: user|group|department
+        :param items: list of dict
+        :return: None
+        """
+        maps = {cache_key: {} for cache_key in self.ENTITIES[entity][2]}
+        for item in items:
+            for cache_key, key in self.item_keys(entity, item):
+                maps[cache_key][key] = item['id']
+        with self._lock:
+            for cache_key, mapping in maps.items():
+                self.api.cache.replace(cache_key, mapping)
+            self._refreshed[entity] = time.monotonic()
+            for key in [key for key in self._negative if key[0] == entity]:
+                del self._negative[key]
+
+    def _lookup(self, entity, key):
+        """
+        Find key in maps of entity
+        :return: int | None
+        """
+        for cache_key in self.ENTITIES[entity][2]:
+            val = self.api.cache.get(cache_key, key)
+            if val is not None:
+                return val
+        return None
+
+    def lookup(self, entity, key):
+        """
+        Find key in maps without refresh
+        :param entity: user|group|department
+        :param key: nickname / alias / email / name / label
+        :return: int | None
+        """
+        return self._lookup(entity, self.key_prepare(entity, key))
+
+    def resolve(self, entity, key):
+        """
+        Resolve key to ID, on miss maps of entity are refreshed
+        :param entity: user|group|department
+        :param key: nickname / alias / email / name / label
+        :raise YandexConnectException: not found
+        :return: int
+        """
+        return self.resolve_many(entity, [key])[0]
+
+    def resolve_many(self, entity, keys):
+        """
+        Resolve keys to IDs, maps of entity are refreshed at most once for all misses
+        :param entity: user|group|department
+        :param keys: list of nickname / alias / email / name / label
+        :raise YandexConnectException: some keys not found
+        :return: list of int in order of keys
+        """
+        state = self._resolve_start(entity, keys)
+        # Refresh without lock: concurrent refreshes wait for one sweep
+        if state['refresh']:
+            self.api.coalesce(('resolver', entity), self._refresh, entity, state['refreshed'])
+        return self._resolve_finish(entity, state)
+
+    def _resolve_start(self, entity, keys):
+        """
+        Find keys in maps, decide if maps should be refreshed for misses
+        :param entity: user|group|department
+        :param keys: list of nickname / alias / email / name / label
+        :return: dict — keys, ret, missing, unknown, now, refreshed, refresh
+        """
+        keys = [self.key_prepare(entity, key) for key in keys]
+        ret = {}
+        for key in keys:
+            val = self._lookup(entity, key)
+            if val is not None:
+                ret[key] = val
+        missing = [key for key in keys if key not in ret]
+        with self._lock:
+            now = time.monotonic()
+            unknown = [key for key in missing if self._negative.get((entity, key), 0) <= now]
+            refreshed = self._refreshed.get(entity)
+        return {'keys': keys, 'ret': ret, 'missing': missing, 'unknown': unknown, 'now': now, 'refreshed': refreshed,
+                'refresh': bool(unknown) and (refreshed is None or now - refreshed >= self.refresh_interval)}
+
+    def _resolve_finish(self, entity, state):
+        """
+        Find misses in refreshed maps, remember not found keys
+        :param entity: user|group|department
+        :param state: result of _resolve_start
+        :raise YandexConnectException: some keys not found
+        :return: list of int in order of keys
+        """
+        ret = state['ret']
+        missing = state['missing']
+        if missing:
+            with self._lock:
+                for key in missing:
+                    val = self._lookup(entity, key)
+                    if val is not None:
+                        ret[key] = val
+                for key in state['unknown']:
+                    if key not in ret:
+                        self._negative[(entity, key)] = state['now'] + self.negative_ttl
+                missing = [key for key in missing if key not in ret]
+            if missing:
+                raise YandexConnectException('No found %s by "%s"' % (entity, '", "'.join(sorted(set(missing)))))
+        return [ret[key] for key in state['keys']]
+
+    def user_id(self, key):
+        """
+        Resolve user nickname / alias / email to ID
+        :param key: str
+        :return: int
+        """
+        return self.resolve('user', key)
+
+    def group_id(self, key):
+        """
+        Resolve group email / name to ID
+        :param key: str
+        :return: int
+        """
+        return self.resolve('group', key)
+
+    def department_id(self, key):
+        """
+        Resolve department label / name to ID
+        :param key: str
+        :return: int
+        """
+        return self.resolve('department', key)
+
+    def item_set(self, entity, item):
+        """
+        Update maps in place by created / changed object
+        :param entity: user|group|department
+        :param item: yandex request dict
+        :return: None
+        """
+        if not isinstance(item, dict) or 'id' not in item:
+            return
+        with self._lock:
+            for cache_key, key in self.item_keys(entity, item):
+                self.api.cache.set(cache_key, key, item['id'])
+                self._negative.pop((entity, key), None)
+
+    def item_del(self, entity, item_id):
+        """
+        Remove object from maps
+        :param entity: user|group|department
+        :param item_id: ID
+        :return: None
+        """
+        with self._lock:
+            for cache_key in self.ENTITIES[entity][2]:
+                for key, val in self.api.cache.items(cache_key):
+                    if val == item_id:
+                        self.api.cache.delete(cache_key, key)
+
+
+class AsyncYandexConnectResolver(YandexConnectResolver):
+    """
+    Resolver of asyncio client: maps, negative TTL and refresh interval are
+    the same as in YandexConnectResolver, sweeps and resolve are coroutines
+    """
+
+    async def refresh(self, entity):
+        """
+        Rebuild maps of entity type by one full list sweep
+        Concurrent refreshes of one entity type share one sweep
+        :param entity: user|group|department
+        :return: None
+        """
+        await self.api.coalesce(('resolver', entity), self._refresh, entity)
+
+    async def _refresh(self, entity, refreshed=False):
+        """
+        Rebuild maps of entity type
+        :param entity: user|group|department
+        :param refreshed: skip if maps were refreshed after this time
+        :return: None
+        """
+        if refreshed is not False and self._refreshed.get(entity) != refreshed:
+            return
+        method, fields, _ = self.ENTITIES[entity]
+        self._maps_set(entity, await getattr(self.api, method)(fields=fields))
+
+    async def resolve(self, entity, key):
+        """
+        Resolve key to ID, on miss maps of entity are refreshed
+        :param entity: user|group|department
+        :param key: nickname / alias / email / name / label
+        :raise YandexConnectException: not found
+        :return: int
+        """
+        return (await self.resolve_many(entity, [key]))[0]
+
+    async def resolve_many(self, entity, keys):
+        """
+        Resolve keys to IDs, maps of entity are refreshed at most once for all misses
+        :param entity: user|group|department
+        :param keys: list of nickname / alias / email / name / label
+        :raise YandexConnectException: some keys not found
+        :return: list of int in order of keys
+        """
+        state = self._resolve_start(entity, keys)
+        if state['refresh']:
+            await self.api.coalesce(('resolver', entity), self._refresh, entity, state['refreshed'])
+        return self._resolve_finish(entity, state)
+
+    async def user_id(self, key):
+        """
+        Resolve user nickname / alias / email to ID
+        :param key: str
+        :return: int
+        """
+        return await self.resolve('user', key)
+
+    async def group_id(self, key):
+        """
+        Resolve group email / name to ID
+        :param key: str
+        :return: int
+        """
+        return await self.resolve('group', key)
+
+    async def department_id(self, key):
+        """
+        Resolve department label / name to ID
+        :param key: str
+        :return: int
+        """
+        return await self.resolve('department', key)
@@ -0,0 +1,149 @@
+# coding: utf8
+
+"""
+Yandex.Connect retry policy module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import datetime
+import random
+import threading
+import time
+
+
+class YandexConnectRetryPolicy(object):
+    """
+    Retry policy: exponential backoff with full jitter, Retry-After support,
+    retry budget shared by all requests which use the policy object
+
+    Non-idempotent methods (POST) are repeated only when the request surely
+    was not processed: 429 response or failed connection
+    """
+
+    IDEMPOTENT_METHODS = ('get', 'patch', 'delete')  # Methods safe to repeat
+    RETRY_STATUSES = (429, 500, 502, 503, 504)  # Response statuses to repeat
+    SAFE_STATUSES = (429,)  # Statuses to repeat for any method
+
+    ERROR_CONNECT = 'connect'  # Connection was not established, request was not sent
+    ERROR_TRANSIENT = 'transient'  # Connection failed, request may be processed
+
+    def __init__(self, retry_max=3, backoff_base=0.5, backoff_max=30, retry_after_max=120, budget_ratio=0.2,
+                 budget_max=20, retry_post=False):
+        """
+        :param retry_max: max retry count of one request
+        :param backoff_base: first backoff in seconds
+        :param backoff_max: max backoff in seconds
+        :param retry_after_max: max wait by Retry-After header in seconds
+        :param budget_ratio: retry tokens added by each request
+        :param budget_max: max retry tokens, None — without budget
+        :param retry_post: repeat POST as idempotent method
+        """
+        self.retry_max = retry_max
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self.retry_post = retry_post
+        self._budget = budget_max
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        """
+        Available retry tokens
+        :return: float | None
+        """
+        return self._budget
+
+    def request_started(self):
+        """
+        Add retry tokens for new request
+        :return: None
+        """
+        if self.budget_max is None:
+            return
+        with self._lock:
+            self._budget = min(self.budget_max, self._budget + self.budget_ratio)
+
+    def budget_take(self):
+        """
+        Take retry token
+        :return: bool — False if budget is exhausted
+        """
+        if self.budget_max is None:
+            return True
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def idempotent(self, method):
+        """
+        Is method safe to repeat
+        :param method: request method
+        :return: bool
+        """
+        return self.retry_post or method.lower() in self.IDEMPOTENT_METHODS
+
+    @staticmethod
+    def retry_after_get(headers):
+        """
+        Parse Retry-After header
+        :param headers: response headers
+        :return: float | None — seconds
+        """
+        if not headers:
+            return None
+        value = headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            from email.utils import parsedate_to_datetime
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, date.timestamp() - time.time())
+
+    def backoff(self, retry_count):
+        """
+        Backoff with full jitter
+        :param retry_count: number of retry, from 0
+        :return: float — seconds
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry_count))
+
+    def delay(self, method, retry_count, status_code=None, headers=None, error=None):
+        """
+        Delay before retry
+        :param method: request method
+        :param retry_count: number of retries already done
+        :param status_code: response status
+        :param headers: response headers
+        :param error: ERROR_CONNECT | ERROR_TRANSIENT | None
+        :return: float | None — seconds, None if request must not be repeated
+        """
+        if retry_count >= self.retry_max:
+            return None
+        if error is not None:
+            if error != self.ERROR_CONNECT and not self.idempotent(method):
+                return None
+        elif status_code not in self.RETRY_STATUSES:
+            return None
+        elif status_code not in self.SAFE_STATUSES and not self.idempotent(method):
+            return None
+        if not self.budget_take():
+            return None
+        delay = self.backoff(retry_count)
+        retry_after = self.retry_after_get(headers)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_after_max))
+        return delay
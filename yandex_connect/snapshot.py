@@ -0,0 +1,349 @@
+# coding: utf8
+
+"""
+Yandex.Connect local directory snapshot module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import YandexConnectException
+
+
+class YandexConnectSnapshot(object):
+    """
+    Local SQLite copy of users, departments, groups and group members
+    Refresh requests full lists, but rewrites only rows whose content hash
+    changed. Reads are served locally, snapshot is refreshed on read when it
+    is older than max_age seconds
+    """
+
+    USER_FIELDS = 'id,nickname,email,department_id,name,position,is_dismissed,aliases'  # User fields to store
+    DEPARTMENT_FIELDS = 'id,name,label,parent_id,head'  # Department fields to store
+    GROUP_FIELDS = 'id,name,email,label,type'  # Group fields to store
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, nickname TEXT, department_id INTEGER, '
+        'is_dismissed INTEGER, data TEXT NOT NULL, hash TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS users_department_id ON users (department_id)',
+        'CREATE INDEX IF NOT EXISTS users_nickname ON users (nickname)',
+        'CREATE TABLE IF NOT EXISTS departments (id INTEGER PRIMARY KEY, parent_id INTEGER, '
+        'data TEXT NOT NULL, hash TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS departments_parent_id ON departments (parent_id)',
+        'CREATE TABLE IF NOT EXISTS groups (id INTEGER PRIMARY KEY, email TEXT, data TEXT NOT NULL, '
+        'hash TEXT NOT NULL, members_hash TEXT)',
+        'CREATE TABLE IF NOT EXISTS members (group_id INTEGER NOT NULL, type TEXT NOT NULL, id INTEGER NOT NULL, '
+        'PRIMARY KEY (group_id, type, id))',
+        'CREATE INDEX IF NOT EXISTS members_member ON members (type, id)',
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)',
+    )
+    SUBTREE_SQL = ('WITH RECURSIVE subtree(id) AS (SELECT ? UNION SELECT departments.id FROM departments '
+                   'JOIN subtree ON departments.parent_id = subtree.id) SELECT id FROM subtree')  # Department subtree
+
+    api = None  # YandexConnectDirectory
+    path = None  # Database file path
+    max_age = 300  # Max age of snapshot in seconds for reads
+    members = True  # Store group members
+
+    def __init__(self, api, path, max_age=300, members=True):
+        """
+        :param api: YandexConnectDirectory
+        :param path: database file path
+        :param max_age: max age of snapshot in seconds for reads, None — never refresh on read
+        :param members: store group members
+        """
+        self.api = api
+        self.path = path
+        self.max_age = max_age
+        self.members = members
+        self._local = threading.local()
+        self._refresh_lock = threading.RLock()
+        with self.connection as conn:
+            for sql in self.SCHEMA:
+                conn.execute(sql)
+
+    @property
+    def connection(self):
+        """
+        Connection of current thread
+        :return: sqlite3.Connection
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = conn
+        return conn
+
+    def close(self):
+        """
+        Close connection of current thread
+        :return: None
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+    @staticmethod
+    def hash_get(obj):
+        """
+        Content hash
+        :param obj: json serializable object
+        :return: str
+        """
+        return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------------------------------------------------------
+
+    @property
+    def refreshed_at(self):
+        """
+        Timestamp of last full refresh
+        :return: float | None
+        """
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return row[0] if row else None
+
+    @property
+    def age(self):
+        """
+        Age of snapshot in seconds
+        :return: float | None — None if snapshot is empty
+        """
+        refreshed_at = self.refreshed_at
+        if refreshed_at is None:
+            return None
+        return time.time() - refreshed_at
+
+    def _table_sync(self, conn, table, items, columns):
+        """
+        Write changed rows, delete missing rows
+        :param conn: sqlite3.Connection
+        :param table: table name
+        :param items: iterable of dict
+        :param columns: extra columns, {column: item field}
+        :return: dict — {'changed': int, 'deleted': int}
+        """
+        hashes = dict(conn.execute('SELECT id, hash FROM %s' % table))
+        names = ['id'] + list(columns) + ['data', 'hash']
+        sql = 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (id) DO UPDATE SET %s' % (
+            table, ', '.join(names), ', '.join('?' * len(names)),
+            ', '.join('%s = excluded.%s' % (name, name) for name in names[1:])
+        )
+        changed = 0
+        seen = set()
+        for item in items:
+            seen.add(item['id'])
+            item_hash = self.hash_get(item)
+            if hashes.get(item['id']) == item_hash:
+                continue
+            row = [item['id']] + [item.get(field) for field in columns.values()]
+            row += [json.dumps(item, ensure_ascii=False), item_hash]
+            conn.execute(sql, row)
+            changed += 1
+        deleted = [(item_id,) for item_id in hashes if item_id not in seen]
+        conn.executemany('DELETE FROM %s WHERE id = ?' % table, deleted)
+        if table == 'groups':
+            conn.executemany('DELETE FROM members WHERE group_id = ?', deleted)
+        return {'changed': changed, 'deleted': len(deleted)}
+
+    @staticmethod
+    def member_prepare(item):
+        """
+        Convert group member to (type, id)
+        :param item: yandex member dict
+        :return: tuple
+        """
+        obj = item.get('object', item)
+        return item.get('type', 'user'), int(obj['id'])
+
+    def _members_sync(self, conn):
+        """
+        Fetch members of all groups in parallel, rewrite only changed groups
+        :param conn: sqlite3.Connection
+        :return: dict — {'changed': int}
+        """
+        hashes = dict(conn.execute('SELECT id, members_hash FROM groups'))
+
+        def members_get(group_id):
+            return group_id, sorted(set(self.member_prepare(item) for item in self.api.group_member_list(group_id)))
+
+        workers = max(1, min(self.api.list_concurrency, len(hashes)))
+        changed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for group_id, members in executor.map(members_get, list(hashes)):
+                members_hash = self.hash_get(members)
+                if hashes[group_id] == members_hash:
+                    continue
+                conn.execute('DELETE FROM members WHERE group_id = ?', (group_id,))
+                conn.executemany('INSERT INTO members (group_id, type, id) VALUES (?, ?, ?)',
+                                 [(group_id, member_type, member_id) for member_type, member_id in members])
+                conn.execute('UPDATE groups SET members_hash = ? WHERE id = ?', (members_hash, group_id))
+                changed += 1
+        return {'changed': changed}
+
+    def refresh(self):
+        """
+        Refresh snapshot from API
+        :return: dict — changed / deleted rows by table
+        """
+        with self._refresh_lock:
+            ret = {}
+            with self.connection as conn:
+                ret['departments'] = self._table_sync(conn, 'departments', self.api.iter_departments(fields=self.DEPARTMENT_FIELDS),
+                                                      {'parent_id': 'parent_id'})
+                ret['users'] = self._table_sync(conn, 'users', self.api.iter_users(fields=self.USER_FIELDS),
+                                                {'nickname': 'nickname', 'department_id': 'department_id',
+                                                 'is_dismissed': 'is_dismissed'})
+                ret['groups'] = self._table_sync(conn, 'groups', self.api.iter_groups(fields=self.GROUP_FIELDS),
+                                                 {'email': 'email'})
+                if self.members:
+                    ret['members'] = self._members_sync(conn)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)", (time.time(),))
+            return ret
+
+    def fresh_check(self, max_age=None):
+        """
+        Refresh snapshot if it is older than max_age
+        :param max_age: seconds, by default — max_age of snapshot
+        :return: None
+        """
+        max_age = self.max_age if max_age is None else max_age
+        age = self.age
+        if age is not None and (max_age is None or age <= max_age):
+            return
+        with self._refresh_lock:
+            age = self.age
+            if age is None or (max_age is not None and age > max_age):
+                self.refresh()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _rows(self, sql, args=()):
+        """
+        Execute query and load data column
+        :return: list of dict
+        """
+        self.fresh_check()
+        return [json.loads(row[0]) for row in self.connection.execute(sql, args)]
+
+    def user(self, user_id):
+        """
+        Сотрудник
+        :param user_id: ID
+        :return: dict | None
+        """
+        rows = self._rows('SELECT data FROM users WHERE id = ?', (int(user_id),))
+        return rows[0] if rows else None
+
+    def user_by_nickname(self, nickname):
+        """
+        Сотрудник по логину / почте
+        :param nickname: nickname / email
+        :return: dict | None
+        """
+        if nickname.find('@') > -1:
+            nickname = nickname[:nickname.find('@')]
+        rows = self._rows('SELECT data FROM users WHERE nickname = ?', (nickname,))
+        return rows[0] if rows else None
+
+    def users(self, department_id=None, recursive=False, is_dismissed=None):
+        """
+        Сотрудники
+        :param department_id: фильтр по отделу
+        :param recursive: включая вложенные отделы
+        :param is_dismissed: фильтр
+        :return: list
+        """
+        where = []
+        args = []
+        if department_id is not None:
+            if recursive:
+                where.append('department_id IN (%s)' % self.SUBTREE_SQL)
+            else:
+                where.append('department_id = ?')
+            args.append(int(department_id))
+        if is_dismissed is not None:
+            where.append('is_dismissed = ?')
+            args.append(1 if is_dismissed else 0)
+        sql = 'SELECT data FROM users'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return self._rows(sql + ' ORDER BY id', args)
+
+    def department(self, department_id):
+        """
+        Отдел
+        :param department_id: ID
+        :return: dict | None
+        """
+        rows = self._rows('SELECT data FROM departments WHERE id = ?', (int(department_id),))
+        return rows[0] if rows else None
+
+    def departments(self, parent_id=None, recursive=False):
+        """
+        Отделы
+        :param parent_id: фильтр по родительскому отделу
+        :param recursive: все вложенные отделы
+        :return: list
+        """
+        if parent_id is None:
+            return self._rows('SELECT data FROM departments ORDER BY id')
+        if recursive:
+            return self._rows('SELECT data FROM departments WHERE id IN (%s) AND id != ? ORDER BY id' % self.SUBTREE_SQL,
+                              (int(parent_id), int(parent_id)))
+        return self._rows('SELECT data FROM departments WHERE parent_id = ? ORDER BY id', (int(parent_id),))
+
+    def group(self, group_id):
+        """
+        Команда
+        :param group_id: ID
+        :return: dict | None
+        """
+        rows = self._rows('SELECT data FROM groups WHERE id = ?', (int(group_id),))
+        return rows[0] if rows else None
+
+    def groups(self):
+        """
+        Команды
+        :return: list
+        """
+        return self._rows('SELECT data FROM groups ORDER BY id')
+
+    def group_members(self, group_id):
+        """
+        Прямые участники команды
+        :param group_id: ID
+        :return: list — [{'type': 'user|group|department', 'id': ID}, ...]
+        """
+        if not self.members:
+            raise YandexConnectException('Snapshot is created without group members')
+        self.fresh_check()
+        rows = self.connection.execute('SELECT type, id FROM members WHERE group_id = ? ORDER BY type, id', (int(group_id),))
+        return [{'type': member_type, 'id': member_id} for member_type, member_id in rows]
+
+    def member_groups(self, member_id, member_type='user'):
+        """
+        Команды, в которые участник входит напрямую
+        :param member_id: ID
+        :param member_type: user|group|department
+        :return: list of ID
+        """
+        if not self.members:
+            raise YandexConnectException('Snapshot is created without group members')
+        self.fresh_check()
+        rows = self.connection.execute('SELECT group_id FROM members WHERE type = ? AND id = ? ORDER BY group_id',
+                                       (member_type, int(member_id)))
+        return [row[0] for row in rows]
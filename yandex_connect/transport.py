@@ -0,0 +1,256 @@
+# coding: utf8
+
+"""
+Yandex.Connect HTTP transport module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import json
+import threading
+from urllib.parse import urlencode
+
+from .retry import YandexConnectRetryPolicy
+
+
+class YandexConnectResponse(object):
+    """ Response of transport """
+
+    __slots__ = ('status_code', 'content', 'headers')
+
+    def __init__(self, status_code, content, headers=None):
+        """
+        :param status_code: HTTP status
+        :param content: bytes — body
+        :param headers: case insensitive mapping of headers
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+    @property
+    def text(self):
+        """
+        Body as text
+        :return: str
+        """
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        """
+        Body as json
+        :return: value
+        """
+        return json.loads(self.content)
+
+
+class YandexConnectTransport(object):
+    """
+    Transport interface of YandexConnectRequest
+    request returns object with status_code, content, text, headers and json()
+    """
+
+    def request(self, method, url, headers=None, params=None, data=None):
+        """
+        Send request
+        :param method: get/post/patch/delete
+        :param url: url
+        :param headers: dict
+        :param params: dict — query params
+        :param data: str — json body
+        :return: response
+        """
+        raise NotImplementedError()
+
+    def error_classify(self, exc):
+        """
+        Kind of send error for retry policy
+        :param exc: exception raised by request
+        :return: YandexConnectRetryPolicy.ERROR_CONNECT | ERROR_TRANSIENT | None — not retryable
+        """
+        return None
+
+    def timeout_check(self, exc):
+        """
+        Send error is timeout of response, e.g. page is too large to be answered in time
+        :param exc: exception raised by request
+        :return: bool
+        """
+        return False
+
+    def close(self):
+        """
+        Close pooled connections
+        :return: None
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class YandexConnectRequestsTransport(YandexConnectTransport):
+    """ Transport on requests.Session with keep-alive connection pool, requests is imported on first use """
+
+    pool_size = 10  # Max keep-alive connections per host
+    owns_session = True  # Session is created by transport and closed by close()
+    timeout = (10, 60)  # Seconds — (connect, read) | one value for both, None — without timeout
+
+    def __init__(self, pool_size=10, session=None, timeout=(10, 60)):
+        """
+        :param pool_size: max keep-alive connections per host
+        :param session: requests.Session to use, by default — created on first request,
+                        passed session is not closed by close()
+        :param timeout: seconds — (connect, read) | one value for both, None — without timeout
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.owns_session = session is None
+        self._session = session
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_create(pool_size=10):
+        """
+        Create session with keep-alive connection pool
+        Cookies are not stored, so the session holds no per-request state
+        and may be shared between threads
+        :param pool_size: max keep-alive connections per host
+        :return: requests.Session
+        """
+        import requests
+        from http.cookiejar import DefaultCookiePolicy
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def session(self):
+        """
+        Session of transport, created on first use
+        :return: requests.Session
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.session_create(self.pool_size)
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, timeout=self.timeout, **kwargs)
+
+    def error_classify(self, exc):
+        import requests
+        import urllib3
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return YandexConnectRetryPolicy.ERROR_CONNECT
+        if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+            reason = getattr(exc.args[0], 'reason', exc.args[0])
+            if isinstance(reason, urllib3.exceptions.NewConnectionError):
+                return YandexConnectRetryPolicy.ERROR_CONNECT
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return YandexConnectRetryPolicy.ERROR_TRANSIENT
+        return None
+
+    def timeout_check(self, exc):
+        import requests
+        return isinstance(exc, (requests.exceptions.ReadTimeout, requests.exceptions.ChunkedEncodingError))
+
+    def close(self):
+        with self._lock:
+            if self._session is not None and self.owns_session:
+                self._session.close()
+                self._session = None
+
+
+class YandexConnectUrllib3Transport(YandexConnectTransport):
+    """
+    Thin transport on urllib3.PoolManager without requests layers: no hooks,
+    cookies, redirects and response wrappers, urllib3 is imported on first use
+    """
+
+    pool_size = 10  # Max keep-alive connections per host
+    timeout = (10, 60)  # Seconds — (connect, read) | one value for both, None — without timeout
+
+    def __init__(self, pool_size=10, timeout=(10, 60)):
+        """
+        :param pool_size: max keep-alive connections per host
+        :param timeout: seconds — (connect, read) | one value for both, None — without timeout
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        """
+        Connection pool, created on first use
+        :return: urllib3.PoolManager
+        """
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    import urllib3
+                    timeout = self.timeout
+                    if isinstance(timeout, (tuple, list)):
+                        timeout = urllib3.Timeout(connect=timeout[0], read=timeout[1])
+                    self._pool = urllib3.PoolManager(num_pools=self.pool_size, maxsize=self.pool_size,
+                                                     retries=False, timeout=timeout)
+        return self._pool
+
+    def request(self, method, url, headers=None, params=None, data=None):
+        if params:
+            url = '%s?%s' % (url, urlencode(params, doseq=True))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        r = self.pool.urlopen(method.upper(), url, body=data, headers=headers, redirect=False)
+        return YandexConnectResponse(r.status, r.data, r.headers)
+
+    def error_classify(self, exc):
+        import urllib3
+        if isinstance(exc, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)):
+            return YandexConnectRetryPolicy.ERROR_CONNECT
+        if isinstance(exc, (urllib3.exceptions.ProtocolError, urllib3.exceptions.TimeoutError,
+                            urllib3.exceptions.SSLError, ConnectionError)):
+            return YandexConnectRetryPolicy.ERROR_TRANSIENT
+        return None
+
+    def timeout_check(self, exc):
+        import urllib3
+        return isinstance(exc, (urllib3.exceptions.ReadTimeoutError, urllib3.exceptions.IncompleteRead))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.clear()
+                self._pool = None
+
+
+class YandexConnectMemoryTransport(YandexConnectTransport):
+    """
+    In-process transport for tests and benchmarks, requests are passed to
+    handler without sockets, e.g. YandexConnectMemoryTransport(YandexConnectFakeServer().handle)
+    """
+
+    def __init__(self, handler):
+        """
+        :param handler: func(method, path with query, body bytes, headers) -> tuple(status, headers, payload)
+        """
+        self.handler = handler
+
+    def request(self, method, url, headers=None, params=None, data=None):
+        path = url[url.find('/', url.find('//') + 2):] if '//' in url else url
+        if params:
+            path = '%s?%s' % (path, urlencode(params, doseq=True))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        status, headers, payload = self.handler(method, path, data or b'', headers or {})
+        content = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        return YandexConnectResponse(status, content, headers)
@@ -0,0 +1,457 @@
+# coding: utf8
+
+"""
+Yandex.Connect department tree index module
+:author: Alexeev Nick
+:email: n@akolka.ru
+:version: 0.2b
+"""
+
+import bisect
+import threading
+
+
+class YandexConnectDepartmentTree(object):
+    """
+    In-memory index of department hierarchy built by one department_list_full
+    sweep: parent lookup, ancestor paths, children and users by department,
+    ancestry check by nested label intervals of Euler tour
+
+    Labels of Euler tour are spaced by GAP, so changes made by department_add /
+    department_upd / department_del of the client update only the changed
+    department and its subtree: children lists, paths and labels of the subtree
+    taken from free labels of new parent. Indexes are rebuilt from parents
+    without API requests only if labels of a gap are exhausted, a change makes
+    a cycle or adopts departments whose parent was not in tree, and while
+    departments of tree are in cycles
+    """
+
+    api = None  # YandexConnectDirectory
+    with_users = True  # Keep users by department
+    GAP = 1 << 256  # Free labels after every label of Euler tour, labels are not limited python int
+    SPREAD = 8  # Changed subtree takes 1 / 2 ** SPREAD of free labels, the rest is left for next changes
+
+    def __init__(self, api, users=True):
+        """
+        :param api: YandexConnectDirectory
+        :param users: load users map by one user_list_full sweep
+        """
+        self.api = api
+        self.with_users = users
+        self._lock = threading.RLock()
+        self._items = {}  # department ID: dict
+        self._parent = {}  # department ID: parent ID | None
+        self._user_department = {}  # user ID: department ID
+        self._dirty = True
+        self._children = {}  # department ID: sorted list of child IDs
+        self._roots = []
+        self._interval = {}  # department ID: (start, end) labels, subtree labels are in [start, end)
+        self._label_end = 0  # Labels from it are free for new roots
+        self._cyclic = False  # Some departments are in cycles, changes are applied by rebuild
+        self._path = {}  # department ID: tuple of IDs from root
+        self._department_users = {}  # department ID: list of user IDs
+
+    @staticmethod
+    def parent_get(item):
+        """
+        Parent ID of department dict
+        :param item: dict
+        :return: int | None
+        """
+        parent_id = item.get('parent_id')
+        if parent_id is None and isinstance(item.get('parent'), dict):
+            parent_id = item['parent'].get('id')
+        return parent_id
+
+    def refresh(self):
+        """
+        Load departments and users, rebuild indexes
+        :return: self
+        """
+        items = self.api.department_list_full(fields='id,parent_id,name,label')
+        users = None
+        if self.with_users:
+            users = self.api.user_list_full(fields='id,department_id')
+        with self._lock:
+            self._items = {item['id']: item for item in items}
+            self._parent = {item['id']: self.parent_get(item) for item in items}
+            if users is not None:
+                self._user_department = {item['id']: item.get('department_id') for item in users}
+            self._dirty = True
+            self._build()
+        return self
+
+    def _build(self):
+        """
+        Rebuild children, Euler tour labels and paths
+        :return: None
+        """
+        if not self._dirty:
+            return
+        children = {}
+        roots = []
+        for department_id, parent_id in self._parent.items():
+            if parent_id is None or parent_id not in self._parent or parent_id == department_id:
+                roots.append(department_id)
+            else:
+                children.setdefault(parent_id, []).append(department_id)
+        for value in children.values():
+            value.sort()
+        roots.sort()
+        interval = {}
+        path = {}
+        label = 0
+        for root in roots:
+            path[root] = (root,)
+            stack = [(root, False)]
+            while stack:
+                department_id, leave = stack.pop()
+                if leave:
+                    interval[department_id] = (interval[department_id], label)
+                    label += self.GAP
+                    continue
+                interval[department_id] = label
+                label += self.GAP
+                stack.append((department_id, True))
+                for child_id in reversed(children.get(department_id, ())):
+                    if child_id not in path:
+                        path[child_id] = path[department_id] + (child_id,)
+                        stack.append((child_id, False))
+        # Departments in cycles are not reachable from roots, they become roots
+        cyclic = False
+        for department_id in self._parent:
+            if department_id not in interval:
+                cyclic = True
+                path[department_id] = (department_id,)
+                interval[department_id] = (label, label + self.GAP)
+                label += 2 * self.GAP
+                roots.append(department_id)
+                siblings = children.get(self._parent[department_id])
+                if siblings is not None:
+                    siblings.remove(department_id)
+        department_users = {}
+        for user_id, department_id in self._user_department.items():
+            department_users.setdefault(department_id, []).append(user_id)
+        self._children = {key: value for key, value in children.items() if value}
+        self._roots = roots
+        self._interval = interval
+        self._label_end = label
+        self._cyclic = cyclic
+        self._path = path
+        self._department_users = department_users
+        self._dirty = False
+
+    def _subtree(self, department_id):
+        """
+        Department and nested department IDs in Euler tour order
+        :param department_id: ID
+        :return: list
+        """
+        ret = []
+        stack = [department_id]
+        while stack:
+            item_id = stack.pop()
+            ret.append(item_id)
+            stack.extend(reversed(self._children.get(item_id, ())))
+        return ret
+
+    def _label(self, department_id, start, end):
+        """
+        Give department and its subtree labels between start and end, set their paths
+        :param department_id: ID, already placed in children of parent or roots
+        :param start: labels are greater
+        :param end: labels are not greater
+        :return: bool — False if there are not enough free labels
+        """
+        step = (end - start) // (2 * len(self._subtree(department_id)) + 1)
+        step = step >> self.SPREAD or step
+        if step < 1:
+            return False
+        path = self._path[self._parent[department_id]] if department_id not in self._roots else ()
+        self._path[department_id] = path + (department_id,)
+        label = start
+        stack = [(department_id, False)]
+        while stack:
+            item_id, leave = stack.pop()
+            label += step
+            if leave:
+                self._interval[item_id] = (self._interval[item_id], label)
+                continue
+            self._interval[item_id] = label
+            stack.append((item_id, True))
+            for child_id in reversed(self._children.get(item_id, ())):
+                self._path[child_id] = self._path[item_id] + (child_id,)
+                stack.append((child_id, False))
+        return True
+
+    def _detach(self, department_id):
+        """
+        Remove department from children of its parent or from roots
+        :param department_id: ID
+        :return: None
+        """
+        path = self._path[department_id]
+        if len(path) == 1:
+            self._roots.remove(department_id)
+            return
+        siblings = self._children[path[-2]]
+        siblings.remove(department_id)
+        if not siblings:
+            del self._children[path[-2]]
+
+    def _attach(self, department_id):
+        """
+        Place department with its subtree under its parent and label it
+        :param department_id: ID, not in children lists and roots
+        :return: bool — False if indexes must be rebuilt
+        """
+        parent_id = self._parent[department_id]
+        if parent_id is None or parent_id not in self._interval or parent_id == department_id:
+            bisect.insort(self._roots, department_id)
+            start = self._label_end
+            self._label_end += self.GAP * (2 * len(self._subtree(department_id)) + 1)
+            return self._label(department_id, start, self._label_end)
+        siblings = self._children.setdefault(parent_id, [])
+        start, end = self._interval[parent_id]
+        start = max([self._interval[item_id][1] for item_id in siblings] + [start])
+        bisect.insort(siblings, department_id)
+        return self._label(department_id, start, end)
+
+    def _move(self, department_id, parent_id):
+        """
+        Apply new parent of department to indexes
+        :param department_id: ID
+        :param parent_id: ID | None
+        :return: None
+        """
+        new = department_id not in self._interval
+        self._parent[department_id] = parent_id
+        if self._dirty or self._cyclic:
+            self._dirty = True
+            return
+        # Departments whose parent was not in tree are adopted by rebuild
+        if any(self._parent[root] == department_id for root in self._roots if root != department_id):
+            self._dirty = True
+            return
+        if not new:
+            if parent_id in self._interval and self._within(department_id, parent_id):
+                self._dirty = True
+                return
+            self._detach(department_id)
+        if not self._attach(department_id):
+            self._dirty = True
+
+    def _within(self, ancestor_id, department_id):
+        """
+        Is department equal to or nested in ancestor, both are in tree
+        :return: bool
+        """
+        start, end = self._interval[ancestor_id]
+        return start <= self._interval[department_id][0] < end
+
+    def id_check(self, department_id):
+        """
+        Prepare department ID
+        :param department_id: int / str — ID, label or name
+        :return: int
+        """
+        if isinstance(department_id, str):
+            department_id = self.api.department_id_check(department_id)
+        return department_id
+
+    def _check(self, department_id):
+        """
+        Rebuild indexes if changed, check department
+        :param department_id: ID
+        :raise KeyError: department is not in tree
+        :return: None
+        """
+        self._build()
+        if department_id not in self._interval:
+            raise KeyError(department_id)
+
+    def __contains__(self, department_id):
+        with self._lock:
+            return department_id in self._parent
+
+    def __len__(self):
+        return len(self._parent)
+
+    @property
+    def roots(self):
+        """
+        Root department IDs
+        :return: list
+        """
+        with self._lock:
+            self._build()
+            return list(self._roots)
+
+    def item(self, department_id):
+        """
+        Department dict
+        :param department_id: ID
+        :return: dict
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            return self._items[department_id]
+
+    def parent(self, department_id):
+        """
+        Parent department ID
+        :param department_id: ID
+        :return: int | None
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            path = self._path[department_id]
+            return path[-2] if len(path) > 1 else None
+
+    def children(self, department_id):
+        """
+        Child department IDs
+        :param department_id: ID
+        :return: list
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            return list(self._children.get(department_id, ()))
+
+    def path(self, department_id):
+        """
+        Department IDs from root to department
+        :param department_id: ID
+        :return: tuple
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            return self._path[department_id]
+
+    def ancestors(self, department_id):
+        """
+        Ancestor IDs from parent to root
+        :param department_id: ID
+        :return: tuple
+        """
+        return self.path(department_id)[-2::-1]
+
+    def depth(self, department_id):
+        """
+        Depth of department, root is 0
+        :param department_id: ID
+        :return: int
+        """
+        return len(self.path(department_id)) - 1
+
+    def is_ancestor(self, ancestor_id, department_id):
+        """
+        Is department equal to or nested in ancestor
+        :param ancestor_id: ID
+        :param department_id: ID
+        :return: bool
+        """
+        ancestor_id = self.id_check(ancestor_id)
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(ancestor_id)
+            self._check(department_id)
+            return self._within(ancestor_id, department_id)
+
+    def subtree(self, department_id):
+        """
+        Department and all nested department IDs
+        :param department_id: ID
+        :return: list
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            return self._subtree(department_id)
+
+    def user_department(self, user_id):
+        """
+        Department ID of user
+        :param user_id: ID
+        :return: int | None
+        """
+        with self._lock:
+            return self._user_department.get(user_id)
+
+    def users(self, department_id, recursive=True):
+        """
+        User IDs of department
+        :param department_id: ID
+        :param recursive: with nested departments
+        :return: list
+        """
+        department_id = self.id_check(department_id)
+        with self._lock:
+            self._check(department_id)
+            if not recursive:
+                return list(self._department_users.get(department_id, ()))
+            ret = []
+            for item_id in self._subtree(department_id):
+                ret += self._department_users.get(item_id, ())
+            return ret
+
+    def item_set(self, item):
+        """
+        Add / update department, new parent changes only indexes of department subtree
+        :param item: dict with id, parent_id is optional for update
+        :return: None
+        """
+        if not isinstance(item, dict) or item.get('id') is None:
+            return
+        with self._lock:
+            department_id = item['id']
+            self._items[department_id] = dict(self._items.get(department_id, {}), **item)
+            parent_id = self.parent_get(self._items[department_id])
+            if department_id not in self._parent or self._parent[department_id] != parent_id:
+                self._move(department_id, parent_id)
+
+    def item_del(self, department_id):
+        """
+        Delete department, its children become roots as after refresh
+        :param department_id: ID
+        :return: None
+        """
+        with self._lock:
+            self._items.pop(department_id, None)
+            if department_id not in self._parent:
+                return
+            del self._parent[department_id]
+            if self._dirty or self._cyclic:
+                self._dirty = True
+                return
+            self._detach(department_id)
+            children = self._children.pop(department_id, [])
+            del self._interval[department_id]
+            del self._path[department_id]
+            # Children of deleted department become roots as in rebuild
+            for child_id in children:
+                if not self._attach(child_id):
+                    self._dirty = True
+                    return
+
+    def user_set(self, item):
+        """
+        Set department of user
+        :param item: user dict with id and department_id
+        :return: None
+        """
+        if not isinstance(item, dict) or item.get('id') is None or item.get('department_id') is None:
+            return
+        user_id, department_id = item['id'], item['department_id']
+        with self._lock:
+            old_id = self._user_department.get(user_id)
+            self._user_department[user_id] = department_id
+            if self._dirty or old_id == department_id:
+                return
+            if old_id in self._department_users:
+                self._department_users[old_id].remove(user_id)
+            self._department_users.setdefault(department_id, []).append(user_id)